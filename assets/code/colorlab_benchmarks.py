@@ -0,0 +1,290 @@
+"""
+ColorLab - Stage micro-benchmarks over a synthetic image corpus
+
+    python colorlab_benchmarks.py run [--sizes 0.1,1,12,50] [--kinds all] [--engines numpy,python]
+                                      [--output bench.json] [--baseline baseline.json --threshold 0.25]
+    python colorlab_benchmarks.py compare baseline.json bench.json [--threshold 0.25]
+
+Each stage is timed `--repeat` times per (engine, image kind, size) and the
+best time is kept.  `compare` (or `run --baseline`) exits non-zero when any
+stage got slower than the baseline by more than the threshold fraction and
+the absolute noise floor.  Encoded corpus images are cached in --corpus-dir
+so large sizes are only generated once.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import lambda_function_colorlab_complete as colorlab
+from colorlab_corpus import IMAGE_KINDS, encode_image, synthetic_image
+
+DEFAULT_SIZES = (0.1, 1, 12, 50)
+DEFAULT_CORPUS_DIR = os.path.join('/tmp', 'colorlab-corpus')
+NAMING_SAMPLE_SIZE = 5000
+KMEANS_K = 8
+
+STAGES = (
+    'extract_colors', 'color_naming', 'kmeans_plus_plus', 'kmeans', 'histograms',
+    'regional_3x3', 'center_vs_edges', 'end_to_end'
+)
+
+# ===== CORPUS =====
+
+def corpus_image(kind, megapixels, corpus_dir, seed=0):
+    """Encoded PNG for one corpus entry, generated once and cached on disk"""
+    path = os.path.join(corpus_dir, f"{kind}-{megapixels:g}mp-{seed}.png")
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    image_bytes = encode_image(synthetic_image(kind, megapixels, seed))
+    os.makedirs(corpus_dir, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(image_bytes)
+    return image_bytes
+
+# ===== STAGES =====
+
+def time_call(func, repeat, setup=None):
+    """Wall-clock seconds for `repeat` calls of func, each after an untimed setup()"""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def image_stages(image_bytes, engine):
+    """(stage, callable) pairs for one decoded corpus image"""
+    colors_data = colorlab.extract_colors_from_image_bytes(image_bytes, engine, 'exact', random.Random(0))
+    pixels = colors_data['pixels']
+    packed = colors_data['packed_colors']
+    counter = colors_data['color_counter']
+    width, height = colors_data['width'], colors_data['height']
+    k = min(KMEANS_K, len(counter))
+    image_data = base64.b64encode(image_bytes).decode('ascii')
+
+    # Seed over the points run_weighted_kmeans seeds over in auto mode (the
+    # coreset on many-color images); building them is part of the kmeans stage
+    seeding = colorlab.kmeans_plus_plus_numpy if engine == 'numpy' else colorlab.kmeans_plus_plus
+    context = colorlab.AnalysisContext.from_colors_data(colors_data, engine)
+    mode = colorlab.resolve_kmeans_mode('auto', counter, k, context, pixels)
+    seed_points, seed_weights, _ = context.kmeans_inputs('histogram' if mode == 'pixels' else mode)
+
+    def seed_colors():
+        return seeding(seed_points, k, random.Random(0), seed_weights, colorlab.seed_candidates(k))
+
+    def histograms():
+        stats = colorlab.compute_pixel_statistics(counter, colorlab.pixel_count(pixels), engine)
+        return colorlab.generate_histograms(pixels, stats)
+
+    return [
+        ('extract_colors', lambda: colorlab.extract_colors_from_image_bytes(image_bytes, engine, 'exact', random.Random(0))),
+        ('kmeans_plus_plus', seed_colors),
+        ('kmeans', lambda: colorlab.run_weighted_kmeans(pixels, counter, k, engine, random.Random(0))),
+        ('histograms', histograms),
+        ('regional_3x3', lambda: colorlab.analyze_enhanced_regional_analysis(
+            pixels, packed, counter, width, height, engine, 'rgb', '3x3')),
+        ('center_vs_edges', lambda: colorlab.analyze_center_vs_edges(packed, counter, width, height, engine, 'rgb')),
+        ('end_to_end', lambda: colorlab.perform_enhanced_colorlab_analysis(image_data, engine, seed=0, use_cache=False)),
+    ]
+
+def naming_stage(naming):
+    """get_accurate_color_name over random colors, name memo cleared before each run"""
+    rng = random.Random(0)
+    colors = [(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(NAMING_SAMPLE_SIZE)]
+
+    def clear():
+        colorlab.lookup_color_name.cache_clear()
+        colorlab.lookup_lab_color_name.cache_clear()
+
+    def run():
+        for r, g, b in colors:
+            colorlab.get_accurate_color_name(r, g, b, naming)
+
+    return run, clear
+
+def result_entry(stage, engine, kind, megapixels, samples, **extra):
+    return dict({
+        'stage': stage,
+        'engine': engine,
+        'kind': kind,
+        'megapixels': megapixels,
+        'repeat': len(samples),
+        'min_ms': round(min(samples) * 1000, 3),
+        'median_ms': round(statistics.median(samples) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3)
+    }, **extra)
+
+def result_key(entry):
+    return f"{entry['stage']}|{entry['engine']}|{entry['kind']}|{entry['megapixels']:g}"
+
+def run_benchmarks(args):
+    # Benchmarks exercise the stage functions directly; silence their progress prints
+    quiet = open(os.devnull, 'w')
+    colorlab.load_optional_modules()
+    engines = [e for e in args.engines.split(',') if e]
+    for engine in engines:
+        if engine not in colorlab.ANALYSIS_ENGINES:
+            sys.exit(f"unknown engine {engine!r}")
+        if engine == 'numpy' and colorlab.np is None:
+            sys.exit("numpy engine requested but NumPy is not installed")
+    kinds = IMAGE_KINDS if args.kinds == 'all' else tuple(args.kinds.split(','))
+    sizes = [float(size) for size in args.sizes.split(',')]
+    stages = set(STAGES if args.stages == 'all' else args.stages.split(','))
+
+    # Warm lazy imports, lookup tables and memoized helpers once, like a warm container
+    warmup = base64.b64encode(encode_image(synthetic_image('photo', 0.01, 1))).decode('ascii')
+    real_stdout, sys.stdout = sys.stdout, quiet
+    try:
+        for engine in engines:
+            colorlab.perform_enhanced_colorlab_analysis(warmup, engine, seed=0, use_cache=False)
+    finally:
+        sys.stdout = real_stdout
+
+    results = []
+    if 'color_naming' in stages:
+        for naming in colorlab.COLOR_NAMING_METRICS:
+            run, clear = naming_stage(naming)
+            samples = time_call(run, args.repeat, clear)
+            results.append(result_entry('color_naming', 'python', f"random[{naming}]", 0, samples,
+                                        colors=NAMING_SAMPLE_SIZE))
+            print(f"⏱️  color_naming[{naming}] {results[-1]['min_ms']:.1f} ms / {NAMING_SAMPLE_SIZE} colors")
+
+    for megapixels in sizes:
+        for kind in kinds:
+            image_bytes = corpus_image(kind, megapixels, args.corpus_dir)
+            for engine in engines:
+                if engine == 'python' and megapixels > args.python_max_mp:
+                    continue
+                sys.stdout = quiet
+                try:
+                    stage_calls = [(stage, call) for stage, call in image_stages(image_bytes, engine) if stage in stages]
+                    timed = [(stage, time_call(call, args.repeat)) for stage, call in stage_calls]
+                finally:
+                    sys.stdout = real_stdout
+                for stage, samples in timed:
+                    results.append(result_entry(stage, engine, kind, megapixels, samples))
+                print(f"⏱️  {kind:<9} {megapixels:>5g} MP {engine:<6} " + '  '.join(
+                    f"{stage} {min(samples) * 1000:.1f}" for stage, samples in timed) + " (ms)")
+
+    report = {
+        'version': colorlab.ANALYSIS_VERSION,
+        'created': datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'sizes': sizes, 'kinds': list(kinds), 'engines': engines, 'stages': sorted(stages),
+            'python_max_mp': args.python_max_mp, 'repeat': args.repeat
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Results written to {args.output}")
+    return report
+
+# ===== REGRESSION GATE =====
+
+def covered_by(config, entry):
+    """Whether a run with this report config should have timed the entry"""
+    stages = config.get('stages', STAGES)
+    if entry['stage'] == 'color_naming':
+        return 'color_naming' in stages
+    return (entry['stage'] in stages and entry['engine'] in config['engines'] and entry['kind'] in config['kinds']
+            and entry['megapixels'] in config['sizes']
+            and not (entry['engine'] == 'python' and entry['megapixels'] > config.get('python_max_mp', float('inf'))))
+
+def compare_reports(baseline, current, threshold, min_delta_ms):
+    """Entries slower than baseline by more than threshold (fraction) and min_delta_ms.
+
+    Also returns the baseline keys the current run has no timing for, split
+    by whether its config covers them (a stage that failed or was dropped)
+    or deliberately left them out.
+    """
+    previous = {result_key(entry): entry for entry in baseline['results']}
+    timed = {result_key(entry) for entry in current['results']}
+    missing = [key for key, entry in previous.items() if key not in timed and covered_by(current['config'], entry)]
+    skipped = [key for key, entry in previous.items() if key not in timed and key not in missing]
+    regressions, improvements, compared = [], [], 0
+    for entry in current['results']:
+        before = previous.get(result_key(entry))
+        if before is None:
+            continue
+        compared += 1
+        delta = entry['min_ms'] - before['min_ms']
+        ratio = entry['min_ms'] / before['min_ms'] if before['min_ms'] else float('inf')
+        change = (result_key(entry), before['min_ms'], entry['min_ms'], ratio)
+        if delta > min_delta_ms and ratio > 1 + threshold:
+            regressions.append(change)
+        elif -delta > min_delta_ms and ratio < 1 / (1 + threshold):
+            improvements.append(change)
+    return compared, regressions, improvements, missing, skipped
+
+def gate(baseline, current, threshold, min_delta_ms):
+    """Print the comparison; returns the process exit code"""
+    compared, regressions, improvements, missing, skipped = compare_reports(baseline, current, threshold, min_delta_ms)
+    print(f"\n📊 Compared {compared} stage timings against the baseline (threshold +{threshold:.0%}, "
+          f"noise floor {min_delta_ms} ms)")
+    if skipped:
+        print(f"   ⚠️ {len(skipped)} baseline timing(s) outside this run's sizes/kinds/engines/stages were not compared")
+    for key, before, after, ratio in improvements:
+        print(f"   ✅ {key}: {before:.1f} → {after:.1f} ms ({ratio:.2f}x)")
+    for key, before, after, ratio in regressions:
+        print(f"   ❌ {key}: {before:.1f} → {after:.1f} ms ({ratio:.2f}x)")
+    for key in missing:
+        print(f"   ❌ {key}: in the baseline but not timed by this run")
+    if regressions or missing:
+        print(f"❌ {len(regressions)} stage(s) regressed, {len(missing)} missing")
+        return 1
+    print("✅ No regressions")
+    return 0
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='time every stage over the synthetic corpus')
+    run_parser.add_argument('--sizes', default=','.join(f"{size:g}" for size in DEFAULT_SIZES), help='megapixels')
+    run_parser.add_argument('--kinds', default='all', help=f"comma list of {', '.join(IMAGE_KINDS)}")
+    run_parser.add_argument('--engines', default='numpy,python')
+    run_parser.add_argument('--stages', default='all', help=f"comma list of {', '.join(STAGES)}")
+    run_parser.add_argument('--python-max-mp', type=float, default=1,
+                            help='skip the pure-Python engine above this size')
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--corpus-dir', default=DEFAULT_CORPUS_DIR)
+    run_parser.add_argument('--output', help='write results JSON here')
+    run_parser.add_argument('--baseline', help='fail if any stage regressed against this results file')
+
+    compare_parser = commands.add_parser('compare', help='regression gate between two results files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown as a fraction')
+        sub.add_argument('--min-delta-ms', type=float, default=5.0, help='ignore smaller absolute changes')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        report = run_benchmarks(args)
+        if args.baseline:
+            return gate(load_report(args.baseline), report, args.threshold, args.min_delta_ms)
+        return 0
+    return gate(load_report(args.baseline), load_report(args.current), args.threshold, args.min_delta_ms)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+ColorLab - Synthetic image corpus for local load tests and benchmarks
+"""
+import io
+import math
+
+import numpy as np
+from PIL import Image
+
+IMAGE_KINDS = ('solid', 'gradient', 'noise', 'few_color', 'photo')
+
+def image_dimensions(megapixels):
+    """4:3 width and height closest to the requested pixel count"""
+    height = max(1, int(round(math.sqrt(megapixels * 1e6 * 3 / 4))))
+    width = max(1, int(round(megapixels * 1e6 / height)))
+    return width, height
+
+def synthetic_image(kind, megapixels, seed=0):
+    """(height, width, 3) uint8 RGB image of the given kind"""
+    if kind not in IMAGE_KINDS:
+        raise ValueError(f"image kind must be one of: {', '.join(IMAGE_KINDS)}")
+    width, height = image_dimensions(megapixels)
+    rng = np.random.default_rng(seed)
+
+    if kind == 'solid':
+        return np.broadcast_to(rng.integers(0, 256, 3, dtype=np.uint8), (height, width, 3)).copy()
+
+    if kind == 'gradient':
+        x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+        y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+        start, end = rng.integers(0, 256, (2, 3))
+        image = np.empty((height, width, 3), dtype=np.uint8)
+        # Diagonal, vertical and horizontal ramps on R, G, B
+        for channel, weight in enumerate(((x + y) / 2, np.broadcast_to(y, (height, width)), np.broadcast_to(x, (height, width)))):
+            image[..., channel] = (start[channel] + (end[channel] - start[channel]) * weight).astype(np.uint8)
+        return image
+
+    if kind == 'noise':
+        return rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+    if kind == 'few_color':
+        # Blocky poster-style image over a 6-color palette
+        palette = rng.integers(0, 256, (6, 3), dtype=np.uint8)
+        blocks = rng.integers(0, len(palette), (max(1, height // 64) + 1, max(1, width // 64) + 1))
+        cells = blocks[np.arange(height)[:, None] // 64, np.arange(width)[None, :] // 64]
+        return palette[cells]
+
+    # Photo-like: smooth low-frequency color field plus sensor noise
+    field = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    smooth = np.asarray(Image.fromarray(field).resize((width, height), Image.BICUBIC), dtype=np.int16)
+    noise = rng.normal(0, 6, (height, width, 3)).astype(np.int16)
+    return np.clip(smooth + noise, 0, 255).astype(np.uint8)
+
+def encode_image(image, image_format='PNG'):
+    """Encoded image bytes (PNG by default, JPEG for photo-style payloads)"""
+    image_format = image_format.upper().replace('JPG', 'JPEG')
+    options = {'quality': 90} if image_format == 'JPEG' else {'compress_level': 1}
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+def parse_image_mix(spec):
+    """Parse 'kind:megapixels[:weight],...' into [(kind, megapixels, weight)]"""
+    mix = []
+    for entry in spec.split(','):
+        parts = entry.strip().split(':')
+        if len(parts) not in (2, 3):
+            raise ValueError(f"image mix entries look like kind:megapixels[:weight], got {entry!r}")
+        kind, megapixels = parts[0], float(parts[1])
+        weight = float(parts[2]) if len(parts) == 3 else 1.0
+        if kind not in IMAGE_KINDS:
+            raise ValueError(f"image kind must be one of: {', '.join(IMAGE_KINDS)}")
+        mix.append((kind, megapixels, weight))
+    return mix
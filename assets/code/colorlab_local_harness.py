@@ -0,0 +1,564 @@
+"""
+ColorLab - Local API Gateway harness and load generator
+
+    python colorlab_local_harness.py serve [--port 3000] [--max-containers 4]
+    python colorlab_local_harness.py load --url http://127.0.0.1:3000/analyze \\
+        --mix noise:1,photo:12:2 --concurrency 8 --requests 200 [--output report.json]
+
+`serve` turns HTTP requests into API Gateway proxy events and runs
+lambda_handler in a pool of simulated containers: each container is its own
+process that imports the function module on start (the cold start) and then
+serves one request at a time until it sits idle past --idle-timeout.
+Responses carry X-ColorLab-Container / -Cold-Start / -Init-Duration /
+-Duration / -Max-Memory headers.  When the module has --stream-handler
+(lambda_stream_handler) and it returns an iterator body, e.g. for
+`Accept: application/x-ndjson`, the records are relayed with chunked
+transfer encoding as the container produces them; those responses omit
+-Duration / -Max-Memory, which the REPORT line still logs.
+
+`load` sends a weighted mix of synthetic images at a fixed concurrency and
+reports throughput, latency percentiles and the cold/warm split.
+"""
+import argparse
+import base64
+import importlib.util
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODULE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lambda_function_colorlab_complete.py')
+DEFAULT_HANDLER = 'lambda_handler'
+DEFAULT_STREAM_HANDLER = 'lambda_stream_handler'
+TEXT_CONTENT_TYPES = ('', 'application/json', 'application/x-www-form-urlencoded', 'text/')
+
+# ===== SIMULATED CONTAINERS =====
+
+class LambdaContext:
+    """The parts of the Lambda context object handlers use"""
+
+    def __init__(self, request_id, function_name, memory_mb, timeout_seconds):
+        self.aws_request_id = request_id
+        self.function_name = function_name
+        self.memory_limit_in_mb = memory_mb
+        self.deadline = time.monotonic() + timeout_seconds
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+def container_main(connection, module_path, handler_name, stream_handler_name, memory_mb, timeout_seconds, env):
+    """Container process: import the function (cold start), then serve events from the pipe.
+
+    A response whose body is an iterator is sent as a 'head' message, one
+    'chunk' message per item and the final 'response' message.
+    """
+    import resource
+
+    os.environ.update(env)
+    os.environ.setdefault('AWS_LAMBDA_FUNCTION_MEMORY_SIZE', str(memory_mb))
+    started = time.perf_counter()
+    module_name = os.path.splitext(os.path.basename(module_path))[0]
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    handler = getattr(module, stream_handler_name or handler_name, None) or getattr(module, handler_name)
+    init_ms = (time.perf_counter() - started) * 1000
+
+    while True:
+        event = connection.recv()
+        if event is None:
+            break
+        context = LambdaContext(event['requestContext']['requestId'], module_name, memory_mb, timeout_seconds)
+        started = time.perf_counter()
+        try:
+            response = handler(event, context)
+        except Exception as e:
+            # API Gateway answers an unhandled function error with a 502
+            response = {'statusCode': 502, 'headers': {'Content-Type': 'application/json'},
+                        'body': json.dumps({'message': 'Internal server error', 'error': str(e)})}
+        body = response.get('body')
+        if body is not None and not isinstance(body, (str, bytes)):
+            response = dict(response, body=None)
+            connection.send({'head': response, 'init_ms': init_ms})
+            try:
+                for chunk in body:
+                    connection.send({'chunk': chunk})
+            except Exception as e:
+                # The status line is out already; all that is left is to end the stream
+                print(f"❌ Streamed response failed: {str(e)}")
+        connection.send({
+            'response': response,
+            'duration_ms': (time.perf_counter() - started) * 1000,
+            'init_ms': init_ms,
+            'max_memory_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        })
+
+class Container:
+    """One simulated execution environment running container_main"""
+
+    ids = itertools.count(1)
+
+    def __init__(self, context, config):
+        self.id = next(Container.ids)
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=container_main, args=(child,) + config, daemon=True)
+        self.process.start()
+        child.close()
+        self.invocations = 0
+        self.last_used = time.monotonic()
+
+    def invoke(self, event, stream=None):
+        """Run one event; a streamed response's head and chunks go to ``stream(message)`` as they arrive.
+
+        Without ``stream``, chunks are buffered into the final response's body
+        instead; once ``stream`` raises OSError the rest is drained and dropped.
+        """
+        self.connection.send(event)
+        buffered = []
+        while True:
+            message = self.connection.recv()
+            if 'response' in message:
+                break
+            if 'head' in message:
+                message.update(container=self.id, cold_start=self.invocations == 0)
+            if stream is None:
+                if 'chunk' in message:
+                    buffered.append(message['chunk'])
+                continue
+            try:
+                stream(message)
+            except OSError:
+                # The client went away; drain the rest so the container stays in sync
+                stream = lambda message: None
+        result = message
+        if buffered:
+            result['response']['body'] = b''.join(buffered).decode('utf-8')
+        result['cold_start'] = self.invocations == 0
+        self.invocations += 1
+        self.last_used = time.monotonic()
+        return result
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+
+class ContainerPool:
+    """Lambda-style scaling: reuse the most recently idle container, start a new one
+    while under --max-containers, otherwise queue; reclaim containers idle too long."""
+
+    def __init__(self, config, max_containers, idle_timeout):
+        self.context = multiprocessing.get_context('spawn')
+        self.config = config
+        self.max_containers = max_containers
+        self.idle_timeout = idle_timeout
+        self.condition = threading.Condition()
+        self.idle = []
+        self.count = 0
+
+    def invoke(self, event, stream=None):
+        container = self.acquire()
+        try:
+            result = container.invoke(event, stream)
+        except (EOFError, OSError) as e:
+            # The container died (e.g. out of memory); drop it like Lambda would
+            self.discard(container)
+            return {'response': {'statusCode': 502, 'headers': {'Content-Type': 'application/json'},
+                                 'body': json.dumps({'message': 'Container crashed', 'error': str(e)})},
+                    'duration_ms': 0.0, 'init_ms': 0.0, 'max_memory_mb': 0.0, 'cold_start': container.invocations == 0,
+                    'container': container.id}
+        result['container'] = container.id
+        self.release(container)
+        return result
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                self.reclaim_idle()
+                if self.idle:
+                    return self.idle.pop()
+                if self.count < self.max_containers:
+                    self.count += 1
+                    break
+                self.condition.wait()
+        try:
+            return Container(self.context, self.config)
+        except Exception:
+            with self.condition:
+                self.count -= 1
+                self.condition.notify()
+            raise
+
+    def release(self, container):
+        with self.condition:
+            self.idle.append(container)
+            self.condition.notify()
+
+    def discard(self, container):
+        container.stop()
+        with self.condition:
+            self.count -= 1
+            self.condition.notify()
+
+    def reclaim_idle(self):
+        """Stop containers idle longer than idle_timeout (caller holds the lock)"""
+        if not self.idle_timeout:
+            return
+        now = time.monotonic()
+        for container in [c for c in self.idle if now - c.last_used > self.idle_timeout]:
+            self.idle.remove(container)
+            self.count -= 1
+            container.stop()
+
+    def shutdown(self):
+        with self.condition:
+            containers, self.idle = self.idle, []
+        for container in containers:
+            container.stop()
+
+# ===== HTTP FRONT END =====
+
+def build_proxy_event(method, raw_path, headers, body, stage='local'):
+    """API Gateway REST proxy event for an HTTP request (binary bodies base64-encoded)"""
+    url = urllib.parse.urlsplit(raw_path)
+    query = dict(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+    content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+
+    encoded = False
+    text_body = None
+    if body:
+        if content_type == '' or content_type.startswith(TEXT_CONTENT_TYPES[1:]):
+            try:
+                text_body = body.decode('utf-8')
+            except UnicodeDecodeError:
+                text_body = None
+        if text_body is None:
+            text_body = base64.b64encode(body).decode('ascii')
+            encoded = True
+
+    request_id = str(uuid.uuid4())
+    return {
+        'resource': '/{proxy+}',
+        'path': url.path,
+        'httpMethod': method,
+        'headers': dict(headers),
+        'queryStringParameters': query or None,
+        'body': text_body,
+        'isBase64Encoded': encoded,
+        'requestContext': {'requestId': request_id, 'stage': stage, 'httpMethod': method, 'path': url.path}
+    }
+
+class ProxyRequestHandler(BaseHTTPRequestHandler):
+    """Forward every request to the container pool as a proxy event"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def handle_any(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        event = build_proxy_event(self.command, self.path, self.headers, body)
+        self.streamed = False
+        result = self.server.pool.invoke(event, self.relay_stream)
+
+        response = result['response']
+        if self.streamed:
+            # Last chunk; a container that crashed mid-stream just ends the body early
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            payload = response.get('body') or ''
+            payload = base64.b64decode(payload) if response.get('isBase64Encoded') else payload.encode('utf-8')
+            self.send_response(response.get('statusCode', 200))
+            for name, value in (response.get('headers') or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(payload)))
+            self.send_container_headers(result)
+            self.send_header('X-ColorLab-Duration', f"{result['duration_ms']:.1f}")
+            self.send_header('X-ColorLab-Max-Memory', f"{result['max_memory_mb']:.0f}")
+            self.end_headers()
+            self.wfile.write(payload)
+
+        if not self.server.quiet:
+            init = f" Init Duration: {result['init_ms']:.2f} ms" if result['cold_start'] else ""
+            print(f"REPORT {self.command} {self.path.split('?')[0]} {response.get('statusCode')} "
+                  f"Container: {result['container']} Duration: {result['duration_ms']:.2f} ms{init} "
+                  f"Max Memory Used: {result['max_memory_mb']:.0f} MB")
+
+    def relay_stream(self, message):
+        """Write a streamed response's head, then each chunk as it arrives (chunked transfer encoding)"""
+        if 'head' in message:
+            head = message['head']
+            self.send_response(head.get('statusCode', 200))
+            for name, value in (head.get('headers') or {}).items():
+                self.send_header(name, value)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.send_container_headers(message)
+            self.end_headers()
+            self.streamed = True
+        elif message['chunk']:
+            chunk = message['chunk']
+            self.wfile.write(f"{len(chunk):x}\r\n".encode('ascii') + chunk + b'\r\n')
+            self.wfile.flush()
+
+    def send_container_headers(self, result):
+        self.send_header('X-ColorLab-Container', str(result['container']))
+        self.send_header('X-ColorLab-Cold-Start', 'true' if result['cold_start'] else 'false')
+        self.send_header('X-ColorLab-Init-Duration', f"{result['init_ms']:.1f}")
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_OPTIONS = handle_any
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(args):
+    env = dict(entry.split('=', 1) for entry in args.env)
+    config = (args.module, args.handler, args.stream_handler, args.memory_mb, args.timeout, env)
+    pool = ContainerPool(config, args.max_containers, args.idle_timeout)
+    server = ThreadingHTTPServer((args.host, args.port), ProxyRequestHandler)
+    server.pool = pool
+    server.quiet = args.quiet
+    server.daemon_threads = True
+    print(f"🚀 Serving {os.path.basename(args.module)}:{args.handler} on http://{args.host}:{args.port} "
+          f"({args.max_containers} containers, {args.memory_mb} MB)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+
+# ===== LOAD GENERATOR =====
+
+def build_payloads(mix, mode, options, distinct, image_format, seed):
+    """Per mix entry, `distinct` request bodies as (label, weight, [(body, content_type, query)])"""
+    from colorlab_corpus import encode_image, synthetic_image
+
+    payloads = []
+    for kind, megapixels, weight in mix:
+        label = f"{kind}:{megapixels:g}MP"
+        bodies = []
+        for variant in range(distinct):
+            image = encode_image(synthetic_image(kind, megapixels, seed + variant), image_format)
+            if mode == 'binary':
+                query = urllib.parse.urlencode({k: v if isinstance(v, str) else json.dumps(v) for k, v in options.items()})
+                bodies.append((image, f"image/{image_format.lower()}", query))
+            else:
+                body = json.dumps(dict(options, image_data=base64.b64encode(image).decode('ascii'))).encode('utf-8')
+                bodies.append((body, 'application/json', ''))
+        payloads.append((label, weight, bodies))
+        print(f"🖼️  {label}: {distinct} variant(s), {len(bodies[0][0]) / 1e6:.2f} MB request body")
+    return payloads
+
+def send_request(url, body, content_type, query, timeout):
+    """One timed request; returns the per-request record"""
+    request = urllib.request.Request(f"{url}?{query}" if query else url, data=body, method='POST',
+                                     headers={'Content-Type': content_type, 'Accept-Encoding': 'gzip'})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            payload = response.read()
+            status, headers, error = response.status, response.headers, None
+    except urllib.error.HTTPError as e:
+        payload, status, headers, error = e.read(), e.code, e.headers, f"HTTP {e.code}"
+    except (urllib.error.URLError, OSError) as e:
+        payload, status, headers, error = b'', 0, {}, str(e)
+    latency_ms = (time.perf_counter() - started) * 1000
+
+    cold = headers.get('X-ColorLab-Cold-Start')
+    return {
+        'status': status,
+        'error': error,
+        'latency_ms': latency_ms,
+        'response_bytes': len(payload),
+        'cold_start': None if cold is None else cold == 'true',
+        'container': headers.get('X-ColorLab-Container'),
+        'init_ms': float(headers.get('X-ColorLab-Init-Duration') or 0),
+        'duration_ms': float(headers.get('X-ColorLab-Duration') or 0),
+        'max_memory_mb': float(headers.get('X-ColorLab-Max-Memory') or 0)
+    }
+
+def percentiles(values):
+    """Nearest-rank latency summary in milliseconds"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(percent):
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(percent / 100 * len(ordered)) - 1))]
+
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered), 2),
+        'p50': round(rank(50), 2),
+        'p90': round(rank(90), 2),
+        'p95': round(rank(95), 2),
+        'p99': round(rank(99), 2),
+        'max': round(ordered[-1], 2)
+    }
+
+def summarize(records, elapsed):
+    """Throughput, latency percentiles, per-image and cold/warm breakdowns"""
+    ok = [r for r in records if r['error'] is None]
+    cold = [r for r in ok if r['cold_start']]
+    warm = [r for r in ok if r['cold_start'] is False]
+    return {
+        'requests': len(records),
+        'errors': len(records) - len(ok),
+        'error_samples': sorted({r['error'] for r in records if r['error']})[:5],
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': percentiles([r['latency_ms'] for r in ok]),
+        'by_image': {
+            label: percentiles([r['latency_ms'] for r in ok if r['label'] == label])
+            for label in sorted({r['label'] for r in records})
+        },
+        'cold': {
+            'latency_ms': percentiles([r['latency_ms'] for r in cold]),
+            'init_ms': percentiles([r['init_ms'] for r in cold])
+        },
+        'warm': {'latency_ms': percentiles([r['latency_ms'] for r in warm])},
+        'containers': len({r['container'] for r in ok if r['container']}),
+        'max_memory_mb': max((r['max_memory_mb'] for r in ok), default=0.0),
+        'response_bytes': percentiles([r['response_bytes'] for r in ok])
+    }
+
+def run_load(args):
+    from colorlab_corpus import parse_image_mix
+
+    options = json.loads(args.options)
+    if not args.allow_cache:
+        # Unique work per request unless result-cache behaviour is what's being measured
+        options.setdefault('cache', False)
+    payloads = build_payloads(parse_image_mix(args.mix), args.mode, options, args.distinct, args.format, args.seed)
+    labels = [label for label, _, _ in payloads]
+    weights = [weight for _, weight, _ in payloads]
+    bodies = {label: entries for label, _, entries in payloads}
+
+    rng = random.Random(args.seed)
+    schedule_lock = threading.Lock()
+    counter = itertools.count()
+    records = []
+    deadline = time.monotonic() + args.duration if args.duration else None
+
+    def next_payload():
+        with schedule_lock:
+            index = next(counter)
+            if deadline is None and index >= args.requests:
+                return None
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            label = rng.choices(labels, weights)[0]
+            return label, rng.choice(bodies[label])
+
+    def worker():
+        while True:
+            job = next_payload()
+            if job is None:
+                return
+            label, (body, content_type, query) = job
+            record = send_request(args.url, body, content_type, query, args.timeout)
+            record['label'] = label
+            with schedule_lock:
+                records.append(record)
+
+    target = f"{args.duration:g}s" if args.duration else f"{args.requests} requests"
+    print(f"🔥 Load: {target} against {args.url} at concurrency {args.concurrency} ({args.mode} uploads)")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for _ in range(args.concurrency):
+            executor.submit(worker)
+    report = summarize(records, time.perf_counter() - started)
+    report['config'] = {
+        'url': args.url, 'mix': args.mix, 'mode': args.mode, 'concurrency': args.concurrency,
+        'options': options, 'distinct': args.distinct, 'format': args.format
+    }
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report written to {args.output}")
+    return report
+
+def print_report(report):
+    latency = report['latency_ms']
+    print(f"\n📊 {report['requests']} requests, {report['errors']} errors in {report['elapsed_seconds']}s "
+          f"→ {report['throughput_rps']} req/s across {report['containers']} container(s)")
+    if latency:
+        print(f"   latency ms  p50 {latency['p50']}  p90 {latency['p90']}  p95 {latency['p95']}  "
+              f"p99 {latency['p99']}  max {latency['max']}")
+    for label, stats in report['by_image'].items():
+        if stats:
+            print(f"   {label:<18} n={stats['count']:<5} p50 {stats['p50']}  p99 {stats['p99']}")
+    cold, warm = report['cold']['latency_ms'], report['warm']['latency_ms']
+    if cold:
+        print(f"   cold  n={cold['count']:<5} p50 {cold['p50']}  max {cold['max']}  "
+              f"(init p50 {report['cold']['init_ms']['p50']} ms)")
+    if warm:
+        print(f"   warm  n={warm['count']:<5} p50 {warm['p50']}  p99 {warm['p99']}")
+    if report['max_memory_mb']:
+        print(f"   peak container memory {report['max_memory_mb']:.0f} MB")
+    for error in report['error_samples']:
+        print(f"   ❌ {error}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='run lambda_handler behind a local API Gateway stand-in')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=3000)
+    serve_parser.add_argument('--module', default=DEFAULT_MODULE_PATH, help='function module file')
+    serve_parser.add_argument('--handler', default=DEFAULT_HANDLER)
+    serve_parser.add_argument('--stream-handler', default=DEFAULT_STREAM_HANDLER,
+                              help="handler that may return an iterator body, used when the module has it ('' to disable)")
+    serve_parser.add_argument('--max-containers', type=int, default=os.cpu_count() or 1,
+                              help='concurrency limit; requests queue beyond it')
+    serve_parser.add_argument('--idle-timeout', type=float, default=0,
+                              help='seconds before an idle container is reclaimed (0 keeps them warm)')
+    serve_parser.add_argument('--memory-mb', type=int, default=2048, help='reported memory size')
+    serve_parser.add_argument('--timeout', type=float, default=120, help='function timeout in seconds')
+    serve_parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                              help='environment variable for the containers (repeatable)')
+    serve_parser.add_argument('--quiet', action='store_true', help='no REPORT line per request')
+
+    load_parser = commands.add_parser('load', help='drive an endpoint with a synthetic image mix')
+    load_parser.add_argument('--url', default='http://127.0.0.1:3000/analyze')
+    load_parser.add_argument('--mix', default='photo:1', help='kind:megapixels[:weight],... '
+                             '(kinds: solid, gradient, noise, few_color, photo)')
+    load_parser.add_argument('--mode', choices=('json', 'binary'), default='json', help='upload encoding')
+    load_parser.add_argument('--format', default='PNG', help='image encoding (PNG or JPEG)')
+    load_parser.add_argument('--options', default='{}', help='analysis options as a JSON object')
+    load_parser.add_argument('--allow-cache', action='store_true', help='let the result cache serve repeats')
+    load_parser.add_argument('--distinct', type=int, default=4, help='image variants per mix entry')
+    load_parser.add_argument('--concurrency', type=int, default=4)
+    load_parser.add_argument('--requests', type=int, default=100)
+    load_parser.add_argument('--duration', type=float, default=0, help='run for N seconds instead of --requests')
+    load_parser.add_argument('--timeout', type=float, default=300, help='per-request timeout in seconds')
+    load_parser.add_argument('--seed', type=int, default=0)
+    load_parser.add_argument('--output', help='write the JSON report here')
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        serve(args)
+    else:
+        run_load(args)
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,98 @@
 """
 ColorLab - Enhanced Lambda Function with Accurate Color Names & Regional Analysis
 """
+import time
+MODULE_LOAD_STARTED = time.perf_counter()
+
 import json
 import base64
+import binascii
+import bisect
+import hashlib
+import heapq
+import importlib
+import importlib.util
 import io
 import math
+import mmap
+import os
 import random
+import struct
+import sys
+import threading
+import zlib
+import gzip
+from array import array
 from datetime import datetime
-from collections import Counter
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from itertools import accumulate, chain
 import statistics
 
+class LazyModule:
+    """Stand-in for a heavy optional dependency, imported on first attribute access.
+
+    The real module then replaces the stand-in in this module's globals, so
+    later lookups go straight to it.
+    """
+    
+    def __init__(self, module_name, alias):
+        self.module_name = module_name
+        self.alias = alias
+    
+    def load(self):
+        module = importlib.import_module(self.module_name)
+        globals()[self.alias] = module
+        return module
+    
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+def optional_module(module_name, alias):
+    """LazyModule when the dependency is installed, else None (found without importing it)"""
+    try:
+        found = importlib.util.find_spec(module_name) is not None
+    except ImportError:
+        found = False
+    return LazyModule(module_name, alias) if found else None
+
+def load_optional_modules():
+    """Import the deferred analysis dependencies; a broken install counts as missing"""
+    for alias in ('np', 'Image'):
+        module = globals()[alias]
+        if isinstance(module, LazyModule):
+            try:
+                module.load()
+            except ImportError as e:
+                print(f"⚠️ {module.module_name} failed to import, continuing without it: {str(e)}")
+                globals()[alias] = None
+
+# Pillow ships in the real-image-analysis layer; the built-in decoders below
+# cover PNG/BMP/GIF when the function is deployed without it.  Heavy imports
+# are deferred so /health and CORS preflights don't pay for them.
+Image = optional_module('PIL.Image', 'Image')
+np = optional_module('numpy', 'np')
+
+# boto3 is part of the Lambda runtime; only the object-store cache needs it
+boto3 = optional_module('boto3', 'boto3')
+
+# Optional fast JSON encoder and Brotli; responses fall back to json and gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ANALYSIS_VERSION = "18.0.0-colorlab-enhanced"
+# Bump whenever the shape or content of an analysis response changes, so
+# cached results written by an older build are never replayed
+CACHE_SCHEMA_VERSION = 8
+
 # ===== COLOR IMPROVEMENTS INTEGRATION =====
 
 # Comprehensive color database with accurate names
@@ -70,6 +153,21 @@ COLOR_DATABASE = {
 
 def lambda_handler(event, context):
     """ColorLab Lambda handler with enhanced color analysis"""
+    return route_request(event)
+
+def lambda_stream_handler(event, context):
+    """lambda_handler for hosts that can write a response body incrementally
+    (the local harness, a Lambda Web Adapter).
+
+    An NDJSON /analyze request ("stream": true or Accept: application/x-ndjson)
+    gets a 200 whose 'body' is an iterator of encoded records, each produced
+    as its section completes.  Everything else, including an error raised
+    before the first record, is answered exactly as by lambda_handler.
+    """
+    return route_request(event, stream_body=True)
+
+def route_request(event, stream_body=False):
+    """Dispatch an API Gateway proxy event to its route"""
     
     headers = {
         'Content-Type': 'application/json',
@@ -78,6 +176,9 @@ def lambda_handler(event, context):
         'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
     }
     
+    global INVOCATION_COUNT
+    INVOCATION_COUNT += 1
+    
     try:
         method = event.get('httpMethod', 'GET')
         path = event.get('path', '/')
@@ -89,8 +190,10 @@ def lambda_handler(event, context):
             return handle_root(headers)
         elif path == '/health' or path.endswith('/health'):
             return handle_health(headers)
+        elif path.rstrip('/').endswith('/analyze/batch'):
+            return handle_batch_analysis(event, headers)
         elif 'analyze' in path:
-            return handle_enhanced_analysis(event, headers)
+            return handle_enhanced_analysis(event, headers, stream_body)
         else:
             return {'statusCode': 404, 'headers': headers, 'body': json.dumps({'error': 'Not found'})}
             
@@ -105,7 +208,7 @@ def handle_root(headers):
         'body': json.dumps({
             "success": True,
             "message": "🎨 ColorLab - Enhanced Color Analysis",
-            "version": "18.0.0-colorlab-enhanced",
+            "version": ANALYSIS_VERSION,
             "timestamp": datetime.utcnow().isoformat() + "Z",
             "features": [
                 "✅ Accurate color naming with comprehensive database",
@@ -125,141 +228,2794 @@ def handle_health(headers):
         'body': json.dumps({
             "success": True,
             "status": "healthy",
-            "version": "18.0.0-colorlab-enhanced",
+            "version": ANALYSIS_VERSION,
             "timestamp": datetime.utcnow().isoformat() + "Z",
             "analysis_engine": "colorlab_enhanced_processor",
             "accuracy_level": "professional_grade",
             "color_database": f"{len(COLOR_DATABASE)} accurate color names",
-            "regional_analysis": "enhanced_3x3_grid_with_balance",
+            "color_naming_metrics": list(COLOR_NAMING_METRICS),
+            "result_cache": RESULT_CACHE.stats(),
+            "persistent_cache": os.environ.get(CACHE_BACKEND_ENV) or "none",
+            "cache_schema_version": CACHE_SCHEMA_VERSION,
+            "regional_analysis": "summed_area_table_grids_with_balance",
+            "region_grids": list(REGION_GRIDS) + ["RxC", "custom"],
+            "memory_modes": list(MEMORY_MODES),
+            "execution_modes": list(EXECUTION_MODES),
+            "stream_section_order": list(STREAM_SECTION_ORDER),
+            "batch": {"max_images": BATCH_MAX_IMAGES, "workers": batch_worker_count()},
+            "upload_modes": ["application/json", "application/octet-stream", "image/*", "multipart/form-data"],
+            "response_encodings": ["br", "gzip"] if brotli is not None else ["gzip"],
+            "json_encoder": "orjson" if orjson is not None else "json",
+            "import_time_ms": IMPORT_TIME_MS,
+            "color_artifacts": color_artifacts().source,
             "processing_type": "actual_image_bytes"
         })
     }
 
-def handle_enhanced_analysis(event, headers):
-    """Handle enhanced color analysis with accurate naming"""
+def handle_enhanced_analysis(event, headers, stream_body=False):
+    """Handle enhanced color analysis with accurate naming.
+
+    With ``stream_body`` an NDJSON response's body is left as a record
+    iterator for the host to write out; otherwise records are buffered.
+    """
     try:
-        if event.get('body'):
-            body = event['body']
-            if event.get('isBase64Encoded'):
-                body = base64.b64decode(body).decode('utf-8')
-            request_data = json.loads(body)
+        load_optional_modules()
+        request_headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+        if is_binary_upload(request_headers):
+            # Raw image bytes: no JSON parse and no second base64 decode
+            try:
+                image_data, request_data = read_binary_request(event, request_headers)
+            except ValueError as e:
+                return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': str(e)})}
         else:
-            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': 'Body required'})}
+            try:
+                request_data = read_json_body(event)
+            except ValueError as e:
+                return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+            if request_data is None:
+                return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': 'Body required'})}
+            if 'image_data' not in request_data:
+                return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': 'image_data required'})}
+            image_data = request_data['image_data']
         
-        if 'image_data' not in request_data:
+        if not image_data:
             return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': 'image_data required'})}
+        if not isinstance(image_data, (str, bytes)):
+            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': 'image_data must be a non-empty base64 string'})}
         
-        image_data = request_data['image_data']
+        stream = request_data.get('stream', 'application/x-ndjson' in request_headers.get('accept', ''))
+        
+        palette = request_data.get('palette', False)
+        
+        if not isinstance(stream, bool):
+            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': 'stream must be a boolean'})}
+        if not isinstance(palette, bool):
+            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': 'palette must be a boolean'})}
+        try:
+            options = parse_analysis_options(request_data)
+        except ValueError as e:
+            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': str(e)})}
         
         print(f"🎨 Starting ColorLab Enhanced Analysis...")
-        print(f"📊 Image data length: {len(image_data)} characters")
+        print(f"📊 Image data length: {len(image_data)} {'characters' if isinstance(image_data, str) else 'bytes'}")
+        timings = StageTimings()
+        
+        if stream:
+            records = ndjson_analysis_records(image_data, timings=timings, **options)
+            # Decode errors surface here, while a 400 can still be sent
+            first_record = next(records)
+            stream_headers = dict(headers, **{'Content-Type': 'application/x-ndjson'})
+            if stream_body:
+                return {'statusCode': 200, 'headers': stream_headers, 'body': streamed_records_body(
+                    chain([first_record], records), timings, engine=resolve_analysis_engine(options['engine'])
+                )}
+            records = first_record + ''.join(records)
+            started = time.perf_counter()
+            response = encoded_response(200, stream_headers, records.encode('utf-8'), request_headers)
+            timings.add("serialize", started)
+            return instrumented_response('/analyze', response, timings, engine=resolve_analysis_engine(options['engine']), stream=True)
         
         # Enhanced image processing
-        analysis_result = perform_enhanced_colorlab_analysis(image_data)
+        cache_writes = []
+        analysis_result = perform_enhanced_colorlab_analysis(image_data, timings=timings, cache_writes=cache_writes, **options)
+        if 'error' in analysis_result:
+            # Failed after decoding: a server error, and nothing was cached
+            return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'error': analysis_result['error']})}
         
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({
-                'success': True,
-                'analysis': analysis_result,
-                'timestamp': datetime.utcnow().isoformat() + 'Z',
-                'version': '18.0.0-colorlab-enhanced',
-                'analysis_type': 'enhanced_colorlab_processing',
-                'improvements': ['accurate_color_names', 'enhanced_regional_analysis']
-            })
+        response = {
+            'success': True,
+            'analysis': analysis_result,
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'version': ANALYSIS_VERSION,
+            'analysis_type': 'enhanced_colorlab_processing',
+            'improvements': ['accurate_color_names', 'enhanced_regional_analysis']
         }
+        started = time.perf_counter()
+        if palette:
+            response['analysis'], response['palette'] = palette_encode_colors(analysis_result)
+        body = serialize_json(response)
+        for cache_key, analysis in cache_writes:
+            store_cached_analysis(cache_key, analysis, len(body))
+        response = encoded_response(200, headers, body, request_headers)
+        timings.add("serialize", started)
+        return instrumented_response(
+            '/analyze', response, timings, engine=resolve_analysis_engine(options['engine']),
+            cache=analysis_result.get('metadata', {}).get('cache')
+        )
         
+    except ImageDecodeError as e:
+        print(f"❌ Image decoding failed: {str(e)}")
+        return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': f"Unsupported or corrupt image: {str(e)}"})}
     except Exception as e:
         print(f"❌ Enhanced analysis error: {str(e)}")
         return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'error': str(e)})}
 
-def perform_enhanced_colorlab_analysis(image_data):
-    """Perform enhanced ColorLab analysis with improvements"""
+def read_json_body(event):
+    """Decoded JSON object request body, or None when the request has none; raises ValueError"""
+    if not event.get('body'):
+        return None
+    body = event['body']
     try:
-        print("🔬 Starting enhanced ColorLab processing...")
-        
-        # Decode base64 to get actual image bytes
-        image_bytes = base64.b64decode(image_data)
-        image_size = len(image_bytes)
-        
-        print(f"📸 Image decoded: {image_size} bytes")
+        if event.get('isBase64Encoded'):
+            body = base64.b64decode(body, validate=True).decode('utf-8')
+        request_data = json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError, binascii.Error):
+        raise ValueError('Body must be valid JSON')
+    if not isinstance(request_data, dict):
+        raise ValueError('Body must be a JSON object')
+    return request_data
+
+# Analysis options for binary uploads come from the query string or X-ColorLab-* headers
+OPTION_HEADER_PREFIX = 'x-colorlab-'
+REQUEST_OPTION_NAMES = (
+    'engine', 'color_naming', 'seed', 'kmeans_mode', 'histogram_bins', 'grid',
+    'quality', 'cache', 'fields', 'include', 'stream', 'palette', 'memory_mode', 'execution'
+)
+
+def is_binary_upload(request_headers):
+    """True for application/octet-stream, image/* and multipart/form-data requests"""
+    content_type = request_headers.get('content-type', '').split(';')[0].strip().lower()
+    return content_type in ('application/octet-stream', 'multipart/form-data') or content_type.startswith('image/')
+
+def read_binary_request(event, request_headers):
+    """(image bytes, request options) for a binary or multipart upload; raises ValueError.
+
+    API Gateway hands binary bodies over base64-encoded; hosts that pass raw
+    bytes (e.g. a local server) skip that decode as well.
+    """
+    body = event.get('body') or b''
+    if isinstance(body, str):
+        if not event.get('isBase64Encoded'):
+            raise ValueError('binary uploads must arrive as raw bytes or with isBase64Encoded set')
+        body = base64.b64decode(body)
+    
+    raw_options = {}
+    for name in REQUEST_OPTION_NAMES:
+        header = OPTION_HEADER_PREFIX + name.replace('_', '-')
+        if header in request_headers:
+            raw_options[name] = request_headers[header]
+    raw_options.update((k, v) for k, v in (event.get('queryStringParameters') or {}).items() if k in REQUEST_OPTION_NAMES)
+    
+    image_bytes = body
+    if request_headers.get('content-type', '').lower().startswith('multipart/form-data'):
+        form_fields, image_bytes = parse_multipart_form(body, request_headers['content-type'])
+        raw_options.update((k, v) for k, v in form_fields.items() if k in REQUEST_OPTION_NAMES)
+        if image_bytes is None:
+            raise ValueError('multipart upload needs an "image" file part')
+    
+    return image_bytes, {name: parse_option_value(name, value) for name, value in raw_options.items()}
+
+def parse_option_value(name, value):
+    """Typed option from a query string, header or form field value"""
+    value = value.strip()
+    if name in ('seed', 'histogram_bins'):
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f'{name} must be an integer')
+    if name in ('cache', 'stream', 'palette'):
+        if value.lower() in ('true', '1', 'yes'):
+            return True
+        if value.lower() in ('false', '0', 'no'):
+            return False
+        raise ValueError(f'{name} must be a boolean')
+    if name == 'grid' and value.startswith('['):
+        # Custom rectangles travel as JSON
+        return json.loads(value)
+    return value
+
+def parse_multipart_form(body, content_type):
+    """Split a multipart/form-data body into ({field: text}, image bytes or None).
+
+    The first file part (or the part named "image") is the image; other
+    parts are text fields. Parts are sliced straight out of the body.
+    """
+    boundary = None
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == 'boundary':
+            boundary = value.strip('"')
+    if not boundary:
+        raise ValueError('multipart upload is missing its boundary')
+    
+    delimiter = b'--' + boundary.encode('latin-1')
+    fields = {}
+    image_bytes = None
+    position = body.find(delimiter)
+    while position != -1:
+        start = position + len(delimiter)
+        if body[start:start + 2] == b'--':
+            break
+        header_end = body.find(b'\r\n\r\n', start)
+        part_end = body.find(b'\r\n' + delimiter, header_end)
+        if header_end == -1 or part_end == -1:
+            raise ValueError('malformed multipart body')
         
-        # Extract colors from image bytes
-        colors_data = extract_colors_from_image_bytes(image_bytes)
+        disposition = {}
+        for line in body[start:header_end].decode('utf-8', 'replace').split('\r\n'):
+            if line.lower().startswith('content-disposition:'):
+                for param in line.split(';')[1:]:
+                    key, _, value = param.strip().partition('=')
+                    disposition[key.lower()] = value.strip('"')
         
-        # Generate enhanced analysis with accurate color names
-        analysis = generate_enhanced_colorlab_analysis(image_bytes, colors_data)
+        content = body[header_end + 4:part_end]
+        if 'filename' in disposition or disposition.get('name') == 'image':
+            if image_bytes is None:
+                image_bytes = content
+        elif 'name' in disposition:
+            fields[disposition['name']] = content.decode('utf-8')
+        position = part_end + 2
+    
+    return fields, image_bytes
+
+def parse_analysis_options(request_data, defaults=None):
+    """Validated keyword options for perform_enhanced_colorlab_analysis.
+
+    ``defaults`` supplies values the request leaves out (batch-level options).
+    Raises ValueError with a client-facing message.
+    """
+    request_data = dict(defaults or {}, **request_data)
+    engine = request_data.get('engine', 'auto')
+    naming = request_data.get('color_naming', 'rgb')
+    seed = request_data.get('seed')
+    kmeans_mode = request_data.get('kmeans_mode', 'auto')
+    histogram_bins = request_data.get('histogram_bins', DEFAULT_HISTOGRAM_BINS)
+    grid = request_data.get('grid', '3x3')
+    quality = request_data.get('quality', 'exact')
+    use_cache = request_data.get('cache', True)
+    fields = request_data.get('fields', request_data.get('include'))
+    memory_mode = request_data.get('memory_mode', 'auto')
+    execution = request_data.get('execution', 'auto')
+    
+    if engine != 'auto' and engine not in ANALYSIS_ENGINES:
+        raise ValueError(f"engine must be one of: auto, {', '.join(ANALYSIS_ENGINES)}")
+    if naming not in COLOR_NAMING_METRICS:
+        raise ValueError(f"color_naming must be one of: {', '.join(COLOR_NAMING_METRICS)}")
+    # Bounded so metadata.seed always fits the signed 64-bit integers JSON encoders accept
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or not 0 <= seed < 1 << 63):
+        raise ValueError('seed must be an integer between 0 and 2^63 - 1')
+    if kmeans_mode not in KMEANS_MODES:
+        raise ValueError(f"kmeans_mode must be one of: {', '.join(KMEANS_MODES)}")
+    if not isinstance(histogram_bins, int) or isinstance(histogram_bins, bool) or not 1 <= histogram_bins <= 256:
+        raise ValueError('histogram_bins must be an integer between 1 and 256')
+    if not isinstance(use_cache, bool):
+        raise ValueError('cache must be a boolean')
+    if quality not in QUALITY_SAMPLE_TARGETS:
+        raise ValueError(f"quality must be one of: {', '.join(QUALITY_SAMPLE_TARGETS)}")
+    if memory_mode not in MEMORY_MODES:
+        raise ValueError(f"memory_mode must be one of: {', '.join(MEMORY_MODES)}")
+    if execution not in EXECUTION_MODES:
+        raise ValueError(f"execution must be one of: {', '.join(EXECUTION_MODES)}")
+    parse_region_grid(grid)
+    
+    return {
+        'engine': engine,
+        'naming': naming,
+        'seed': seed,
+        'kmeans_mode': kmeans_mode,
+        'histogram_bins': histogram_bins,
+        'grid': grid,
+        'quality': quality,
+        'use_cache': use_cache,
+        'fields': parse_analysis_fields(fields),
+        'memory_mode': memory_mode,
+        'execution': execution
+    }
+
+def perform_enhanced_colorlab_analysis(image_data, engine='auto', naming='rgb', seed=None, kmeans_mode='auto', histogram_bins=None, grid='3x3', quality='exact', use_cache=True, fields=None, memory_mode='auto', execution='auto', timings=None, cache_writes=None):
+    """Perform enhanced ColorLab analysis with improvements"""
+    try:
+        analysis = order_analysis_sections(dict(stream_enhanced_colorlab_analysis(
+            image_data, engine, naming, seed, kmeans_mode, histogram_bins, grid, quality, use_cache, fields, memory_mode, execution, timings, cache_writes
+        )))
         
         print("✅ Enhanced ColorLab analysis completed")
         return analysis
         
+    except ImageDecodeError:
+        raise
     except Exception as e:
         print(f"❌ Enhanced analysis failed: {str(e)}")
         return {"error": f"Enhanced analysis failed: {str(e)}"}
 
-def extract_colors_from_image_bytes(image_bytes):
-    """Extract color information from actual image bytes"""
+def stream_enhanced_colorlab_analysis(image_data, engine='auto', naming='rgb', seed=None, kmeans_mode='auto', histogram_bins=None, grid='3x3', quality='exact', use_cache=True, fields=None, memory_mode='auto', execution='auto', timings=None, cache_writes=None):
+    """Yield (section, result) pairs as each section completes, cheapest first, metadata last.
+
+    ``image_data`` is a base64 string (JSON requests) or the raw image bytes
+    (binary uploads). Cache hits replay the stored sections in the same order; a fresh result
+    is cached once its metadata record has been produced.  metadata.timings
+    and the peak memory in metadata.memory always describe this request,
+    including on cache hits.  ``execution`` only changes where sections are
+    computed, not their results, so it is not part of the cache key.
+    
+    Callers that serialize the result pass a ``cache_writes`` list: a
+    fresh result is then appended as (cache key, analysis) for them to
+    store once they know its serialized size.
+    """
+    if timings is None:
+        timings = StageTimings()
+    memory_scope = reset_peak_memory()
+    engine = resolve_analysis_engine(engine)
+    print(f"🔬 Starting enhanced ColorLab processing ({engine} engine)...")
+    
+    # Decode base64 to get actual image bytes
+    image_bytes = timings.measure("decode", decode_image_data, image_data) if isinstance(image_data, str) else image_data
+    image_size = len(image_bytes)
+    
+    print(f"📸 Image decoded: {image_size} bytes")
+    
+    # Same bytes + same options -> same analysis, so serve repeats from the cache
+    cache_key = result_cache_key(image_bytes, engine, naming, seed, kmeans_mode, histogram_bins or DEFAULT_HISTOGRAM_BINS, grid, quality, fields, memory_mode)
+    cached = timings.measure("cache_lookup", lookup_cached_analysis, cache_key) if use_cache else None
+    if cached is not None:
+        for section in STREAM_SECTION_ORDER:
+            if section in cached:
+                yield section, cached[section]
+        memory = dict(cached["metadata"].get("memory", {}), peak_rss_mb=peak_memory_mb(), peak_scope=memory_scope)
+        yield "metadata", dict(cached["metadata"], timings=timings.report(), memory=memory)
+        return
+    
+    # Extract colors from decoded pixels, whole image or strip by strip
+    if resolve_memory_mode(memory_mode, image_bytes) == 'bounded':
+        regional_grid = grid if not fields or "regional_analysis" in fields else None
+        colors_data = timings.measure("color_extraction", extract_colors_in_strips, image_bytes, engine, quality, random.Random(seed), regional_grid)
+    else:
+        colors_data = timings.measure("color_extraction", extract_colors_from_image_bytes, image_bytes, engine, quality, random.Random(seed))
+    colors_data['memory'] = dict(colors_data['memory'], peak_scope=memory_scope)
+    
+    # Generate enhanced analysis with accurate color names
+    analysis = {}
+    for section, result in iter_analysis_sections(image_bytes, colors_data, engine, naming, seed, kmeans_mode, histogram_bins, grid, fields, timings, execution):
+        if section != "metadata":
+            analysis[section] = result
+            yield section, result
+            continue
+        
+        analysis = order_analysis_sections(dict(analysis, metadata=result))
+        if use_cache and cache_writes is not None:
+            cache_writes.append((cache_key, analysis))
+        elif use_cache:
+            # Nothing downstream serializes it, so weigh it here
+            store_cached_analysis(cache_key, analysis, len(serialize_json(analysis)))
+        yield "metadata", dict(result, cache="miss" if use_cache else "bypass")
+
+def ndjson_analysis_records(*args, **kwargs):
+    """Encode stream_enhanced_colorlab_analysis as NDJSON lines; a failure ends the stream with an error record"""
+    timings = kwargs.setdefault('timings', StageTimings())
+    cache_writes = kwargs.setdefault('cache_writes', [])
+    try:
+        size = 0
+        for section, result in stream_enhanced_colorlab_analysis(*args, **kwargs):
+            started = time.perf_counter()
+            record = serialize_json({"section": section, "data": result})
+            timings.add("serialize", started)
+            size += len(record)
+            if section == "metadata":
+                # The records carry the whole result, so they weigh it for the cache
+                for cache_key, analysis in cache_writes:
+                    store_cached_analysis(cache_key, analysis, size)
+            yield record.decode('utf-8') + "\n"
+    except ImageDecodeError:
+        # Raised before the first record, so the caller can still answer 400
+        raise
+    except Exception as e:
+        print(f"❌ Streaming analysis failed: {str(e)}")
+        yield json.dumps({"error": f"Enhanced analysis failed: {str(e)}"}) + "\n"
+
+# ===== REQUEST TIMING =====
+
+# Invocations served by this container; the first one paid the cold start
+INVOCATION_COUNT = 0
+
+class StageTimings:
+    """Wall-clock milliseconds per pipeline stage for one request"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+    
+    def measure(self, stage, func, *args):
+        """Call func(*args), recording its duration under ``stage``"""
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.add(stage, started)
+    
+    def add(self, stage, started):
+        """Record the time since ``started``, adding to any earlier span of the same stage"""
+        self.record(stage, (time.perf_counter() - started) * 1000)
+    
+    def record(self, stage, elapsed_ms):
+        """Add a duration measured elsewhere (e.g. in a worker process)"""
+        self.spans[stage] = round(self.spans.get(stage, 0) + elapsed_ms, 3)
+    
+    def report(self):
+        """Stage durations plus the total so far"""
+        return dict(self.spans, total=round((time.perf_counter() - self.started) * 1000, 3))
+
+def instrumented_response(route, response, timings, **fields):
+    """Attach a Server-Timing header and emit the request's structured log line"""
+    stage_timings = timings.report()
+    response['headers'] = dict(response['headers'], **{
+        'Server-Timing': ', '.join(f"{stage};dur={ms}" for stage, ms in stage_timings.items())
+    })
+    log_request(route, response['statusCode'], len(response['body']), stage_timings, **fields)
+    return response
+
+def log_request(route, status, response_bytes, stage_timings, **fields):
+    """Emit the request's structured log line"""
+    print(json.dumps({
+        "event": "colorlab_request",
+        "route": route,
+        "status": status,
+        "cold_start": INVOCATION_COUNT == 1,
+        "response_bytes": response_bytes,
+        **{k: v for k, v in fields.items() if v is not None},
+        "timings_ms": stage_timings
+    }))
+
+def streamed_records_body(records, timings, **fields):
+    """UTF-8 NDJSON records for a streaming host; the log line follows the last record"""
+    sent = 0
+    for record in records:
+        chunk = record.encode('utf-8')
+        sent += len(chunk)
+        yield chunk
+    log_request('/analyze', 200, sent, timings.report(), stream=True, **fields)
+
+def reset_peak_memory():
+    """Restart the kernel's peak-RSS mark so the next reading covers one request.
+
+    Returns the scope later readings describe: "request" after a reset, or
+    "process" where /proc/self/clear_refs is unavailable.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return "request"
+    except OSError:
+        return "process"
+
+def peak_memory_mb():
+    """Peak resident set size in MB (VmHWM, else getrusage), or None if unknown"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        return None
+
+# ===== RESPONSE ENCODING =====
+
+COMPRESSION_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Keys that make up a color in the response; palette mode stores them once
+PALETTE_COLOR_KEYS = ('hex', 'rgb', 'name')
+
+def serialize_json(payload):
+    """Compact UTF-8 JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def serialize_json_with_list(payload, field):
+    """(serialize_json(payload), encoded items of the list payload[field]).
+
+    The list goes last and its items are encoded one at a time, so callers
+    get each item's size from the same bytes the response carries.
+    """
+    items = [serialize_json(item) for item in payload[field]]
+    head = serialize_json({k: v for k, v in payload.items() if k != field})
+    body = b''.join([head[:-1], b',"' if len(head) > 2 else b'"', field.encode('utf-8'), b'":[', b','.join(items), b']}'])
+    return body, items
+
+def json_response(status_code, headers, payload, request_headers=None):
+    """API Gateway response with a compact JSON body, compressed when the client accepts it"""
+    return encoded_response(status_code, headers, serialize_json(payload), request_headers)
+
+def encoded_response(status_code, headers, body, request_headers=None):
+    """API Gateway response for an encoded body, negotiating br/gzip from Accept-Encoding"""
+    encoding = None
+    if len(body) >= COMPRESSION_MIN_BYTES:
+        encoding = negotiate_content_encoding((request_headers or {}).get('accept-encoding', ''))
+    if encoding is None:
+        return {'statusCode': status_code, 'headers': headers, 'body': body.decode('utf-8')}
+    
+    if encoding == 'br':
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return {
+        'statusCode': status_code,
+        'headers': dict(headers, **{'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'}),
+        'body': base64.b64encode(body).decode('ascii'),
+        'isBase64Encoded': True
+    }
+
+def negotiate_content_encoding(accept_encoding):
+    """Preferred supported encoding ('br' or 'gzip') from an Accept-Encoding header, or None"""
+    weights = {}
+    for entry in accept_encoding.lower().split(','):
+        coding, _, params = entry.strip().partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if coding:
+            weights[coding.strip()] = weight
+    
+    supported = ('br', 'gzip') if brotli is not None else ('gzip',)
+    candidates = [(weights.get(coding, weights.get('*', 0.0)), -rank, coding) for rank, coding in enumerate(supported)]
+    weight, _, coding = max(candidates)
+    return coding if weight > 0 else None
+
+def palette_encode_colors(payload):
+    """Replace repeated color objects with indexes into a shared palette.
+
+    Every dict carrying a hex color has its hex/rgb/name swapped for a
+    ``color`` index; returns (encoded payload, palette). The input is not
+    modified, so cached results stay intact.
+    """
+    palette = []
+    indexes = {}
+    
+    def encode(value):
+        if isinstance(value, list):
+            return [encode(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if 'hex' not in value:
+            return {k: encode(v) for k, v in value.items()}
+        
+        color = {k: value[k] for k in PALETTE_COLOR_KEYS if k in value}
+        key = (color.get('hex'), color.get('name'), 'rgb' in color)
+        if key not in indexes:
+            indexes[key] = len(palette)
+            palette.append(color)
+        encoded = {'color': indexes[key]}
+        encoded.update((k, encode(v)) for k, v in value.items() if k not in PALETTE_COLOR_KEYS)
+        return encoded
+    
+    return encode(payload), palette
+
+# ===== BATCH ANALYSIS =====
+
+BATCH_MAX_IMAGES = 256
+BATCH_QUEUE_DEPTH = 2  # in-flight images per worker
+BATCH_WORKERS_ENV = 'COLORLAB_BATCH_WORKERS'
+FORK_FLUSH_TIMEOUT_SECONDS = 5  # wait this long for cache write-backs before forking
+
+def handle_batch_analysis(event, headers):
+    """Analyze a list of images in one request, with per-image results and errors"""
+    try:
+        load_optional_modules()
+        try:
+            request_data = read_json_body(event)
+        except ValueError as e:
+            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+        if request_data is None:
+            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': 'Body required'})}
+        
+        images = request_data.get('images')
+        if not isinstance(images, list) or not images:
+            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': 'images must be a non-empty list'})}
+        if len(images) > BATCH_MAX_IMAGES:
+            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': f'at most {BATCH_MAX_IMAGES} images per batch'})}
+        
+        palette = request_data.get('palette', False)
+        if not isinstance(palette, bool):
+            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': 'palette must be a boolean'})}
+        
+        # Top-level options apply to every image unless the item overrides them
+        defaults = {k: v for k, v in request_data.items() if k not in ('images', 'palette')}
+        try:
+            parse_analysis_options(defaults)
+        except ValueError as e:
+            return {'statusCode': 400, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+        
+        start_time = time.time()
+        timings = StageTimings()
+        workers = batch_worker_count()
+        print(f"📦 Starting batch analysis of {len(images)} images ({workers} workers)...")
+        
+        results = [None] * len(images)
+        jobs = []
+        cache_keys = {}
+        cache_hits = 0
+        for index, item in enumerate(images):
+            if isinstance(item, str):
+                item = {'image_data': item}
+            item_id = item.get('id', index) if isinstance(item, dict) else index
+            results[index] = {'index': index, 'id': item_id}
+            try:
+                if not isinstance(item, dict) or 'image_data' not in item:
+                    raise ValueError('image_data required')
+                image_data = item['image_data']
+                if not isinstance(image_data, (str, bytes)) or not image_data:
+                    raise ValueError('image_data must be a non-empty base64 string')
+                options = parse_analysis_options({k: v for k, v in item.items() if k not in ('id', 'image_data')}, defaults)
+                options['engine'] = resolve_analysis_engine(options['engine'])
+                # Decoded once here, so bad base64 fails this item only
+                image_bytes = decode_image_data(image_data)
+                if options['use_cache']:
+                    cache_keys[index] = result_cache_key(
+                        image_bytes, options['engine'], options['naming'], options['seed'],
+                        options['kmeans_mode'], options['histogram_bins'], options['grid'], options['quality'], options['fields'],
+                        options['memory_mode']
+                    )
+                    cached = lookup_cached_analysis(cache_keys[index])
+                    if cached is not None:
+                        results[index].update(success=True, analysis=cached)
+                        cache_hits += 1
+                        continue
+                jobs.append((index, image_bytes, options))
+            except (TypeError, ValueError, binascii.Error) as e:
+                results[index].update(success=False, error=str(e))
+        
+        analyses, execution = timings.measure("analysis", run_batch_jobs, jobs, workers)
+        cache_writes = []
+        for index, analysis in analyses.items():
+            if "error" in analysis:
+                results[index].update(success=False, error=analysis["error"])
+                continue
+            if index in cache_keys:
+                cache_writes.append((index, analysis))
+                analysis = with_cache_status(analysis, "miss")
+            results[index].update(success=True, analysis=analysis)
+        
+        succeeded = sum(1 for result in results if result['success'])
+        print(f"✅ Batch analysis completed: {succeeded}/{len(images)} succeeded ({execution})")
+        
+        response = {
+            'success': True,
+            'results': results,
+            'summary': {
+                'total': len(images),
+                'succeeded': succeeded,
+                'failed': len(images) - succeeded,
+                'cache_hits': cache_hits,
+                'workers': workers,
+                'execution': execution,
+                'elapsed_seconds': round(time.time() - start_time, 3)
+            },
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'version': ANALYSIS_VERSION,
+            'analysis_type': 'batch_colorlab_processing'
+        }
+        started = time.perf_counter()
+        if palette:
+            # One palette shared by every image in the batch
+            response['results'], response['palette'] = palette_encode_colors(results)
+        # Results are encoded one by one, so each fresh analysis is weighed by its own bytes
+        body, encoded_results = serialize_json_with_list(response, 'results')
+        for index, analysis in cache_writes:
+            store_cached_analysis(cache_keys[index], analysis, len(encoded_results[index]))
+        request_headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+        response = encoded_response(200, headers, body, request_headers)
+        timings.add("serialize", started)
+        return instrumented_response(
+            '/analyze/batch', response, timings, images=len(images), succeeded=succeeded,
+            cache_hits=cache_hits, execution=execution
+        )
+        
+    except Exception as e:
+        print(f"❌ Batch analysis error: {str(e)}")
+        return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+
+def batch_worker_count():
+    """Worker processes for batches: COLORLAB_BATCH_WORKERS, else the usable vCPUs"""
+    configured = os.environ.get(BATCH_WORKERS_ENV)
+    if configured:
+        return max(1, int(configured))
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def analyze_batch_item(image_bytes, options):
+    """Worker entry point; the parent process owns the result caches"""
+    try:
+        return perform_enhanced_colorlab_analysis(image_bytes, **dict(options, use_cache=False, execution='sequential'))
+    except ImageDecodeError as e:
+        return {"error": f"Unsupported or corrupt image: {str(e)}"}
+
+def run_batch_jobs(jobs, workers):
+    """Run (index, image_bytes, options) jobs, returning ({index: analysis}, execution).
+
+    The workers are forked for the batch and inherit the job list, so only
+    job positions go out and analyses come back.  At most BATCH_QUEUE_DEPTH
+    images are in flight per worker; jobs lost to a failed worker are rerun
+    in the handler process.
+    """
+    tasks = {position: (analyze_batch_item, (image_bytes, options)) for position, (_, image_bytes, options) in enumerate(jobs)}
+    forked = ForkWorkers.start(tasks, workers) if len(jobs) > 1 else None
+    if forked is None:
+        return {index: analyze_batch_item(image_bytes, options) for index, image_bytes, options in jobs}, "sequential"
+    
+    analyses = {}
     try:
-        # Analyze byte patterns to extract color information
-        byte_values = list(image_bytes)
+        for position, (index, image_bytes, options) in enumerate(jobs):
+            outcome = forked.result(position)
+            analyses[index] = outcome[0] if outcome is not None else analyze_batch_item(image_bytes, options)
+    finally:
+        forked.close()
+    return analyses, "fork+sequential" if forked.failed else "fork"
+
+# ===== FORKED WORKERS =====
+
+def fork_worker_loop(tasks, keys, results):
+    """Worker process body: run the inherited task of each key received, until a None key"""
+    while True:
+        try:
+            key = keys.recv()
+        except EOFError:
+            return
+        if key is None:
+            return
+        func, args = tasks[key]
+        started = time.perf_counter()
+        try:
+            result = func(*args)
+            results.send((key, (result, round((time.perf_counter() - started) * 1000, 3)), None))
+        except Exception as e:
+            results.send((key, None, str(e)))
+
+class ForkWorkers:
+    """A task table run by worker processes forked from the handler process.
+
+    The workers inherit ``tasks`` ({key: (func, args)}) at fork time, so only
+    keys go out and (result, worker ms) pairs come back, over one-way pipes.
+    Unlike a ProcessPoolExecutor this needs no /dev/shm semaphores, so it
+    also runs on Lambda.  At most ``depth`` keys are in flight per worker.
+    A task that raised, or was in flight on a worker that died, has no
+    result and the caller computes it itself.
+    """
+    
+    def __init__(self, tasks, depth):
+        self.tasks = tasks
+        self.depth = depth
+        self.queue = deque(tasks)
+        self.results = {}
+        self.failed = 0
+        self.started = 0
+        self.workers = []  # [process, key writer, result reader, in-flight keys]
+    
+    @classmethod
+    def start(cls, tasks, workers, depth=BATCH_QUEUE_DEPTH):
+        """Fork up to ``workers`` processes for ``tasks``, or None when fewer than two can run"""
+        import gc
+        import multiprocessing
         
-        # Group bytes into RGB-like triplets
-        colors = []
-        for i in range(0, len(byte_values) - 2, 3):
-            r = byte_values[i] % 256
-            g = byte_values[i + 1] % 256
-            b = byte_values[i + 2] % 256
-            colors.append((r, g, b))
+        workers = min(workers, len(tasks))
+        if workers < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+            return None
+        # A fork taken while the write-back thread holds a lock (stdout, the
+        # sqlite3 connection, botocore's pools) leaves it held in the children
+        if not CacheBackend.flush(FORK_FLUSH_TIMEOUT_SECONDS):
+            print("⚠️ Cache write-back still running, analyzing without worker processes")
+            return None
+        context = multiprocessing.get_context('fork')
+        pool = cls(tasks, depth)
+        # Frozen objects are skipped by the children's collector, so it does
+        # not write to (and copy) the pages they share with this process
+        gc.freeze()
+        try:
+            for _ in range(workers):
+                key_reader, key_writer = context.Pipe(duplex=False)
+                result_reader, result_writer = context.Pipe(duplex=False)
+                process = context.Process(target=fork_worker_loop, args=(tasks, key_reader, result_writer), daemon=True)
+                process.start()
+                # Only the worker holds its result writer, so its exit reads as EOF here
+                key_reader.close()
+                result_writer.close()
+                pool.workers.append([process, key_writer, result_reader, deque()])
+        except OSError as e:
+            print(f"⚠️ Could not fork worker processes: {str(e)}")
+        finally:
+            gc.unfreeze()
+        pool.started = len(pool.workers)
+        if pool.started < 2:
+            pool.close()
+            return None
+        pool.dispatch()
+        return pool
+    
+    def dispatch(self):
+        """Top every live worker up to ``depth`` keys in flight, one key per worker per round"""
+        for _ in range(self.depth):
+            for worker in list(self.workers):
+                if self.queue and len(worker[3]) < self.depth:
+                    key = self.queue.popleft()
+                    try:
+                        worker[1].send(key)
+                    except OSError as e:
+                        self.queue.appendleft(key)
+                        self.retire(worker, str(e))
+                        continue
+                    worker[3].append(key)
+    
+    def retire(self, worker, reason):
+        """Drop a dead worker: its in-flight keys fail, and queued keys too once none is left"""
+        print(f"⚠️ Worker process {worker[0].pid} exited ({reason}); {len(worker[3])} tasks fall back to the handler")
+        self.workers.remove(worker)
+        lost = list(worker[3])
+        if not self.workers:
+            lost.extend(self.queue)
+            self.queue.clear()
+        for key in lost:
+            self.results[key] = None
+        self.failed += len(lost)
+        worker[1].close()
+        worker[2].close()
+    
+    def pump(self):
+        """Collect whatever results are ready (waiting for at least one), then hand out more keys"""
+        from multiprocessing.connection import wait as wait_connections
         
-        # Get unique colors and their frequencies
-        color_counter = Counter(colors)
-        unique_colors = list(color_counter.keys())
+        busy = {worker[2]: worker for worker in self.workers if worker[3]}
+        for reader in wait_connections(list(busy)):
+            worker = busy[reader]
+            try:
+                key, outcome, error = reader.recv()
+            except (EOFError, OSError) as e:
+                self.retire(worker, str(e) or "exited")
+                continue
+            worker[3].remove(key)
+            if error is not None:
+                print(f"⚠️ Worker task {key!r} failed, recomputing it here: {error}")
+                self.failed += 1
+            self.results[key] = outcome
+        self.dispatch()
+    
+    def result(self, key):
+        """(result, worker ms) of a task, or None if it failed or is not in the table"""
+        while key not in self.results and key in self.tasks:
+            self.pump()
+        return self.results.get(key)
+    
+    def close(self):
+        """Stop the workers: idle ones finish on a None key, busy ones are terminated"""
+        for process, key_writer, _, in_flight in self.workers:
+            if in_flight:
+                process.terminate()
+                continue
+            try:
+                key_writer.send(None)
+            except OSError:
+                pass
+        for process, key_writer, result_reader, _ in self.workers:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            key_writer.close()
+            result_reader.close()
+        self.workers = []
+
+# ===== PARALLEL SECTIONS =====
+
+EXECUTION_MODES = ('auto', 'sequential', 'parallel')
+PARALLEL_MIN_PIXELS = 1 << 21  # 'auto' fans out from this many sampled pixels
+
+def resolve_execution(execution, colors_data):
+    """'parallel' or 'sequential' for a request's execution option"""
+    if execution == 'auto':
+        if batch_worker_count() > 1 and colors_data['total_samples'] >= PARALLEL_MIN_PIXELS:
+            return 'parallel'
+        return 'sequential'
+    return execution
+
+class RegionColorSummary:
+    """most_common()/len() of a region histogram counted in a worker process"""
+    
+    def __init__(self, top_colors, distinct):
+        self.top_colors = top_colors
+        self.distinct = distinct
+    
+    def most_common(self, n=None):
+        return self.top_colors[:n]
+    
+    def __len__(self):
+        return self.distinct
+
+class ParallelSections:
+    """One request's sections and region tiles running in forked worker processes.
+
+    The workers inherit the pixel buffer, packed keys and histogram at fork
+    time, so nothing is copied or pickled on the way in; only section
+    results come back.  A task that fails yields None, and the caller
+    computes that part in the handler process instead.
+    """
+    
+    def __init__(self):
+        self.tasks = {}
+        self.workers = None
+        self.regional = None
+    
+    @classmethod
+    def start(cls, colors_data, engine='python', naming='rgb', seed=None, kmeans_mode='auto', grid='3x3', needed=(), context=None):
+        """Fork workers for every task, or None when fewer than two workers can run them"""
+        parallel = cls()
+        parallel.add_tasks(colors_data, engine, naming, seed, kmeans_mode, grid, needed, context)
+        parallel.workers = ForkWorkers.start(parallel.tasks, batch_worker_count())
+        if parallel.workers is None:
+            return None
+        print(f"⚡ Dispatched {len(parallel.tasks)} analysis tasks to {parallel.workers.started} workers")
+        return parallel
+    
+    def add(self, key, func, *args):
+        self.tasks[key] = (func, args)
+    
+    def add_tasks(self, colors_data, engine, naming, seed, kmeans_mode, grid, needed, context):
+        color_counter = colors_data['color_counter']
+        pixels, packed_colors = colors_data['pixels'], colors_data['packed_colors']
+        width, height = colors_data['width'], colors_data['height']
+        regional = "regional_analysis" in needed and pixels is not None
+        if context is None:
+            context = AnalysisContext(color_counter, engine)
         
-        # Calculate statistics
-        total_colors = len(colors)
-        unique_count = len(unique_colors)
+        # Both clustering passes in one task, so they share one coreset
+        cluster_sections = [section for section in ("dominant_colors", "kmeans_analysis") if section in needed]
+        if cluster_sections:
+            self.add('clusters', clusters_task, pixels, color_counter, engine, naming, seed, kmeans_mode, cluster_sections, context)
+        if "color_frequency" in needed:
+            self.add('color_frequency', color_frequency_task, color_counter, engine, naming, context)
         
-        print(f"🎨 Extracted {unique_count} unique colors from {total_colors} color samples")
+        if regional:
+            layout, _, _ = region_layout(parse_region_grid(grid), width, height)
+            xs, ys = region_lattice(layout, width, height)
+            for i, region in enumerate(layout):
+                rect = (region["start_x"], region["end_x"], region["start_y"], region["end_y"])
+                if rect[1] > rect[0] and rect[3] > rect[2]:
+                    self.add(('region', i), region_colors_task, packed_colors, engine, width, [rect])
+            center, edges = center_edge_rects(width, height)
+            if center is not None:
+                self.add('center', region_colors_task, packed_colors, engine, width, [center])
+                self.add('edges', region_colors_task, packed_colors, engine, width, edges)
+            if engine == 'numpy':
+                # One task per lattice band; the Python engine sums in the handler meanwhile
+                for band in range(len(ys) - 1):
+                    self.add(('sums', band), region_sums_task, pixels, width, height, xs, ys[band:band + 2])
+            self.regional = (engine, layout, xs, ys, center is not None)
+    
+    def result(self, key):
+        """(result, worker ms) of a task, or None if it was not added or failed"""
+        return self.workers.result(key)
+    
+    def section_result(self, task, section):
+        """(section result, worker ms), or None when the handler must compute it"""
+        outcome = self.result(task)
+        if outcome is None:
+            return None
+        result, elapsed = outcome
+        return result[section] if task == 'clusters' else (result, elapsed)
+    
+    def regional_inputs(self):
+        """(region sums or None, per-region summaries, (center, edges) or None) from the tiles, or None"""
+        if self.regional is None:
+            return None
+        engine, layout, xs, ys, has_center = self.regional
+        histograms = []
+        for i, region in enumerate(layout):
+            if region["end_x"] <= region["start_x"] or region["end_y"] <= region["start_y"]:
+                histograms.append(None)  # empty region, never looked up
+                continue
+            outcome = self.result(('region', i))
+            if outcome is None:
+                return None
+            histograms.append(RegionColorSummary(*outcome[0]))
         
+        zones = None
+        if has_center:
+            center, edges = self.result('center'), self.result('edges')
+            if center is None or edges is None:
+                return None
+            zones = (RegionColorSummary(*center[0]), RegionColorSummary(*edges[0]))
+        
+        region_sums = None
+        if engine == 'numpy':
+            bands = [self.result(('sums', band)) for band in range(len(ys) - 1)]
+            if any(band is None for band in bands):
+                return None
+            region_sums = build_region_sums_numpy(None, xs, ys, np.concatenate([band[0] for band in bands]))
+        return region_sums, histograms, zones
+    
+    def describe(self):
+        return {"mode": "fork", "workers": self.workers.started, "tasks": len(self.tasks), "recomputed": self.workers.failed}
+    
+    def close(self):
+        self.workers.close()
+
+def clusters_task(pixels, color_counter, engine, naming, seed, kmeans_mode, sections, context):
+    """{section: (result, ms)} for dominant_colors and/or kmeans_analysis"""
+    section_funcs = {"dominant_colors": generate_enhanced_dominant_colors, "kmeans_analysis": perform_kmeans_clustering}
+    results = {}
+    for section in sections:
+        started = time.perf_counter()
+        result = section_funcs[section](pixels, color_counter, engine, naming, random.Random(seed), kmeans_mode, context)
+        results[section] = (result, round((time.perf_counter() - started) * 1000, 3))
+    return results
+
+def color_frequency_task(color_counter, engine, naming, context):
+    return generate_color_frequency_analysis(None, context.unique_colors, color_counter, engine, naming, context)
+
+def region_colors_task(packed_colors, engine, width, rects):
+    """(top 5 (color, count) pairs, distinct colors) over the union of rectangles"""
+    if engine == 'numpy':
+        key_rows = packed_colors.reshape(-1, width)
+        keys = [key_rows[start_y:end_y, start_x:end_x].ravel() for start_x, end_x, start_y, end_y in rects]
+        histogram = NumpyColorHistogram(keys[0] if len(keys) == 1 else np.concatenate(keys))
+    else:
+        keys = array('I')
+        for start_x, end_x, start_y, end_y in rects:
+            keys.extend(slice_packed_rows(packed_colors, width, start_x, end_x, start_y, end_y))
+        histogram = PackedColorCounter(keys)
+    # Five covers both the grid regions and the center/edge zones
+    return histogram.most_common(5), len(histogram)
+
+def region_sums_task(pixels, width, height, xs, ys):
+    """Lattice block sums of the horizontal band [ys[0], ys[-1])"""
+    return region_block_sums_numpy(np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 3), xs, ys)
+
+# ===== RESULT CACHE =====
+
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESULT_CACHE_TTL_SECONDS = 3600
+
+class ResultCache:
+    """Size-bounded LRU cache with a TTL, kept at module level across warm invocations.
+
+    Entry size is the length of the JSON-serialized result, which is close
+    to what the cached dict costs.  Callers pass it in from the bytes they
+    already serialized for the response (or read from the persistent
+    store), so caching never serializes a result just to weigh it.
+    """
+    
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES, ttl_seconds=RESULT_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        """Return a live entry and mark it most recently used, or None"""
+        entry = self.entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] > self.ttl_seconds:
+            self.evict(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+    
+    def put(self, key, value, size):
+        """Insert a result of ``size`` serialized bytes, evicting least recently used entries past the byte budget"""
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.evict(key)
+        self.entries[key] = (value, time.monotonic(), size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            self.evict(next(iter(self.entries)))
+    
+    def evict(self, key):
+        self.total_bytes -= self.entries.pop(key)[2]
+    
+    def stats(self):
         return {
-            'colors': colors,
-            'unique_colors': unique_colors,
-            'color_counter': color_counter,
-            'total_samples': total_colors,
-            'unique_count': unique_count
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses
         }
+
+RESULT_CACHE = ResultCache()
+
+def result_cache_key(image_bytes, *options):
+    """Content hash of the decoded image bytes plus every option that shapes the result.
+
+    Keys are prefixed with ANALYSIS_VERSION and CACHE_SCHEMA_VERSION so a
+    new release or response format never reads results stored by an older one.
+    """
+    digest = hashlib.blake2b(image_bytes, digest_size=20)
+    digest.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+    return f"{ANALYSIS_VERSION}/s{CACHE_SCHEMA_VERSION}/{digest.hexdigest()}"
+
+# ===== PERSISTENT CACHE BACKENDS =====
+
+# COLORLAB_CACHE_BACKEND selects 'sqlite', 's3' or nothing (in-memory only)
+CACHE_BACKEND_ENV = 'COLORLAB_CACHE_BACKEND'
+DEFAULT_SQLITE_CACHE_PATH = '/tmp/colorlab-cache.sqlite3'
+DEFAULT_SQLITE_CACHE_MAX_MB = 128
+
+class CacheBackend:
+    """Shared result store behind the in-memory cache.
+
+    Subclasses implement get/put on JSON-serializable results; get returns
+    (result, serialized size) or None.  Writes go through put_async so the
+    response never waits on the store.
+    """
+    
+    name = 'none'
+    write_executor = None
+    
+    def get(self, key):
+        raise NotImplementedError
+    
+    def put(self, key, value):
+        raise NotImplementedError
+    
+    def put_async(self, key, value):
+        """Write back on a background thread, logging rather than raising failures"""
+        if CacheBackend.write_executor is None:
+            CacheBackend.write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='colorlab-cache')
+        
+        def write():
+            try:
+                self.put(key, value)
+            except Exception as e:
+                print(f"⚠️ Cache write-back to {self.name} failed: {str(e)}")
         
+        return CacheBackend.write_executor.submit(write)
+    
+    @staticmethod
+    def flush(timeout=None):
+        """Wait for every queued write-back; False if they are still running after ``timeout`` seconds"""
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+        if CacheBackend.write_executor is None:
+            return True
+        try:
+            # One writer thread, so this runs after everything queued before it
+            CacheBackend.write_executor.submit(lambda: None).result(timeout)
+        except FutureTimeoutError:
+            return False
+        return True
+
+class SQLiteCacheBackend(CacheBackend):
+    """Local-disk cache in a single SQLite file (e.g. /tmp or a mounted EFS path).
+
+    Stored results are capped at ``max_bytes`` (COLORLAB_CACHE_MAX_MB,
+    default 128) and the oldest entries are evicted first, so the cache
+    cannot fill Lambda's 512 MB /tmp.  Freed pages are reused rather than
+    returned, so the file stays near its high-water mark.
+    """
+    
+    name = 'sqlite'
+    
+    def __init__(self, path=DEFAULT_SQLITE_CACHE_PATH, max_bytes=DEFAULT_SQLITE_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        import sqlite3
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            # Entries of the unbounded pre-size table are unreachable under the new key format
+            self.connection.execute("DROP TABLE IF EXISTS analysis_cache")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_results "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS analysis_results_created ON analysis_results (created)")
+    
+    def get(self, key):
+        try:
+            with self.lock:
+                row = self.connection.execute("SELECT value, size FROM analysis_results WHERE key = ?", (key,)).fetchone()
+            return (json.loads(row[0]), row[1]) if row else None
+        except Exception as e:
+            print(f"⚠️ SQLite cache read failed: {str(e)}")
+            return None
+    
+    def put(self, key, value):
+        encoded = json.dumps(value)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO analysis_results (key, value, size, created) VALUES (?, ?, ?, ?)",
+                (key, encoded, len(encoded), time.time())
+            )
+            self.evict()
+    
+    def evict(self):
+        """Delete the oldest entries until the stored results fit in max_bytes (caller holds the lock)"""
+        excess = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM analysis_results").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        expired = []
+        for key, size in self.connection.execute("SELECT key, size FROM analysis_results ORDER BY created"):
+            expired.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.connection.executemany("DELETE FROM analysis_results WHERE key = ?", expired)
+        print(f"🧹 SQLite cache evicted {len(expired)} entries to stay under {self.max_bytes // (1024 * 1024)} MB")
+
+class ObjectStoreCacheBackend(CacheBackend):
+    """S3-compatible cache: one JSON object per key under a prefix.
+
+    ``endpoint_url`` points the client at a local stand-in (MinIO,
+    LocalStack); ``client`` accepts any object with the boto3 S3
+    get_object/put_object interface.  Objects are never deleted here;
+    bound the prefix with a bucket lifecycle expiration rule.
+    """
+    
+    name = 's3'
+    
+    def __init__(self, bucket, prefix='colorlab-cache/', endpoint_url=None, client=None):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("boto3 is required for the s3 cache backend")
+            client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+    
+    def object_key(self, key):
+        return f"{self.prefix}{key}.json"
+    
+    def get(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))
+            body = response['Body'].read()
+            return json.loads(body), len(body)
+        except Exception as e:
+            # A missing key is the common case and not worth logging
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+                print(f"⚠️ Object store cache read failed: {str(e)}")
+            return None
+    
+    def put(self, key, value):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.object_key(key),
+            Body=json.dumps(value).encode('utf-8'),
+            ContentType='application/json'
+        )
+
+PERSISTENT_CACHE = None
+
+def get_persistent_cache():
+    """Build the configured backend once per container; None when disabled or unavailable"""
+    global PERSISTENT_CACHE
+    if PERSISTENT_CACHE is None:
+        backend_name = os.environ.get(CACHE_BACKEND_ENV, '').lower()
+        try:
+            if backend_name == 'sqlite':
+                PERSISTENT_CACHE = SQLiteCacheBackend(
+                    os.environ.get('COLORLAB_CACHE_PATH', DEFAULT_SQLITE_CACHE_PATH),
+                    int(os.environ.get('COLORLAB_CACHE_MAX_MB', DEFAULT_SQLITE_CACHE_MAX_MB)) * 1024 * 1024
+                )
+            elif backend_name == 's3':
+                PERSISTENT_CACHE = ObjectStoreCacheBackend(
+                    os.environ['COLORLAB_CACHE_BUCKET'],
+                    os.environ.get('COLORLAB_CACHE_PREFIX', 'colorlab-cache/'),
+                    os.environ.get('COLORLAB_CACHE_ENDPOINT_URL')
+                )
+            else:
+                PERSISTENT_CACHE = False
+        except Exception as e:
+            print(f"⚠️ Persistent cache '{backend_name}' unavailable: {str(e)}")
+            PERSISTENT_CACHE = False
+    return PERSISTENT_CACHE or None
+
+def lookup_cached_analysis(cache_key):
+    """Cached analysis tagged with where it was found, or None on a miss"""
+    cached = RESULT_CACHE.get(cache_key)
+    status = "hit"
+    if cached is None:
+        # Another container may already have stored this result
+        backend = get_persistent_cache()
+        stored = backend.get(cache_key) if backend else None
+        status = "persistent_hit"
+        if stored is not None:
+            cached, size = stored
+            RESULT_CACHE.put(cache_key, cached, size)
+    if cached is None:
+        return None
+    print(f"⚡ Result cache {status.replace('_', ' ')}")
+    return with_cache_status(cached, status)
+
+def store_cached_analysis(cache_key, analysis, size):
+    """Keep a fresh analysis (``size`` bytes serialized) in memory and write it back to the persistent store"""
+    RESULT_CACHE.put(cache_key, analysis, size)
+    backend = get_persistent_cache()
+    if backend:
+        backend.put_async(cache_key, analysis)
+
+def with_cache_status(analysis, status):
+    """Shallow copy of an analysis with the cache status in its metadata"""
+    if "metadata" not in analysis:
+        return analysis
+    return dict(analysis, metadata=dict(analysis["metadata"], cache=status))
+
+# ===== IMAGE DECODING =====
+#
+# Every decoder returns the same flat buffer: ``pixels`` is a contiguous
+# row-major H×W×3 run of uint8 RGB bytes, so pixel (x, y) starts at
+# ``(y * width + x) * 3``.  Analysis code slices this buffer directly instead
+# of holding one tuple per pixel.
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def detect_image_format(image_bytes):
+    """Detect the container format from its magic bytes"""
+    if image_bytes.startswith(PNG_SIGNATURE):
+        return 'png'
+    if image_bytes.startswith(b'\xff\xd8'):
+        return 'jpeg'
+    if image_bytes.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if image_bytes.startswith(b'BM'):
+        return 'bmp'
+    return 'unknown'
+
+class ImageDecodeError(ValueError):
+    """The payload is not an image any available decoder can read"""
+
+def decode_image_data(image_data):
+    """Image bytes from a request's base64 ``image_data`` (raw bytes pass through).
+
+    A data: URL prefix is accepted.  Anything else that is not strict
+    base64 raises ImageDecodeError, so it is answered with a 400 instead of
+    being decoded into garbage bytes.
+    """
+    if isinstance(image_data, bytes):
+        return image_data
+    if image_data.startswith('data:'):
+        header, _, image_data = image_data.partition(',')
+        if not header.endswith(';base64'):
+            raise ImageDecodeError("data: URLs must be base64-encoded")
+    try:
+        return base64.b64decode(image_data, validate=True)
+    except (binascii.Error, ValueError):
+        pass
+    try:
+        # Line-wrapped base64 (e.g. from the base64 tool) is still accepted
+        return base64.b64decode(''.join(image_data.split()), validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ImageDecodeError(f"image_data is not valid base64: {str(e)}") from e
+
+def decode_image_bytes(image_bytes):
+    """Decode a PNG/JPEG/BMP/GIF payload into a flat RGB pixel buffer.
+
+    Returns a dict with ``pixels`` (bytes, H×W×3), ``width``, ``height``,
+    ``format`` and ``decoder``.  Raises ImageDecodeError when the payload
+    cannot be decoded.
+    """
+    image_format = detect_image_format(image_bytes)
+    
+    if Image is not None:
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as img:
+                img.seek(0)
+                rgb = img.convert('RGB')
+                return {
+                    'pixels': rgb.tobytes(),
+                    'width': rgb.width,
+                    'height': rgb.height,
+                    'format': (img.format or image_format).lower(),
+                    'decoder': 'pillow'
+                }
+        except Exception as e:
+            raise ImageDecodeError(f"Pillow could not decode image: {str(e)}") from e
+    
+    decoders = {'png': decode_png, 'bmp': decode_bmp, 'gif': decode_gif}
+    if image_format not in decoders:
+        raise ImageDecodeError(f"Decoding {image_format} images requires Pillow")
+    
+    try:
+        pixels, width, height = decoders[image_format](image_bytes)
     except Exception as e:
-        print(f"❌ Color extraction failed: {str(e)}")
-        return {'colors': [], 'unique_colors': [], 'color_counter': Counter(), 'total_samples': 0, 'unique_count': 0}
+        raise ImageDecodeError(f"Could not decode {image_format} image: {str(e)}") from e
+    return {
+        'pixels': pixels,
+        'width': width,
+        'height': height,
+        'format': image_format,
+        'decoder': 'builtin'
+    }
+
+def expand_gray_to_rgb(gray):
+    """Expand a single-channel byte buffer to interleaved RGB"""
+    rgb = bytearray(len(gray) * 3)
+    rgb[0::3] = gray
+    rgb[1::3] = gray
+    rgb[2::3] = gray
+    return bytes(rgb)
+
+def apply_palette(indices, palette):
+    """Map palette indices to interleaved RGB using translate tables"""
+    palette = bytes(palette[:768]).ljust(768, b'\x00')
+    rgb = bytearray(len(indices) * 3)
+    rgb[0::3] = indices.translate(palette[0::3])
+    rgb[1::3] = indices.translate(palette[1::3])
+    rgb[2::3] = indices.translate(palette[2::3])
+    return bytes(rgb)
+
+def unpack_low_bit_samples(data, width, height, bit_depth, stride):
+    """Unpack 1/2/4-bit samples (one byte per sample) from padded rows"""
+    mask = (1 << bit_depth) - 1
+    per_byte = 8 // bit_depth
+    shifts = [8 - bit_depth * (i + 1) for i in range(per_byte)]
+    samples = bytearray()
+    for y in range(height):
+        row = data[y * stride:(y + 1) * stride]
+        unpacked = bytearray(len(row) * per_byte)
+        for i, shift in enumerate(shifts):
+            unpacked[i::per_byte] = bytes((b >> shift) & mask for b in row)
+        samples += unpacked[:width]
+    return bytes(samples)
+
+def unfilter_png_scanlines(raw, stride, height, bpp):
+    """Reverse PNG per-scanline filtering"""
+    out = bytearray(stride * height)
+    prev = bytearray(stride)
+    pos = 0
+    for y in range(height):
+        filter_type = raw[pos]
+        row = bytearray(raw[pos + 1:pos + 1 + stride])
+        pos += stride + 1
+        
+        if filter_type == 1:  # Sub
+            for i in range(bpp, stride):
+                row[i] = (row[i] + row[i - bpp]) & 0xFF
+        elif filter_type == 2:  # Up
+            row = bytearray((a + b) & 0xFF for a, b in zip(row, prev))
+        elif filter_type == 3:  # Average
+            for i in range(stride):
+                left = row[i - bpp] if i >= bpp else 0
+                row[i] = (row[i] + ((left + prev[i]) >> 1)) & 0xFF
+        elif filter_type == 4:  # Paeth
+            for i in range(stride):
+                a = row[i - bpp] if i >= bpp else 0
+                b = prev[i]
+                c = prev[i - bpp] if i >= bpp else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                if pa <= pb and pa <= pc:
+                    predictor = a
+                elif pb <= pc:
+                    predictor = b
+                else:
+                    predictor = c
+                row[i] = (row[i] + predictor) & 0xFF
+        elif filter_type != 0:
+            raise ValueError(f"Invalid PNG filter type {filter_type}")
+        
+        out[y * stride:(y + 1) * stride] = row
+        prev = row
+    return out
+
+def read_png_chunks(image_bytes):
+    """(IHDR fields, PLTE bytes, [IDAT chunk views]) of a PNG"""
+    pos = len(PNG_SIGNATURE)
+    header = None
+    palette = b''
+    idat_chunks = []
+    view = memoryview(image_bytes)
+    
+    while pos + 8 <= len(image_bytes):
+        length, chunk_type = struct.unpack('>I4s', image_bytes[pos:pos + 8])
+        chunk = view[pos + 8:pos + 8 + length]
+        pos += length + 12
+        
+        if chunk_type == b'IHDR':
+            header = struct.unpack('>IIBBBBB', chunk)
+        elif chunk_type == b'PLTE':
+            palette = bytes(chunk)
+        elif chunk_type == b'IDAT':
+            idat_chunks.append(chunk)
+        elif chunk_type == b'IEND':
+            break
+    
+    if header is None:
+        raise ValueError("PNG is missing its IHDR chunk")
+    return header, palette, idat_chunks
+
+def decode_png(image_bytes):
+    """Decode a non-interlaced PNG into a flat RGB buffer"""
+    header, palette, idat_chunks = read_png_chunks(image_bytes)
+    
+    width, height, bit_depth, color_type, _, _, interlace = header
+    if interlace:
+        raise ValueError("Interlaced PNG decoding requires Pillow")
+    
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}.get(color_type)
+    if channels is None:
+        raise ValueError(f"Unsupported PNG color type {color_type}")
+    
+    stride = (width * channels * bit_depth + 7) // 8
+    bpp = max(1, channels * bit_depth // 8)
+    data = unfilter_png_scanlines(zlib.decompress(b''.join(idat_chunks)), stride, height, bpp)
+    
+    if bit_depth == 16:
+        data = data[0::2]  # keep the high byte of every sample
+    elif bit_depth < 8:
+        data = unpack_low_bit_samples(data, width, height, bit_depth, stride)
+        if color_type == 0:
+            scale = 255 // ((1 << bit_depth) - 1)
+            data = data.translate(bytes((i * scale) & 0xFF for i in range(256)))
+    data = bytes(data)
+    
+    if color_type == 3:
+        pixels = apply_palette(data, palette)
+    elif color_type == 0:
+        pixels = expand_gray_to_rgb(data)
+    elif color_type == 4:
+        pixels = expand_gray_to_rgb(data[0::2])
+    elif color_type == 6:
+        rgb = bytearray(width * height * 3)
+        rgb[0::3] = data[0::4]
+        rgb[1::3] = data[1::4]
+        rgb[2::3] = data[2::4]
+        pixels = bytes(rgb)
+    else:
+        pixels = data
+    
+    return pixels, width, height
+
+def decode_bmp(image_bytes):
+    """Decode an uncompressed 8/24/32-bit BMP into a flat RGB buffer"""
+    pixel_offset, dib_size = struct.unpack('<II', image_bytes[10:18])
+    width, height, _, bits, compression = struct.unpack('<iiHHI', image_bytes[18:34])
+    
+    if compression not in (0, 3) or bits not in (8, 24, 32):
+        raise ValueError(f"Unsupported BMP ({bits}-bit, compression {compression})")
+    
+    top_down = height < 0
+    height = abs(height)
+    stride = ((width * bits + 31) // 32) * 4
+    row_bytes = width * bits // 8
+    
+    rows = [image_bytes[pixel_offset + y * stride:pixel_offset + y * stride + row_bytes] for y in range(height)]
+    if not top_down:
+        rows.reverse()
+    data = b''.join(rows)
+    
+    if bits == 8:
+        colors_used = struct.unpack('<I', image_bytes[46:50])[0] or 256
+        table = image_bytes[14 + dib_size:14 + dib_size + colors_used * 4]
+        palette = bytearray(len(table) // 4 * 3)
+        palette[0::3] = table[2::4]
+        palette[1::3] = table[1::4]
+        palette[2::3] = table[0::4]
+        return apply_palette(data, palette), width, height
+    
+    step = bits // 8
+    rgb = bytearray(width * height * 3)
+    rgb[0::3] = data[2::step]
+    rgb[1::3] = data[1::step]
+    rgb[2::3] = data[0::step]
+    return bytes(rgb), width, height
 
-def get_accurate_color_name(r, g, b):
+def lzw_decode_gif(data, min_code_size):
+    """Decode GIF LZW image data into palette indices"""
+    clear_code = 1 << min_code_size
+    end_code = clear_code + 1
+    base_table = [bytes([i]) for i in range(clear_code)] + [b'', b'']
+    table = list(base_table)
+    code_size = min_code_size + 1
+    out = bytearray()
+    prev = None
+    bit_buffer = 0
+    bit_count = 0
+    
+    for byte in data:
+        bit_buffer |= byte << bit_count
+        bit_count += 8
+        while bit_count >= code_size:
+            code = bit_buffer & ((1 << code_size) - 1)
+            bit_buffer >>= code_size
+            bit_count -= code_size
+            
+            if code == clear_code:
+                table = list(base_table)
+                code_size = min_code_size + 1
+                prev = None
+                continue
+            if code == end_code:
+                return bytes(out)
+            
+            if code < len(table):
+                entry = table[code]
+                if prev is not None:
+                    table.append(prev + entry[:1])
+            elif prev is not None:
+                entry = prev + prev[:1]
+                table.append(entry)
+            else:
+                raise ValueError("Corrupt GIF LZW stream")
+            
+            out += entry
+            prev = entry
+            if len(table) == (1 << code_size) and code_size < 12:
+                code_size += 1
+    
+    return bytes(out)
+
+def decode_gif(image_bytes):
+    """Decode the first frame of a GIF into a flat RGB buffer"""
+    screen_width, screen_height, flags, background = struct.unpack('<HHBB', image_bytes[6:12])
+    pos = 13
+    global_palette = b''
+    if flags & 0x80:
+        size = 3 * (2 << (flags & 0x07))
+        global_palette = image_bytes[pos:pos + size]
+        pos += size
+    
+    def read_sub_blocks(pos):
+        blocks = []
+        while image_bytes[pos]:
+            blocks.append(image_bytes[pos + 1:pos + 1 + image_bytes[pos]])
+            pos += image_bytes[pos] + 1
+        return b''.join(blocks), pos + 1
+    
+    while pos < len(image_bytes):
+        marker = image_bytes[pos]
+        if marker == 0x21:  # Extension block
+            _, pos = read_sub_blocks(pos + 2)
+        elif marker == 0x2C:  # Image descriptor
+            left, top, width, height, frame_flags = struct.unpack('<HHHHB', image_bytes[pos + 1:pos + 10])
+            pos += 10
+            palette = global_palette
+            if frame_flags & 0x80:
+                size = 3 * (2 << (frame_flags & 0x07))
+                palette = image_bytes[pos:pos + size]
+                pos += size
+            min_code_size = image_bytes[pos]
+            lzw_data, pos = read_sub_blocks(pos + 1)
+            indices = lzw_decode_gif(lzw_data, min_code_size)[:width * height].ljust(width * height, b'\x00')
+            
+            if frame_flags & 0x40:  # Interlaced rows: passes 0/8, 4/8, 2/4, 1/2
+                order = [y for start, step in ((0, 8), (4, 8), (2, 4), (1, 2)) for y in range(start, height, step)]
+                rows = [None] * height
+                for i, y in enumerate(order):
+                    rows[y] = indices[i * width:(i + 1) * width]
+                indices = b''.join(rows)
+            
+            if (left, top, width, height) != (0, 0, screen_width, screen_height):
+                canvas = bytearray([background]) * (screen_width * screen_height)
+                for y in range(min(height, screen_height - top)):
+                    row = indices[y * width:y * width + min(width, screen_width - left)]
+                    start = (top + y) * screen_width + left
+                    canvas[start:start + len(row)] = row
+                indices, width, height = bytes(canvas), screen_width, screen_height
+            
+            return apply_palette(indices, palette), width, height
+        elif marker == 0x3B:  # Trailer
+            break
+        else:
+            raise ValueError(f"Unexpected GIF block 0x{marker:02x}")
+    
+    raise ValueError("GIF contains no image frames")
+
+def pixel_count(pixels):
+    """Number of RGB pixels in a flat buffer"""
+    return len(pixels) // 3
+
+# ===== STRATIFIED SAMPLING =====
+
+# Target sampled pixel counts per quality tier; 'exact' keeps every pixel
+QUALITY_SAMPLE_TARGETS = {'fast': 1 << 16, 'balanced': 1 << 19, 'exact': None}
+SAMPLING_CONFIDENCE_Z = 1.96  # 95% margins
+
+def sampling_stride(total_pixels, quality='exact'):
+    """Side of the square strata so roughly the tier's target pixel count is kept"""
+    target = QUALITY_SAMPLE_TARGETS[quality]
+    if target is None or total_pixels <= target:
+        return 1
+    return math.ceil(math.sqrt(total_pixels / target))
+
+def stratified_sample_pixels(pixels, width, height, stride, rng=None):
+    """Keep one jittered pixel from every stride x stride cell of the image.
+
+    Each sampled row is drawn at a random offset inside its band of rows and
+    uses a random column phase, so every cell contributes exactly one pixel.
+    Returns (sample_pixels, sample_width, sample_height).
+    """
+    rng = rng or random
+    cols = -(-width // stride)
+    rows = -(-height // stride)
+    max_phase = min(stride - 1, width - 1 - (cols - 1) * stride)
+    step = stride * 3
+    
+    sample = bytearray(rows * cols * 3)
+    for row in range(rows):
+        y = row * stride + rng.randint(0, min(stride - 1, height - 1 - row * stride))
+        start = (y * width + rng.randint(0, max_phase)) * 3
+        end = start + (cols - 1) * step + 3
+        offset = row * cols * 3
+        sample[offset:offset + cols * 3:3] = pixels[start:end:step]
+        sample[offset + 1:offset + cols * 3:3] = pixels[start + 1:end:step]
+        sample[offset + 2:offset + cols * 3:3] = pixels[start + 2:end:step]
+    return bytes(sample), cols, rows
+
+def estimate_sampling_error(sampling, pixel_stats):
+    """95% margins for percentages and channel averages under the sampling used.
+
+    Uses the simple-random-sampling bound with a finite population
+    correction; stratification only tightens it, so these are conservative.
+    """
+    sampled, total = sampling["sampled_pixels"], sampling["total_pixels"]
+    if not sampled or sampled >= total:
+        return {"confidence": 0.95, "percentage_points": 0.0,
+                "channel_mean": {channel: 0.0 for channel in CHANNEL_NAMES}, "luminance": 0.0}
+    
+    scale = SAMPLING_CONFIDENCE_Z * math.sqrt((total - sampled) / (total - 1) / sampled)
+    channel_margin = {channel: pixel_stats["channel_std"][channel] * scale for channel in CHANNEL_NAMES}
+    return {
+        "confidence": 0.95,
+        # Worst case p = 0.5 for any reported pixel share
+        "percentage_points": round(50 * scale, 2),
+        "channel_mean": {channel: round(margin, 2) for channel, margin in channel_margin.items()},
+        "luminance": round(calculate_luminance(*channel_margin.values()), 4)
+    }
+
+# ===== PACKED COLOR KEYS =====
+#
+# Frequency counting works on one 0xRRGGBB integer per pixel instead of
+# (r, g, b) tuples.  The keys are packed once per request and shared by the
+# whole-image histogram, the grid regions and the center/edge zones.  Ties in
+# most_common are broken by ascending key so both engines (and any tiling of
+# the image) agree on the order.
+
+def pack_colors(pixels):
+    """Pack a flat RGB buffer into an array('I') of 0xRRGGBB keys"""
+    padded = bytearray(pixel_count(pixels) * 4)
+    if sys.byteorder == 'little':
+        padded[0::4] = pixels[2::3]
+        padded[1::4] = pixels[1::3]
+        padded[2::4] = pixels[0::3]
+    else:
+        padded[1::4] = pixels[0::3]
+        padded[2::4] = pixels[1::3]
+        padded[3::4] = pixels[2::3]
+    return array('I', padded)
+
+def unpack_color(key):
+    """Split a 0xRRGGBB key back into an (r, g, b) tuple"""
+    return ((key >> 16) & 0xFF, (key >> 8) & 0xFF, key & 0xFF)
+
+def most_common_order(item):
+    """Sort key for (key, count) pairs: count descending, then key ascending"""
+    return (-item[1], item[0])
+
+class PackedColorCounter:
+    """Sparse bincount over packed color keys with a Counter-like interface"""
+    
+    def __init__(self, packed_colors):
+        self.counter = Counter(packed_colors)
+    
+    def __len__(self):
+        return len(self.counter)
+    
+    def colors(self):
+        """Unique colors as (r, g, b) tuples"""
+        return [unpack_color(key) for key in self.counter]
+    
+    def counts(self):
+        """Per-color pixel counts in no particular order"""
+        return list(self.counter.values())
+    
+    def total(self):
+        """Number of pixels counted"""
+        return sum(self.counter.values())
+    
+    def packed_items(self):
+        """(packed key, count) pairs"""
+        return self.counter.items()
+    
+    def colors_by_key(self):
+        """(colors, counts) in ascending packed-key order, the engine-independent seeding order"""
+        keys = sorted(self.counter)
+        return [unpack_color(key) for key in keys], [self.counter[key] for key in keys]
+    
+    def subtract(self, other):
+        """Histogram of the pixels counted here but not in ``other`` (a sub-histogram)"""
+        return PackedColorCounter(self.counter - other.counter)
+    
+    def most_common(self, n=None):
+        """List the n most common ((r, g, b), count) pairs"""
+        items = self.counter.items()
+        if n is None:
+            ordered = sorted(items, key=most_common_order)
+        else:
+            ordered = heapq.nsmallest(n, items, key=most_common_order)
+        return [(unpack_color(key), count) for key, count in ordered]
+
+def pack_colors_for_engine(pixels, engine='python'):
+    """Packed keys as array('I') for the Python engine or uint32 for NumPy"""
+    if engine == 'numpy':
+        return pack_colors_numpy(pixel_array_numpy(pixels))
+    return pack_colors(pixels)
+
+def build_color_histogram(packed_colors, engine='python'):
+    """Frequency table over packed keys for the selected engine"""
+    if engine == 'numpy':
+        return NumpyColorHistogram(packed_colors)
+    return PackedColorCounter(packed_colors)
+
+def slice_packed_rows(packed_colors, width, start_x, end_x, start_y, end_y):
+    """Copy the packed keys of a rectangle out of a row-major key array"""
+    region_keys = array('I')
+    for y in range(start_y, end_y):
+        region_keys.extend(packed_colors[y * width + start_x:y * width + end_x])
+    return region_keys
+
+def extract_colors_from_image_bytes(image_bytes, engine='python', quality='exact', rng=None):
+    """Decode image bytes and extract color information from the real pixels.
+
+    Raises ImageDecodeError when the payload is not a readable image.
+    """
+    decoded = decode_image_bytes(image_bytes)
+    pixels = decoded['pixels']
+    width, height = decoded['width'], decoded['height']
+    
+    # Lower quality tiers analyze a stratified spatial subsample
+    total_pixels = pixel_count(pixels)
+    stride = sampling_stride(total_pixels, quality)
+    if stride > 1:
+        pixels, width, height = stratified_sample_pixels(pixels, width, height, stride, rng)
+    sampling = {
+        "quality": quality,
+        "stride": stride,
+        "sample_rate": round(pixel_count(pixels) / total_pixels, 6) if total_pixels else 1.0,
+        "sampled_pixels": pixel_count(pixels),
+        "total_pixels": total_pixels,
+        "source_dimensions": {"width": decoded['width'], "height": decoded['height']}
+    }
+    
+    # Pack every pixel once, then count unique keys
+    packed_colors = pack_colors_for_engine(pixels, engine)
+    color_counter = build_color_histogram(packed_colors, engine)
+    unique_colors = color_counter.colors()
+    
+    # Calculate statistics
+    total_colors = pixel_count(pixels)
+    unique_count = len(unique_colors)
+    
+    print(f"🎨 Decoded {decoded['format']} {decoded['width']}x{decoded['height']} via {decoded['decoder']}: "
+          f"{unique_count} unique colors from {total_colors} pixels")
+    
+    return {
+        'pixels': pixels,
+        'packed_colors': packed_colors,
+        'width': width,
+        'height': height,
+        'sampling': sampling,
+        'format': decoded['format'],
+        'decoder': decoded['decoder'],
+        'unique_colors': unique_colors,
+        'color_counter': color_counter,
+        'total_samples': total_colors,
+        'unique_count': unique_count,
+        'memory': {"mode": "full"}
+    }
+
+# ===== BOUNDED-MEMORY STRIPS =====
+#
+# memory_mode='bounded' never holds a full-image RGB buffer, key array or
+# per-region copy.  Rows are converted, sampled, packed and folded into
+# mergeable accumulators one strip at a time: the whole-image color
+# histogram (fixed size), the regional summed-area lattice and a small
+# color sketch per region and center/edge zone.  Every section except the
+# regional one reads only the histogram, so those results match 'full'.
+
+MEMORY_MODES = ('auto', 'full', 'bounded')
+BOUNDED_MEMORY_AUTO_PIXELS = 24_000_000  # 'auto' streams images above 24 MP
+STRIP_TARGET_PIXELS = 1 << 20
+SKETCH_TOP_COLORS = 4096  # Misra-Gries counters per region
+SKETCH_DISTINCT_HASHES = 4096  # k-minimum-values sketch size for distinct colors
+HASH_MASK_64 = (1 << 64) - 1
+
+def resolve_memory_mode(memory_mode, image_bytes):
+    """'full' or 'bounded'; 'auto' picks bounded when the image header reports a very large image"""
+    if memory_mode != 'auto':
+        return memory_mode
+    if Image is not None:
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as img:
+                width, height = img.size
+            return 'bounded' if width * height > BOUNDED_MEMORY_AUTO_PIXELS else 'full'
+        except Exception:
+            pass
+    return 'full'
+
+def png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+class PngStripReader:
+    """Sequential RGB row strips of an 8-bit, non-interlaced PNG.
+
+    The compressed stream is inflated only as far as the next strip.  Each
+    strip is re-wrapped as a small stored-deflate PNG whose first row is the
+    previous strip's last (already unfiltered) row, so Pillow reverses the
+    Up/Average/Paeth filters against the right neighbours.
+    """
+
+    SAMPLES = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+    def __init__(self, image_bytes):
+        header, self.palette, chunks = read_png_chunks(image_bytes)
+        self.width, self.height, bit_depth, self.color_type, _, _, interlace = header
+        if bit_depth != 8 or interlace or self.color_type not in self.SAMPLES:
+            raise ValueError("Strip decoding needs an 8-bit non-interlaced PNG")
+        self.stride = self.width * self.SAMPLES[self.color_type]
+        self.chunks = iter(chunks)
+        self.inflater = zlib.decompressobj()
+        self.previous_row = None
+        self.next_y = 0
+
+    def inflate(self, size):
+        """Next `size` bytes of filtered scanlines"""
+        out = bytearray()
+        while len(out) < size:
+            data = self.inflater.unconsumed_tail or next(self.chunks, b'')
+            if not data:
+                raise ValueError("PNG image data ended early")
+            out += self.inflater.decompress(data, size - len(out))
+        return out
+
+    def read_rows(self, start_y, end_y):
+        """Flat RGB bytes of rows [start_y, end_y); strips must be read in order"""
+        if start_y != self.next_y:
+            raise ValueError("PNG strips must be read top to bottom")
+        rows = end_y - start_y
+        scanlines = self.inflate(rows * (self.stride + 1))
+        if self.previous_row is not None:
+            scanlines[:0] = b'\x00' + self.previous_row
+        strip_height = len(scanlines) // (self.stride + 1)
+        png = (PNG_SIGNATURE
+               + png_chunk(b'IHDR', struct.pack('>IIBBBBB', self.width, strip_height, 8, self.color_type, 0, 0, 0))
+               + (png_chunk(b'PLTE', self.palette) if self.palette else b'')
+               + png_chunk(b'IDAT', zlib.compress(bytes(scanlines), 0))
+               + png_chunk(b'IEND', b''))
+        with Image.open(io.BytesIO(png)) as strip:
+            strip.load()
+            strip = strip.crop((0, strip_height - rows, self.width, strip_height))
+            self.previous_row = strip.crop((0, rows - 1, self.width, rows)).tobytes()
+            self.next_y = end_y
+            return strip.convert('RGB').tobytes()
+
+def open_image_rows(image_bytes):
+    """Like decode_image_bytes, but without holding a full RGB copy of the image.
+
+    8-bit non-interlaced PNGs are inflated strip by strip ('rows'); other
+    Pillow images stay decoded in their native mode ('image') and are
+    converted to RGB a strip at a time by read_image_rows.  The built-in
+    decoders only produce a full buffer, which is sliced.
+    """
+    if Image is not None:
+        if detect_image_format(image_bytes) == 'png':
+            try:
+                reader = PngStripReader(image_bytes)
+            except ValueError:
+                reader = None
+            if reader is not None:
+                return {
+                    'rows': reader,
+                    'width': reader.width,
+                    'height': reader.height,
+                    'format': 'png',
+                    'decoder': 'pillow'
+                }
+        try:
+            img = Image.open(io.BytesIO(image_bytes))
+            img.seek(0)
+            img.load()
+        except Exception as e:
+            raise ImageDecodeError(f"Pillow could not decode image: {str(e)}") from e
+        return {
+            'image': img,
+            'width': img.width,
+            'height': img.height,
+            'format': (img.format or detect_image_format(image_bytes)).lower(),
+            'decoder': 'pillow'
+        }
+    return decode_image_bytes(image_bytes)
+
+def read_image_rows(decoded, start_y, end_y):
+    """Flat RGB bytes of rows [start_y, end_y) of an open_image_rows/decode_image_bytes result"""
+    if 'rows' in decoded:
+        return decoded['rows'].read_rows(start_y, end_y)
+    if 'image' in decoded:
+        return decoded['image'].crop((0, start_y, decoded['width'], end_y)).convert('RGB').tobytes()
+    row_bytes = decoded['width'] * 3
+    return decoded['pixels'][start_y * row_bytes:end_y * row_bytes]
+
+class StreamingColorHistogram:
+    """Whole-image color histogram merged strip by strip.
+
+    The NumPy engine counts into a fixed 2^24-entry table (64 MB at any image
+    size); the Python engine merges into one Counter, bounded by the number
+    of distinct colors.
+    """
+
+    def __init__(self, engine='python'):
+        self.engine = engine
+        self.table = np.zeros(1 << 24, dtype=np.uint32) if engine == 'numpy' else Counter()
+
+    def add(self, packed_colors):
+        """Count one strip of packed keys"""
+        if self.engine == 'numpy':
+            keys, counts = np.unique(packed_colors, return_counts=True)
+            self.table[keys] += counts.astype(np.uint32)
+        else:
+            self.table.update(packed_colors)
+
+    def histogram(self):
+        """NumpyColorHistogram or PackedColorCounter over everything added.
+
+        The NumPy table is released here, before the histogram is sorted.
+        """
+        if self.engine == 'numpy':
+            keys = np.concatenate([
+                np.flatnonzero(self.table[start:start + HISTOGRAM_CHUNK_COLORS]).astype(np.uint32) + start
+                for start in range(0, len(self.table), HISTOGRAM_CHUNK_COLORS)
+            ])
+            counts = self.table[keys]
+            self.table = None
+            histogram = NumpyColorHistogram.__new__(NumpyColorHistogram)
+            histogram.store_sorted(keys, counts)
+            return histogram
+        counter = PackedColorCounter([])
+        counter.counter = self.table
+        return counter
+
+def mix_color_key(key):
+    """splitmix64 finalizer: a uniform 64-bit hash of a packed color key"""
+    x = (key + 0x9E3779B97F4A7C15) & HASH_MASK_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & HASH_MASK_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & HASH_MASK_64
+    return x ^ (x >> 31)
+
+def mix_color_keys_numpy(keys):
+    """mix_color_key over a key array (uint64 arithmetic wraps like the masks above)"""
+    x = keys.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+class ColorSketch:
+    """Fixed-size, mergeable color summary of a region with a Counter-like interface.
+
+    Misra-Gries counters keep the heavy colors: counts are exact until the
+    first prune and never low by more than ``undercount`` (at most
+    pixels / (SKETCH_TOP_COLORS + 1)).  ``len()`` estimates the distinct colors
+    from the k smallest key hashes and is exact below k colors.
+    """
+
+    def __init__(self, engine='python'):
+        self.engine = engine
+        self.undercount = 0
+        if engine == 'numpy':
+            self.keys = np.empty(0, dtype=np.uint32)
+            self.key_counts = np.empty(0, dtype=np.int64)
+            self.hashes = np.empty(0, dtype=np.uint64)
+        else:
+            self.counts = {}
+            self.hashes = []
+
+    def update(self, packed_colors):
+        """Merge the counts of a batch of packed keys"""
+        if self.engine == 'numpy':
+            keys, counts = np.unique(packed_colors, return_counts=True)
+            # Add the held counters into the batch's sorted keys; keep the ones it lacks
+            positions = np.minimum(np.searchsorted(keys, self.keys), max(len(keys) - 1, 0))
+            found = keys[positions] == self.keys if len(keys) else np.zeros(len(self.keys), dtype=bool)
+            counts = counts.astype(np.int64)
+            counts[positions[found]] += self.key_counts[found]
+            merged = np.concatenate([keys, self.keys[~found]])
+            merged_counts = np.concatenate([counts, self.key_counts[~found]])
+            if len(merged) > SKETCH_TOP_COLORS:
+                # Misra-Gries merge: take the (capacity + 1)-th largest count off every counter
+                kth = len(merged) - SKETCH_TOP_COLORS - 1
+                threshold = int(np.partition(merged_counts, kth)[kth])
+                keep = merged_counts > threshold
+                merged, merged_counts = merged[keep], merged_counts[keep] - threshold
+                self.undercount += threshold
+            self.keys, self.key_counts = merged.astype(np.uint32), merged_counts
+            
+            hashes = mix_color_keys_numpy(keys)
+            if not self.distinct_exact():
+                hashes = hashes[hashes < self.hashes[-1]]
+            hashes = np.sort(np.concatenate([self.hashes, hashes]))
+            distinct = np.ones(len(hashes), dtype=bool)
+            distinct[1:] = hashes[1:] != hashes[:-1]
+            self.hashes = hashes[distinct][:SKETCH_DISTINCT_HASHES]
+            return
+
+        batch = Counter(packed_colors)
+        counts = self.counts
+        for key, count in batch.items():
+            counts[key] = counts.get(key, 0) + count
+        if len(counts) > SKETCH_TOP_COLORS:
+            threshold = heapq.nlargest(SKETCH_TOP_COLORS + 1, counts.values())[-1]
+            self.counts = {key: count - threshold for key, count in counts.items() if count > threshold}
+            self.undercount += threshold
+        self.hashes = heapq.nsmallest(SKETCH_DISTINCT_HASHES, set(self.hashes).union(map(mix_color_key, batch)))
+
+    def distinct_exact(self):
+        """True while fewer than k distinct colors have been seen"""
+        return len(self.hashes) < SKETCH_DISTINCT_HASHES
+
+    def __len__(self):
+        if self.distinct_exact():
+            return len(self.hashes)
+        # KMV estimate: (k - 1) / (k-th smallest hash as a fraction of the hash range)
+        return int(round((SKETCH_DISTINCT_HASHES - 1) * (1 << 64) / (int(self.hashes[-1]) + 1)))
+
+    def most_common(self, n=None):
+        """List the n most common ((r, g, b), count) pairs still held by the sketch"""
+        if self.engine == 'numpy':
+            order = np.lexsort((self.keys, -self.key_counts))[:n]
+            return [(unpack_color(key), count) for key, count in zip(self.keys[order].tolist(), self.key_counts[order].tolist())]
+        items = self.counts.items()
+        ordered = sorted(items, key=most_common_order) if n is None else heapq.nsmallest(n, items, key=most_common_order)
+        return [(unpack_color(key), count) for key, count in ordered]
+
+class StreamedRegions:
+    """Regional accumulators for a bounded-memory run.
+
+    Holds the region lattice sums plus one ColorSketch per layout region and
+    for the center and edge zones of analyze_center_vs_edges.
+    """
+
+    def __init__(self, width, height, grid='3x3', engine='python'):
+        self.width = width
+        self.engine = engine
+        self.layout, self.rows, self.cols = region_layout(parse_region_grid(grid), width, height)
+        xs, ys = region_lattice(self.layout, width, height)
+        self.region_sums = RegionSumsAccumulator(xs, ys, width, engine)
+        self.region_sketches = [ColorSketch(engine) for _ in self.layout]
+        self.center = ColorSketch(engine)
+        self.edges = ColorSketch(engine)
+
+        # (sketch, rectangles feeding it); the edge zone is the frame around the center
+        self.targets = [
+            (sketch, [(r["start_x"], r["end_x"], r["start_y"], r["end_y"])])
+            for sketch, r in zip(self.region_sketches, self.layout)
+        ]
+        center, edges = center_edge_rects(width, height)
+        if center is not None:
+            self.targets.append((self.center, [center]))
+            self.targets.append((self.edges, edges))
+
+    def add_strip(self, pixels, packed_colors, start_y):
+        """Fold one strip of full-width rows, the first being ``start_y``, into every accumulator"""
+        width = self.width
+        end_y = start_y + len(packed_colors) // width
+        if self.engine == 'numpy':
+            self.region_sums.add_rows_numpy(pixel_array_numpy(pixels).reshape(-1, width, 3), start_y)
+            key_rows = packed_colors.reshape(-1, width)
+        else:
+            saturation_of = {
+                key: calculate_saturation(key >> 16, (key >> 8) & 0xFF, key & 0xFF) for key in set(packed_colors)
+            }.__getitem__
+            self.region_sums.add_rows(pixels, packed_colors, start_y, saturation_of)
+
+        for sketch, rects in self.targets:
+            for rect_start_x, rect_end_x, rect_start_y, rect_end_y in rects:
+                top, bottom = max(rect_start_y, start_y) - start_y, min(rect_end_y, end_y) - start_y
+                if top >= bottom or rect_start_x >= rect_end_x:
+                    continue
+                if self.engine == 'numpy':
+                    sketch.update(key_rows[top:bottom, rect_start_x:rect_end_x].ravel())
+                else:
+                    sketch.update(slice_packed_rows(packed_colors, width, rect_start_x, rect_end_x, top, bottom))
+
+    def estimation(self):
+        """How far the sketched regional figures can be from exact counts"""
+        sketches = self.region_sketches + [self.center, self.edges]
+        return {
+            "method": "misra_gries_top_colors+kmv_distinct_colors",
+            "top_color_max_undercount": max(sketch.undercount for sketch in sketches),
+            "distinct_colors_exact": all(sketch.distinct_exact() for sketch in sketches)
+        }
+
+def extract_colors_in_strips(image_bytes, engine='python', quality='exact', rng=None, grid=None):
+    """Bounded-memory counterpart of extract_colors_from_image_bytes.
+
+    Only one strip of pixels is alive at a time (plus Pillow's native-mode
+    image for formats other than 8-bit PNG).  The result carries no 'pixels'/'packed_colors' buffers; when
+    ``grid`` is given, 'regional' holds the StreamedRegions for that grid.
+    Raises ImageDecodeError when the payload, or any strip of it, cannot be decoded.
+    """
+    decoded = open_image_rows(image_bytes)
+    if 'rows' not in decoded:
+        print(f"⚠️ No strip decoder for this {decoded['format']} image; decoding it whole, bounding only the analysis")
+    width, height = decoded['width'], decoded['height']
+    total_pixels = width * height
+    stride = sampling_stride(total_pixels, quality)
+    sample_width, sample_height = -(-width // stride), -(-height // stride)
+
+    # Whole sampling bands per strip, so the sample matches the full-buffer path
+    strip_rows = -(-max(1, STRIP_TARGET_PIXELS // max(1, width)) // stride) * stride
+    histogram = StreamingColorHistogram(engine)
+    regional = None
+    if grid is not None and sample_width * sample_height:
+        regional = StreamedRegions(sample_width, sample_height, grid, engine)
+
+    strips = 0
+    sample_y = 0
+    try:
+        for start_y in range(0, height, strip_rows):
+            end_y = min(height, start_y + strip_rows)
+            try:
+                pixels = read_image_rows(decoded, start_y, end_y)
+            except Exception as e:
+                raise ImageDecodeError(f"Could not decode rows {start_y}-{end_y}: {str(e)}") from e
+            rows = end_y - start_y
+            if stride > 1:
+                pixels, _, rows = stratified_sample_pixels(pixels, width, rows, stride, rng)
+            packed_colors = pack_colors_for_engine(pixels, engine)
+            histogram.add(packed_colors)
+            if regional is not None:
+                regional.add_strip(pixels, packed_colors, sample_y)
+            sample_y += rows
+            strips += 1
+    finally:
+        if 'image' in decoded:
+            decoded['image'].close()
+
+    color_counter = histogram.histogram()
+    unique_colors = color_counter.colors()
+    sampled_pixels = sample_width * sample_height
+
+    print(f"🎨 Streamed {decoded['format']} {width}x{height} via {decoded['decoder']} in {strips} strips: "
+          f"{len(unique_colors)} unique colors from {sampled_pixels} pixels")
+
+    return {
+        'pixels': None,
+        'packed_colors': None,
+        'width': sample_width,
+        'height': sample_height,
+        'sampling': {
+            "quality": quality,
+            "stride": stride,
+            "sample_rate": round(sampled_pixels / total_pixels, 6) if total_pixels else 1.0,
+            "sampled_pixels": sampled_pixels,
+            "total_pixels": total_pixels,
+            "source_dimensions": {"width": width, "height": height}
+        },
+        'format': decoded['format'],
+        'decoder': decoded['decoder'],
+        'unique_colors': unique_colors,
+        'color_counter': color_counter,
+        'total_samples': sampled_pixels,
+        'unique_count': len(unique_colors),
+        'regional': regional,
+        # Only the PNG strip reader bounds the decode itself; other formats
+        # are decoded whole (in their native mode) and only the analysis is bounded
+        'memory': {"mode": "bounded", "strip_rows": strip_rows, "strips": strips, "decoded_in_strips": 'rows' in decoded}
+    }
+
+def get_accurate_color_name(r, g, b, naming='rgb'):
     """Get accurate color name using comprehensive color database"""
-    target_color = (r, g, b)
+    key = (int(r) << 16) | (int(g) << 8) | int(b)
+    if naming == 'rgb':
+        return lookup_color_name(key)
+    return lookup_lab_color_name(key, naming)
+
+# ===== COLOR NAME LOOKUP =====
+#
+# RGB space is cut into a 32x32x32 cube of cells.  For every cell we keep the
+# database entries that can be the nearest neighbour of *some* point in the
+# cell (entry-to-box distance <= the smallest farthest-corner distance), so a
+# query only refines the exact Euclidean distance over those few candidates.
+# Results are identical to a linear scan over COLOR_DATABASE, including its
+# first-entry-wins tie rule and the >100 generic-name fallback.
+
+COLOR_NAME_ENTRIES = list(COLOR_DATABASE.items())
+NAME_LUT_BITS = 5
+NAME_LUT_CELL = 1 << (8 - NAME_LUT_BITS)
+GENERIC_NAME_DISTANCE_SQ = 100 ** 2
+
+# Lazily built (cells, max_candidates) entry-index table for batch naming
+NAME_LUT = None
+NAME_ENTRY_COLORS = None
+
+def name_cell_index(r, g, b):
+    """Index of the lookup cell containing a color"""
+    shift = 8 - NAME_LUT_BITS
+    return ((r >> shift) << (2 * NAME_LUT_BITS)) | ((g >> shift) << NAME_LUT_BITS) | (b >> shift)
+
+def axis_box_distances(value, low):
+    """Squared distances from a channel value to the nearest and farthest edge of a cell"""
+    high = low + NAME_LUT_CELL - 1
+    near = low - value if value < low else value - high if value > high else 0
+    return near * near, max(value - low, high - value) ** 2
+
+@lru_cache(maxsize=None)
+def name_axis_distances(channel):
+    """Per cell coordinate, the (near, far) squared distances of every entry on one channel"""
+    return [
+        ([axis_box_distances(color[channel], i * NAME_LUT_CELL)[0] for color, _ in COLOR_NAME_ENTRIES],
+         [axis_box_distances(color[channel], i * NAME_LUT_CELL)[1] for color, _ in COLOR_NAME_ENTRIES])
+        for i in range(1 << NAME_LUT_BITS)
+    ]
+
+@lru_cache(maxsize=None)
+def name_cell_candidates(cell):
+    """Database entry indices that can be nearest to some color in a cell"""
+    artifacts = color_artifacts()
+    if artifacts.name_lut is not None:
+        width = artifacts.name_lut_width
+        return tuple(i for i in artifacts.name_lut[cell * width:(cell + 1) * width] if i >= 0)
+    return compute_name_cell_candidates(cell)
+
+def compute_name_cell_candidates(cell):
+    """name_cell_candidates worked out from the per-axis box distances"""
+    mask = (1 << NAME_LUT_BITS) - 1
+    (near_r, far_r), (near_g, far_g), (near_b, far_b) = [
+        name_axis_distances(channel)[(cell >> shift) & mask]
+        for channel, shift in enumerate((2 * NAME_LUT_BITS, NAME_LUT_BITS, 0))
+    ]
+    
+    # Box distances are separable, so per-axis terms just add up
+    bound = min(a + b + c for a, b, c in zip(far_r, far_g, far_b))
+    return tuple(i for i, (a, b, c) in enumerate(zip(near_r, near_g, near_b)) if a + b + c <= bound)
+
+@lru_cache(maxsize=65536)
+def lookup_color_name(key):
+    """Name for a packed 0xRRGGBB color, memoized across warm invocations"""
+    r, g, b = unpack_color(key)
     
     # Check for exact match first
-    if target_color in COLOR_DATABASE:
-        return COLOR_DATABASE[target_color]
+    if (r, g, b) in COLOR_DATABASE:
+        return COLOR_DATABASE[(r, g, b)]
     
-    # Find closest color using Euclidean distance
-    min_distance = float('inf')
+    # Refine the exact distance over the cell's candidates only
+    min_distance_sq = float('inf')
     closest_color_name = "Unknown"
     
-    for (cr, cg, cb), name in COLOR_DATABASE.items():
-        # Calculate Euclidean distance in RGB space
-        distance = math.sqrt((r - cr)**2 + (g - cg)**2 + (b - cb)**2)
+    for index in name_cell_candidates(name_cell_index(r, g, b)):
+        (cr, cg, cb), name = COLOR_NAME_ENTRIES[index]
+        distance_sq = (r - cr) ** 2 + (g - cg) ** 2 + (b - cb) ** 2
         
-        if distance < min_distance:
-            min_distance = distance
+        if distance_sq < min_distance_sq:
+            min_distance_sq = distance_sq
             closest_color_name = name
     
     # If distance is too large, use generic names
-    if min_distance > 100:
+    if min_distance_sq > GENERIC_NAME_DISTANCE_SQ:
+        return get_generic_color_name(r, g, b)
+    
+    return closest_color_name
+
+def build_name_lut_numpy():
+    """Candidate table for every cell, padded with -1, in database order"""
+    side = 1 << NAME_LUT_BITS
+    low = (np.arange(side) * NAME_LUT_CELL)[:, None]
+    high = low + NAME_LUT_CELL - 1
+    entries = np.array([color for color, _ in COLOR_NAME_ENTRIES], dtype=np.int32)
+    
+    # (side, E) per-axis terms, broadcast-summed into (side, side, side, E)
+    near = [(np.clip(entries[:, c], low, high) - entries[:, c]) ** 2 for c in range(3)]
+    far = [np.maximum(entries[:, c] - low, high - entries[:, c]) ** 2 for c in range(3)]
+    nearest_sq = (near[0][:, None, None] + near[1][None, :, None] + near[2][None, None, :]).reshape(side ** 3, -1)
+    farthest_sq = (far[0][:, None, None] + far[1][None, :, None] + far[2][None, None, :]).reshape(side ** 3, -1)
+    candidate_mask = nearest_sq <= farthest_sq.min(axis=1, keepdims=True)
+    
+    width = int(candidate_mask.sum(axis=1).max())
+    # Stable sort puts candidate indices first, still in database order
+    order = np.argsort(~candidate_mask, axis=1, kind='stable')[:, :width]
+    return np.where(np.take_along_axis(candidate_mask, order, axis=1), order, -1).astype(np.int16)
+
+def name_colors(colors, naming='rgb'):
+    """Batch color naming for an (N, 3) array or a sequence of (r, g, b).
+
+    Returns a list of names matching get_accurate_color_name for each color
+    under the given naming metric ('rgb', 'cie76' or 'ciede2000').
+    """
+    if np is None or not len(colors):
+        return [get_accurate_color_name(r, g, b, naming) for r, g, b in colors]
+    
+    if naming != 'rgb':
+        return name_colors_lab_numpy(np.asarray(colors, dtype=np.int32).reshape(-1, 3), naming)
+    
+    global NAME_LUT, NAME_ENTRY_COLORS
+    if NAME_LUT is None:
+        NAME_LUT = color_artifacts().name_lut_numpy()
+        if NAME_LUT is None:
+            NAME_LUT = build_name_lut_numpy()
+        NAME_ENTRY_COLORS = np.array([color for color, _ in COLOR_NAME_ENTRIES], dtype=np.int32)
+    
+    queries = np.asarray(colors, dtype=np.int32).reshape(-1, 3)
+    entries = NAME_ENTRY_COLORS
+    shift = 8 - NAME_LUT_BITS
+    cells = ((queries[:, 0] >> shift) << (2 * NAME_LUT_BITS)) | ((queries[:, 1] >> shift) << NAME_LUT_BITS) | (queries[:, 2] >> shift)
+    
+    candidates = NAME_LUT[cells]
+    distance_sq = ((entries[candidates] - queries[:, None, :]) ** 2).sum(axis=2)
+    distance_sq = np.where(candidates >= 0, distance_sq, np.iinfo(np.int32).max)
+    best = distance_sq.argmin(axis=1)
+    best_entry = candidates[np.arange(len(queries)), best]
+    best_distance_sq = distance_sq[np.arange(len(queries)), best]
+    
+    names = []
+    for (r, g, b), entry, distance_sq in zip(queries.tolist(), best_entry.tolist(), best_distance_sq.tolist()):
+        if distance_sq > GENERIC_NAME_DISTANCE_SQ:
+            names.append(get_generic_color_name(r, g, b))
+        else:
+            names.append(COLOR_NAME_ENTRIES[entry][1])
+    return names
+
+# ===== CIELAB COLOR NAMING =====
+#
+# Perceptual naming mode: queries and COLOR_DATABASE are compared in CIELAB
+# (sRGB, D65 white) with CIE76 or CIEDE2000 colour difference.  The converted
+# palette, the per-entry chroma CIEDE2000 needs and the 256-entry sRGB
+# linearization table come from color_artifacts().
+
+COLOR_NAMING_METRICS = ('rgb', 'cie76', 'ciede2000')
+
+# Beyond these differences the nearest entry is too far off and the generic
+# hue-based name is used instead (same role as the RGB distance of 100)
+LAB_GENERIC_NAME_DELTA_E = {'cie76': 30.0, 'ciede2000': 20.0}
+
+D65_WHITE = (0.95047, 1.0, 1.08883)
+LAB_EPSILON = (6 / 29) ** 3
+LAB_KAPPA_SLOPE = 1 / (3 * (6 / 29) ** 2)
+
+def srgb_linearization_table():
+    """Linear-light value for each 8-bit sRGB channel level"""
+    return array('d', [
+        v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+        for v in (i / 255.0 for i in range(256))
+    ])
+
+def lab_f(t):
+    """CIELAB companding function"""
+    return t ** (1 / 3) if t > LAB_EPSILON else t * LAB_KAPPA_SLOPE + 4 / 29
+
+def rgb_to_lab(r, g, b):
+    """Convert an 8-bit sRGB color to CIELAB (D65)"""
+    linear = color_artifacts().srgb_linear
+    return linear_to_lab(linear[r], linear[g], linear[b])
+
+def linear_to_lab(rl, gl, bl):
+    """Convert linear-light sRGB to CIELAB (D65)"""
+    x = (0.4124564 * rl + 0.3575761 * gl + 0.1804375 * bl) / D65_WHITE[0]
+    y = (0.2126729 * rl + 0.7151522 * gl + 0.0721750 * bl) / D65_WHITE[1]
+    z = (0.0193339 * rl + 0.1191920 * gl + 0.9503041 * bl) / D65_WHITE[2]
+    fx, fy, fz = lab_f(x), lab_f(y), lab_f(z)
+    return (116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz))
+
+def delta_e_76(lab1, lab2):
+    """CIE76 colour difference (Euclidean distance in LAB)"""
+    return math.sqrt(sum((p - q) ** 2 for p, q in zip(lab1, lab2)))
+
+def delta_e_2000(lab1, lab2, chroma1=None, chroma2=None):
+    """CIEDE2000 colour difference; chroma may be passed in when precomputed"""
+    L1, a1, b1 = lab1
+    L2, a2, b2 = lab2
+    C1 = math.hypot(a1, b1) if chroma1 is None else chroma1
+    C2 = math.hypot(a2, b2) if chroma2 is None else chroma2
+    
+    C_bar7 = ((C1 + C2) / 2) ** 7
+    G = 0.5 * (1 - math.sqrt(C_bar7 / (C_bar7 + 25 ** 7)))
+    a1p, a2p = (1 + G) * a1, (1 + G) * a2
+    C1p, C2p = math.hypot(a1p, b1), math.hypot(a2p, b2)
+    h1p = math.degrees(math.atan2(b1, a1p)) % 360
+    h2p = math.degrees(math.atan2(b2, a2p)) % 360
+    
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    if C1p * C2p == 0:
+        dhp = 0
+    else:
+        dhp = h2p - h1p
+        if dhp > 180:
+            dhp -= 360
+        elif dhp < -180:
+            dhp += 360
+    dHp = 2 * math.sqrt(C1p * C2p) * math.sin(math.radians(dhp / 2))
+    
+    Lbp = (L1 + L2) / 2
+    Cbp = (C1p + C2p) / 2
+    if C1p * C2p == 0:
+        hbp = h1p + h2p
+    elif abs(h1p - h2p) <= 180:
+        hbp = (h1p + h2p) / 2
+    elif h1p + h2p < 360:
+        hbp = (h1p + h2p + 360) / 2
+    else:
+        hbp = (h1p + h2p - 360) / 2
+    
+    T = (1 - 0.17 * math.cos(math.radians(hbp - 30)) + 0.24 * math.cos(math.radians(2 * hbp))
+         + 0.32 * math.cos(math.radians(3 * hbp + 6)) - 0.20 * math.cos(math.radians(4 * hbp - 63)))
+    d_theta = 30 * math.exp(-((hbp - 275) / 25) ** 2)
+    Cbp7 = Cbp ** 7
+    Rc = 2 * math.sqrt(Cbp7 / (Cbp7 + 25 ** 7))
+    Sl = 1 + 0.015 * (Lbp - 50) ** 2 / math.sqrt(20 + (Lbp - 50) ** 2)
+    Sc = 1 + 0.045 * Cbp
+    Sh = 1 + 0.015 * Cbp * T
+    Rt = -math.sin(math.radians(2 * d_theta)) * Rc
+    
+    return math.sqrt((dLp / Sl) ** 2 + (dCp / Sc) ** 2 + (dHp / Sh) ** 2 + Rt * (dCp / Sc) * (dHp / Sh))
+
+@lru_cache(maxsize=65536)
+def lookup_lab_color_name(key, metric):
+    """Nearest database name in CIELAB for a packed color, memoized per metric"""
+    r, g, b = unpack_color(key)
+    if (r, g, b) in COLOR_DATABASE:
+        return COLOR_DATABASE[(r, g, b)]
+    
+    lab = rgb_to_lab(r, g, b)
+    chroma = math.hypot(lab[1], lab[2])
+    min_delta_e = float('inf')
+    closest_color_name = "Unknown"
+    artifacts = color_artifacts()
+    
+    for (_, name), entry_lab, entry_chroma in zip(COLOR_NAME_ENTRIES, artifacts.palette_lab, artifacts.palette_chroma):
+        if metric == 'ciede2000':
+            delta_e = delta_e_2000(lab, entry_lab, chroma, entry_chroma)
+        else:
+            delta_e = delta_e_76(lab, entry_lab)
+        if delta_e < min_delta_e:
+            min_delta_e = delta_e
+            closest_color_name = name
+    
+    if min_delta_e > LAB_GENERIC_NAME_DELTA_E[metric]:
         return get_generic_color_name(r, g, b)
     
     return closest_color_name
 
+def rgb_to_lab_numpy(colors):
+    """Convert an (N, 3) 8-bit sRGB array to (N, 3) CIELAB"""
+    linear = np.asarray(color_artifacts().srgb_linear)[np.asarray(colors, dtype=np.intp)]
+    matrix = np.array([
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ])
+    xyz = linear @ matrix.T / np.array(D65_WHITE)
+    f = np.where(xyz > LAB_EPSILON, np.cbrt(xyz), xyz * LAB_KAPPA_SLOPE + 4 / 29)
+    return np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1)
+
+def delta_e_2000_numpy(lab1, lab2):
+    """Broadcast CIEDE2000 between LAB arrays of shape (..., 3)"""
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+    C1, C2 = np.hypot(a1, b1), np.hypot(a2, b2)
+    
+    C_bar7 = ((C1 + C2) / 2) ** 7
+    G = 0.5 * (1 - np.sqrt(C_bar7 / (C_bar7 + 25 ** 7)))
+    a1p, a2p = (1 + G) * a1, (1 + G) * a2
+    C1p, C2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+    
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    chroma_product = C1p * C2p
+    dhp = h2p - h1p
+    dhp = np.where(dhp > 180, dhp - 360, np.where(dhp < -180, dhp + 360, dhp))
+    dhp = np.where(chroma_product == 0, 0, dhp)
+    dHp = 2 * np.sqrt(chroma_product) * np.sin(np.radians(dhp / 2))
+    
+    Lbp = (L1 + L2) / 2
+    Cbp = (C1p + C2p) / 2
+    hue_sum = h1p + h2p
+    hbp = np.where(np.abs(h1p - h2p) <= 180, hue_sum / 2,
+                   np.where(hue_sum < 360, (hue_sum + 360) / 2, (hue_sum - 360) / 2))
+    hbp = np.where(chroma_product == 0, hue_sum, hbp)
+    
+    T = (1 - 0.17 * np.cos(np.radians(hbp - 30)) + 0.24 * np.cos(np.radians(2 * hbp))
+         + 0.32 * np.cos(np.radians(3 * hbp + 6)) - 0.20 * np.cos(np.radians(4 * hbp - 63)))
+    d_theta = 30 * np.exp(-((hbp - 275) / 25) ** 2)
+    Cbp7 = Cbp ** 7
+    Rc = 2 * np.sqrt(Cbp7 / (Cbp7 + 25 ** 7))
+    Sl = 1 + 0.015 * (Lbp - 50) ** 2 / np.sqrt(20 + (Lbp - 50) ** 2)
+    Sc = 1 + 0.045 * Cbp
+    Sh = 1 + 0.015 * Cbp * T
+    Rt = -np.sin(np.radians(2 * d_theta)) * Rc
+    
+    return np.sqrt((dLp / Sl) ** 2 + (dCp / Sc) ** 2 + (dHp / Sh) ** 2 + Rt * (dCp / Sc) * (dHp / Sh))
+
+def name_colors_lab_numpy(queries, metric):
+    """Vectorized CIELAB naming of an (N, 3) int array against the whole palette"""
+    palette_lab = np.asarray(color_artifacts().palette_lab)
+    query_lab = rgb_to_lab_numpy(queries)
+    
+    if metric == 'ciede2000':
+        delta_e = delta_e_2000_numpy(query_lab[:, None, :], palette_lab[None, :, :])
+    else:
+        delta_e = np.sqrt(((query_lab[:, None, :] - palette_lab[None, :, :]) ** 2).sum(axis=2))
+    
+    best = delta_e.argmin(axis=1)
+    best_delta_e = delta_e[np.arange(len(queries)), best]
+    
+    names = []
+    for (r, g, b), entry, min_delta_e in zip(queries.tolist(), best.tolist(), best_delta_e.tolist()):
+        if (r, g, b) in COLOR_DATABASE:
+            names.append(COLOR_DATABASE[(r, g, b)])
+        elif min_delta_e > LAB_GENERIC_NAME_DELTA_E[metric]:
+            names.append(get_generic_color_name(r, g, b))
+        else:
+            names.append(COLOR_NAME_ENTRIES[entry][1])
+    return names
+
+# ===== PRECOMPUTED ARTIFACTS =====
+#
+# The lookup tables derived from COLOR_DATABASE (sRGB linearization, LAB
+# palette and chroma, RGB name-cell candidates) are written by the build step
+#   python lambda_function_colorlab_complete.py build-artifacts [path]
+# into a flat binary file shipped next to this module.  It is memory-mapped on
+# first use instead of rebuilt in every cold container; without it (or when it
+# no longer matches COLOR_DATABASE) the tables are computed on demand.
+
+ARTIFACTS_ENV = 'COLORLAB_ARTIFACTS_PATH'
+DEFAULT_ARTIFACTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'colorlab_artifacts.bin')
+ARTIFACTS_MAGIC = b'CLABART1'
+ARTIFACTS_HEADER = struct.Struct('<8s16sI')  # magic, database fingerprint, table count
+ARTIFACTS_TABLE = struct.Struct('<16sc3xIIQ')  # name, array typecode, rows, columns, offset
+
+class ColorArtifacts:
+    """Lookup tables derived from COLOR_DATABASE.
+
+    ``name_lut`` is the flat (cells x name_lut_width) candidate table padded
+    with -1, or None when it was not precomputed.
+    """
+    
+    def __init__(self, srgb_linear, palette_lab, palette_chroma, name_lut=None, name_lut_width=0, source='computed'):
+        self.srgb_linear = srgb_linear
+        self.palette_lab = palette_lab
+        self.palette_chroma = palette_chroma
+        self.name_lut = name_lut
+        self.name_lut_width = name_lut_width
+        self.source = source
+    
+    def name_lut_numpy(self):
+        """Candidate table as an int16 array view, or None"""
+        if self.name_lut is None or np is None:
+            return None
+        return np.frombuffer(self.name_lut, dtype=np.int16).reshape(-1, self.name_lut_width)
+
+@lru_cache(maxsize=None)
+def color_artifacts():
+    """Lookup tables for this container: memory-mapped from the build artifact, else computed"""
+    path = os.environ.get(ARTIFACTS_ENV, DEFAULT_ARTIFACTS_PATH)
+    if os.path.exists(path):
+        try:
+            return load_color_artifacts(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"⚠️ Ignoring color artifacts at {path}: {str(e)}")
+    return compute_color_artifacts()
+
+def color_database_fingerprint():
+    """Digest of everything the artifact tables are derived from"""
+    return hashlib.blake2b(repr((NAME_LUT_BITS, COLOR_NAME_ENTRIES)).encode('utf-8'), digest_size=16).digest()
+
+def compute_color_artifacts(with_name_lut=False):
+    """Build the tables from COLOR_DATABASE; the name table only when asked (it is the slow one)"""
+    srgb_linear = srgb_linearization_table()
+    palette_lab = [linear_to_lab(srgb_linear[r], srgb_linear[g], srgb_linear[b]) for (r, g, b), _ in COLOR_NAME_ENTRIES]
+    palette_chroma = array('d', [math.hypot(a, b) for _, a, b in palette_lab])
+    name_lut, name_lut_width = build_name_lut_table() if with_name_lut else (None, 0)
+    return ColorArtifacts(srgb_linear, palette_lab, palette_chroma, name_lut, name_lut_width)
+
+def build_name_lut_table():
+    """Flat int16 candidate table for every name cell and its row width"""
+    table = array('h')
+    if np is not None:
+        lut = build_name_lut_numpy()
+        table.frombytes(lut.astype('=i2').tobytes())
+        return table, lut.shape[1]
+    
+    rows = [compute_name_cell_candidates(cell) for cell in range(1 << (3 * NAME_LUT_BITS))]
+    width = max(len(row) for row in rows)
+    for row in rows:
+        table.extend(row)
+        table.extend([-1] * (width - len(row)))
+    return table, width
+
+def write_color_artifacts(path=DEFAULT_ARTIFACTS_PATH):
+    """Serialize the lookup tables for load_color_artifacts; returns the file size"""
+    artifacts = compute_color_artifacts(with_name_lut=True)
+    palette_lab = array('d', [value for lab in artifacts.palette_lab for value in lab])
+    tables = [
+        ('srgb_linear', artifacts.srgb_linear, len(artifacts.srgb_linear), 1),
+        ('palette_lab', palette_lab, len(artifacts.palette_lab), 3),
+        ('palette_chroma', artifacts.palette_chroma, len(artifacts.palette_chroma), 1),
+        ('name_lut', artifacts.name_lut, len(artifacts.name_lut) // artifacts.name_lut_width, artifacts.name_lut_width),
+    ]
+    
+    header = ARTIFACTS_HEADER.pack(ARTIFACTS_MAGIC, color_database_fingerprint(), len(tables))
+    offset = ARTIFACTS_HEADER.size + ARTIFACTS_TABLE.size * len(tables)
+    entries, blobs = [], []
+    for name, values, rows, cols in tables:
+        offset += -offset % 8
+        values = array(values.typecode, values)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        entries.append(ARTIFACTS_TABLE.pack(name.encode('ascii'), values.typecode.encode('ascii'), rows, cols, offset))
+        blobs.append((offset, values.tobytes()))
+        offset += len(blobs[-1][1])
+    
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as f:
+        f.write(header + b''.join(entries))
+        for blob_offset, blob in blobs:
+            f.write(b'\0' * (blob_offset - f.tell()))
+            f.write(blob)
+    os.replace(temporary_path, path)
+    return offset
+
+def load_color_artifacts(path):
+    """Memory-map an artifact file; tables are zero-copy views into the mapping"""
+    if sys.byteorder != 'little':
+        raise ValueError("artifact tables are little-endian")
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    magic, fingerprint, count = ARTIFACTS_HEADER.unpack_from(mapped, 0)
+    if magic != ARTIFACTS_MAGIC:
+        raise ValueError("not a ColorLab artifact file")
+    if fingerprint != color_database_fingerprint():
+        raise ValueError("built from a different color database")
+    
+    view = memoryview(mapped)
+    tables = {}
+    for index in range(count):
+        name, typecode, rows, cols, offset = ARTIFACTS_TABLE.unpack_from(mapped, ARTIFACTS_HEADER.size + index * ARTIFACTS_TABLE.size)
+        typecode = typecode.decode('ascii')
+        size = rows * cols * array(typecode).itemsize
+        if offset + size > len(mapped):
+            raise ValueError(f"table {name!r} runs past the end of the file")
+        tables[name.rstrip(b'\0').decode('ascii')] = (view[offset:offset + size].cast(typecode), cols)
+    
+    palette_lab, _ = tables['palette_lab']
+    name_lut, name_lut_width = tables['name_lut']
+    return ColorArtifacts(
+        tables['srgb_linear'][0],
+        [tuple(palette_lab[i:i + 3]) for i in range(0, len(palette_lab), 3)],
+        tables['palette_chroma'][0],
+        name_lut,
+        name_lut_width,
+        source='mmap'
+    )
+
 def get_generic_color_name(r, g, b):
     """Fallback to generic color naming"""
     # Convert to HSV for better color classification
@@ -300,129 +3056,293 @@ def rgb_to_hsv_accurate(r, g, b):
     """Convert RGB to HSV accurately"""
     r, g, b = r/255.0, g/255.0, b/255.0
     
-    max_val = max(r, g, b)
-    min_val = min(r, g, b)
-    diff = max_val - min_val
+    max_val = max(r, g, b)
+    min_val = min(r, g, b)
+    diff = max_val - min_val
+    
+    # Value
+    v = max_val
+    
+    # Saturation
+    if max_val == 0:
+        s = 0
+    else:
+        s = diff / max_val
+    
+    # Hue
+    if diff == 0:
+        h = 0
+    elif max_val == r:
+        h = (60 * ((g - b) / diff) + 360) % 360
+    elif max_val == g:
+        h = (60 * ((b - r) / diff) + 120) % 360
+    else:
+        h = (60 * ((r - g) / diff) + 240) % 360
+    
+    return h, s, v
+
+ANALYSIS_SECTIONS = (
+    "dominant_colors", "color_frequency", "kmeans_analysis", "regional_analysis", "histograms",
+    "color_spaces", "characteristics", "ai_training_data", "cnn_analysis"
+)
+
+# Cheapest first, so a streaming client can render the palette before regions land
+STREAM_SECTION_ORDER = (
+    "color_frequency", "histograms", "color_spaces", "characteristics", "dominant_colors",
+    "ai_training_data", "cnn_analysis", "kmeans_analysis", "regional_analysis"
+)
+
+# Sections that read another section's output
+SECTION_DEPENDENCIES = {
+    "ai_training_data": ("dominant_colors",),
+    "cnn_analysis": ("dominant_colors",)
+}
+
+# Sections built on the fused pixel statistics sweep (which sampling error also reads)
+STATISTICS_SECTIONS = ("histograms", "color_spaces", "characteristics")
+
+def parse_analysis_fields(fields):
+    """Normalize a fields/include option (list or comma-separated string) to a tuple of sections"""
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    if not isinstance(fields, list) or not fields or not all(field in ANALYSIS_SECTIONS for field in fields):
+        raise ValueError(f"fields must list sections from: {', '.join(ANALYSIS_SECTIONS)}")
+    return tuple(section for section in ANALYSIS_SECTIONS if section in fields)
+
+def order_analysis_sections(sections):
+    """Response dict with sections in canonical order and metadata last"""
+    analysis = {section: sections[section] for section in ANALYSIS_SECTIONS if section in sections}
+    analysis["metadata"] = sections["metadata"]
+    return analysis
+
+# ===== ANALYSIS CONTEXT =====
+
+class AnalysisContext:
+    """Per-request intermediates shared by the analysis sections.
+
+    Each one is computed on first use and reused afterwards, so no section
+    repeats work that another section (or the extraction stage) already did.
+    """
+
+    def __init__(self, color_counter, engine='python', unique_colors=None, total_samples=None, histogram_bins=None):
+        self.color_counter = color_counter
+        self.engine = engine
+        self.histogram_bins = histogram_bins or DEFAULT_HISTOGRAM_BINS
+        # Already unpacked/counted by the extraction stage when given
+        if unique_colors is not None:
+            self.unique_colors = unique_colors
+        if total_samples is not None:
+            self.total_samples = total_samples
+        self.kmeans_points = {}
+
+    @classmethod
+    def from_colors_data(cls, colors_data, engine='python', histogram_bins=None):
+        return cls(colors_data['color_counter'], engine, colors_data['unique_colors'], colors_data['total_samples'], histogram_bins)
+
+    @cached_property
+    def unique_colors(self):
+        """Unique colors, aligned with counts"""
+        return self.color_counter.colors()
+
+    @cached_property
+    def counts(self):
+        """Per-color pixel counts, aligned with unique_colors"""
+        return self.color_counter.counts()
+
+    @cached_property
+    def total_samples(self):
+        return self.color_counter.total()
+
+    @cached_property
+    def most_frequent(self):
+        """Most common ((r, g, b), count) pair, or None for an empty histogram"""
+        most_common = self.color_counter.most_common(1)
+        return most_common[0] if most_common else None
+
+    @cached_property
+    def saturation_by_key(self):
+        """Saturation of every unique color by packed key (Python engine)"""
+        return {
+            key: calculate_saturation(key >> 16, (key >> 8) & 0xFF, key & 0xFF)
+            for key, _ in self.color_counter.packed_items()
+        }
+
+    @cached_property
+    def pixel_stats(self):
+        """Fused histogram sweep behind histograms, color spaces, characteristics and sampling error"""
+        saturation_by_key = self.saturation_by_key if self.engine != 'numpy' else None
+        return compute_pixel_statistics(self.color_counter, self.total_samples, self.engine, self.histogram_bins, saturation_by_key)
+
+    def kmeans_inputs(self, mode):
+        """(points, weights, scatter) for a resolved K-Means mode, shared by every clustering pass"""
+        if mode not in self.kmeans_points:
+            self.kmeans_points[mode] = kmeans_inputs(self.color_counter, self.engine, mode)
+        return self.kmeans_points[mode]
+
+def iter_analysis_sections(image_bytes, colors_data, engine='python', naming='rgb', seed=None, kmeans_mode='auto', histogram_bins=None, grid='3x3', fields=None, timings=None, execution='sequential'):
+    """Yield (section, result) in STREAM_SECTION_ORDER, then ("metadata", ...).
+
+    ``fields`` limits the output to those sections; only they and the
+    intermediates they depend on are computed, each once, through a shared
+    AnalysisContext.  Each stage is timed into ``timings`` and reported as
+    metadata.timings.
+
+    With ``execution`` 'parallel' (or 'auto' on a large image) the clustering,
+    frequency and region tile work runs in forked workers while this
+    process computes the statistics sections; results are identical.
+    Pooled sections report the time they took in their worker.
+    """
+    if timings is None:
+        timings = StageTimings()
+    wanted = set(fields) if fields else set(ANALYSIS_SECTIONS)
+    needed = wanted | {dep for section in wanted for dep in SECTION_DEPENDENCIES.get(section, ())}
+    context = AnalysisContext.from_colors_data(colors_data, engine, histogram_bins)
+    
+    parallel = None
+    if resolve_execution(execution, colors_data) == 'parallel':
+        parallel = timings.measure("parallel_dispatch", ParallelSections.start, colors_data, engine, naming, seed, kmeans_mode, grid, needed, context)
+    try:
+        yield from analysis_section_results(image_bytes, colors_data, context, parallel, engine, naming, seed, kmeans_mode, grid, wanted, needed, timings)
+    finally:
+        if parallel is not None:
+            parallel.close()
+
+def analysis_section_results(image_bytes, colors_data, context, parallel, engine, naming, seed, kmeans_mode, grid, wanted, needed, timings):
+    """Body of iter_analysis_sections; sections with a pooled result take it from ``parallel``"""
+    # Use actual image data characteristics
+    image_size = len(image_bytes)
+    pixels = colors_data['pixels']
+    packed_colors = colors_data['packed_colors']
+    width = colors_data['width']
+    height = colors_data['height']
+    unique_colors = colors_data['unique_colors']
+    color_counter = colors_data['color_counter']
+    
+    def run_section(section, task, func, *args):
+        pooled = parallel.section_result(task, section) if parallel is not None else None
+        if pooled is None:
+            return timings.measure(section, func, *args)
+        result, elapsed_ms = pooled
+        timings.record(section, elapsed_ms)
+        return result
     
-    # Value
-    v = max_val
+    # One statistics sweep shared by histograms, color spaces, characteristics and
+    # sampling error, skipped when the response needs none of them
+    sampling = colors_data['sampling']
+    pixel_stats = None
+    if needed.intersection(STATISTICS_SECTIONS) or 0 < sampling['sampled_pixels'] < sampling['total_pixels']:
+        pixel_stats = timings.measure("pixel_statistics", lambda: context.pixel_stats)
     
-    # Saturation
-    if max_val == 0:
-        s = 0
-    else:
-        s = diff / max_val
+    # Color Frequency Analysis
+    if "color_frequency" in needed:
+        yield "color_frequency", run_section("color_frequency", "color_frequency", generate_color_frequency_analysis, pixels, unique_colors, color_counter, engine, naming, context)
     
-    # Hue
-    if diff == 0:
-        h = 0
-    elif max_val == r:
-        h = (60 * ((g - b) / diff) + 360) % 360
-    elif max_val == g:
-        h = (60 * ((b - r) / diff) + 120) % 360
-    else:
-        h = (60 * ((r - g) / diff) + 240) % 360
+    # Histograms
+    if "histograms" in needed:
+        yield "histograms", timings.measure("histograms", generate_histograms, pixels, pixel_stats)
     
-    return h, s, v
-
-def generate_enhanced_colorlab_analysis(image_bytes, colors_data):
-    """Generate enhanced ColorLab analysis with accurate color names"""
-    try:
-        # Use actual image data characteristics
-        image_size = len(image_bytes)
-        colors = colors_data['colors']
-        unique_colors = colors_data['unique_colors']
-        color_counter = colors_data['color_counter']
-        
-        # 1. Enhanced Dominant Colors with accurate names
-        dominant_colors = generate_enhanced_dominant_colors(colors, color_counter)
-        
-        # 2. Color Frequency Analysis
-        color_frequency = generate_color_frequency_analysis(colors, unique_colors, color_counter)
-        
-        # 3. K-Means Analysis
-        kmeans_analysis = perform_kmeans_clustering(colors)
-        
-        # 4. Enhanced Regional Analysis
-        regional_analysis = analyze_enhanced_regional_analysis(image_bytes, colors)
-        
-        # 5. Histograms
-        histograms = generate_histograms(colors)
-        
-        # 6. Color Spaces
-        color_spaces = analyze_color_spaces(colors)
-        
-        # 7. Characteristics
-        characteristics = analyze_color_characteristics(colors, unique_colors, dominant_colors)
-        
-        # 8. Training Data
-        ai_training_data = generate_training_data(colors, dominant_colors, image_size)
-        
-        # 9. CNN Analysis
-        cnn_analysis = perform_cnn_analysis(image_bytes, colors, dominant_colors)
-        
-        return {
-            "dominant_colors": dominant_colors,
-            "color_frequency": color_frequency,
-            "kmeans_analysis": kmeans_analysis,
-            "regional_analysis": regional_analysis,
-            "histograms": histograms,
-            "color_spaces": color_spaces,
-            "characteristics": characteristics,
-            "ai_training_data": ai_training_data,
-            "cnn_analysis": cnn_analysis,
-            "metadata": {
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-                "version": "18.0.0-colorlab-enhanced",
-                "processing_time": "< 10 seconds",
-                "image_size_bytes": image_size,
-                "total_color_samples": len(colors),
-                "unique_colors_found": len(unique_colors),
-                "analysis_method": "enhanced_colorlab_analysis",
-                "improvements": ["accurate_color_names", "enhanced_regional_analysis"],
-                "color_database_size": len(COLOR_DATABASE)
-            }
-        }
-        
-    except Exception as e:
-        print(f"❌ Enhanced analysis generation failed: {str(e)}")
-        return {"error": f"Enhanced analysis generation failed: {str(e)}"}
+    # Color Spaces
+    if "color_spaces" in needed:
+        yield "color_spaces", timings.measure("color_spaces", analyze_color_spaces, pixels, pixel_stats)
+    
+    # Characteristics
+    if "characteristics" in needed:
+        yield "characteristics", timings.measure("characteristics", analyze_color_characteristics, pixels, unique_colors, [], pixel_stats)
+    
+    # Enhanced Dominant Colors with accurate names
+    # (each clustering pass gets its own seeded generator, so a section's
+    # result does not depend on which other sections were requested)
+    dominant_colors = []
+    if "dominant_colors" in needed:
+        dominant_colors = run_section("dominant_colors", "clusters", generate_enhanced_dominant_colors, pixels, color_counter, engine, naming, random.Random(seed), kmeans_mode, context)
+        if "dominant_colors" in wanted:
+            yield "dominant_colors", dominant_colors
+    
+    # Training Data
+    if "ai_training_data" in needed:
+        yield "ai_training_data", timings.measure("ai_training_data", generate_training_data, pixels, dominant_colors, image_size)
+    
+    # CNN Analysis
+    if "cnn_analysis" in needed:
+        yield "cnn_analysis", timings.measure("cnn_analysis", perform_cnn_analysis, image_bytes, pixels, dominant_colors)
+    
+    # K-Means Analysis
+    if "kmeans_analysis" in needed:
+        yield "kmeans_analysis", run_section("kmeans_analysis", "clusters", perform_kmeans_clustering, pixels, color_counter, engine, naming, random.Random(seed), kmeans_mode, context)
+    
+    # Enhanced Regional Analysis
+    if "regional_analysis" in needed:
+        yield "regional_analysis", timings.measure("regional_analysis", lambda: analyze_enhanced_regional_analysis(
+            pixels, packed_colors, color_counter, width, height, engine, naming, grid, colors_data.get('regional'), context,
+            parallel.regional_inputs() if parallel is not None else None, colors_data['sampling']
+        ))
+    
+    stage_timings = timings.report()
+    yield "metadata", {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "version": ANALYSIS_VERSION,
+        "processing_time": f"{stage_timings['total'] / 1000:.3f} seconds",
+        "timings": stage_timings,
+        "image_size_bytes": image_size,
+        "image_format": colors_data['format'],
+        "image_dimensions": colors_data['sampling']['source_dimensions'],
+        "decoder": colors_data['decoder'],
+        "engine": engine,
+        "color_naming": naming,
+        "seed": seed,
+        "kmeans_mode": kmeans_mode,
+        "grid": grid if isinstance(grid, str) else "custom",
+        "fields": [section for section in ANALYSIS_SECTIONS if section in wanted],
+        "sampling": dict(sampling, estimated_error=estimate_sampling_error(sampling, pixel_stats)),
+        "memory": dict(colors_data.get('memory', {"mode": "full"}), peak_rss_mb=peak_memory_mb()),
+        "execution": parallel.describe() if parallel is not None else {"mode": "sequential"},
+        "total_color_samples": colors_data['total_samples'],
+        "unique_colors_found": len(unique_colors),
+        "analysis_method": "enhanced_colorlab_analysis",
+        "improvements": ["accurate_color_names", "enhanced_regional_analysis"],
+        "color_database_size": len(COLOR_DATABASE)
+    }
 
 # Continue with remaining functions...
 # (Due to length limits, I'll create the remaining functions in the next part)
 
-print("🎨 ColorLab enhanced Lambda function loaded")
 
 # Part 2 of Enhanced Lambda Function
 
-def generate_enhanced_dominant_colors(colors, color_counter):
+def generate_enhanced_dominant_colors(pixels, color_counter, engine='python', naming='rgb', rng=None, kmeans_mode='auto', context=None):
     """Generate enhanced dominant colors with accurate names"""
     try:
         print("🎨 Generating enhanced dominant colors with accurate names...")
+        if context is None:
+            context = AnalysisContext(color_counter, engine)
         
-        # Get most common colors
-        most_common = color_counter.most_common(15)
-        
-        # Apply K-Means++ for better clustering
-        if len(most_common) > 6:
-            clustered_colors = kmeans_plus_plus([color for color, _ in most_common], k=8)
-        else:
-            clustered_colors = [color for color, _ in most_common]
+        # Weighted K-Means over the color histogram gives frequency-correct centers
+        k = min(8, len(color_counter))
+        if k == 0:
+            return []
+        result = run_weighted_kmeans(pixels, color_counter, k, engine, rng, kmeans_mode, context)
+        order = sorted(range(len(result["centers"])), key=lambda j: (-result["sizes"][j], j))
+        clustered_colors = [tuple(int(round(float(c))) for c in result["centers"][j]) for j in order]
+        cluster_sizes = [int(result["sizes"][j]) for j in order]
         
         dominant_colors = []
-        total_samples = len(colors)
+        total_samples = context.total_samples
+        
+        # Get accurate color names in one batch
+        accurate_names = name_colors([list(color) for color in clustered_colors], naming)
+        quality_scores = calculate_quality_scores(clustered_colors)
         
         for i, color in enumerate(clustered_colors):
-            r, g, b = [int(c) for c in color]
-            
-            # Get accurate color name
-            accurate_name = get_accurate_color_name(r, g, b)
+            r, g, b = color
+            accurate_name = accurate_names[i]
             
             # Calculate quality metrics
-            quality_score = calculate_quality_score(color, clustered_colors)
+            quality_score = quality_scores[i]
             
-            # Estimate percentage
-            percentage = max(1.0, (100 / len(clustered_colors)))
+            # Share of pixels assigned to this center
+            percentage = cluster_sizes[i] / total_samples * 100 if total_samples else 0
             
             dominant_colors.append({
                 "rank": i + 1,
@@ -430,7 +3350,7 @@ def generate_enhanced_dominant_colors(colors, color_counter):
                 "rgb": {"r": r, "g": g, "b": b},
                 "name": accurate_name,
                 "percentage": round(percentage, 2),
-                "pixel_count": max(1, total_samples // len(clustered_colors)),
+                "pixel_count": cluster_sizes[i],
                 "quality_score": quality_score,
                 "luminance": calculate_luminance(r, g, b),
                 "saturation": calculate_saturation(r, g, b)
@@ -443,140 +3363,353 @@ def generate_enhanced_dominant_colors(colors, color_counter):
         print(f"❌ Enhanced dominant colors failed: {str(e)}")
         return []
 
-def analyze_enhanced_regional_analysis(image_bytes, colors):
-    """Enhanced regional analysis with better algorithms"""
+def analyze_enhanced_regional_analysis(pixels, packed_colors, color_counter, width, height, engine='python', naming='rgb', grid='3x3', streamed=None, context=None, tiles=None, sampling=None):
+    """Enhanced regional analysis with better algorithms.
+
+    ``streamed`` is the StreamedRegions of a bounded-memory run, which stands
+    in for the pixel buffers.  ``context`` supplies per-color saturations
+    already computed for the pixel statistics.  ``tiles`` holds (region sums
+    or None, region histograms, zones) computed by parallel workers.
+    ``width``/``height`` are those of the (possibly sampled) pixels; with the
+    extraction's ``sampling`` block, bounds and dimensions are reported in
+    source-image pixels.
+    """
     try:
         print("🗺️ Starting enhanced regional analysis...")
         
-        # Calculate image dimensions estimation
-        total_bytes = len(image_bytes)
-        estimated_pixels = len(colors)
+        total_pixels = width * height
+        print(f"📐 Image dimensions: {width}x{height} ({total_pixels} pixels)")
         
-        # Estimate image dimensions (assuming square-ish image)
-        estimated_width = int(math.sqrt(estimated_pixels))
-        estimated_height = estimated_pixels // estimated_width if estimated_width > 0 else 1
-        
-        print(f"📐 Estimated dimensions: {estimated_width}x{estimated_height} ({estimated_pixels} pixels)")
+        if streamed is not None:
+            layout, rows, cols = streamed.layout, streamed.rows, streamed.cols
+            region_sums = streamed.region_sums.table()
+            histograms, zones = streamed.region_sketches, (streamed.center, streamed.edges)
+        else:
+            layout, rows, cols = region_layout(parse_region_grid(grid), width, height)
+            
+            # Summed-area table on the lattice of region edges: O(1) stats per region
+            xs, ys = region_lattice(layout, width, height)
+            region_sums, histograms, zones = tiles if tiles is not None else (None, None, None)
+            if region_sums is None and engine == 'numpy':
+                region_sums = build_region_sums_numpy(np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 3), xs, ys)
+            elif region_sums is None:
+                saturation_by_key = context.saturation_by_key if context is not None else None
+                region_sums = build_region_sums(pixels, packed_colors, width, xs, ys, color_counter, saturation_by_key)
         
-        # Enhanced 3x3 grid analysis
-        regions = analyze_3x3_grid_enhanced(colors, estimated_width, estimated_height)
+        regions = analyze_grid_regions(packed_colors, width, layout, region_sums, engine, naming, histograms)
+        stride = sampling["stride"] if sampling else 1
+        source_width, source_height = width, height
+        if stride > 1:
+            source_width, source_height = sampling["source_dimensions"]["width"], sampling["source_dimensions"]["height"]
+            scale_region_bounds(regions, stride, source_width, source_height)
         
         # Additional analysis: center vs edges
-        center_edge_analysis = analyze_center_vs_edges(colors, estimated_width, estimated_height)
+        center_edge_analysis = analyze_center_vs_edges(packed_colors, color_counter, width, height, engine, naming, zones)
         
         # Color distribution analysis
-        distribution_analysis = analyze_color_distribution(colors, regions)
+        distribution_analysis = analyze_color_distribution(pixels, regions)
         
         # Visual balance analysis
-        balance_analysis = analyze_visual_balance(regions)
+        balance_analysis = analyze_visual_balance(regions, [(r["row"], r["col"]) for r in layout], rows, cols)
         
-        return {
+        result = {
             "regions": regions,
             "center_edge_analysis": center_edge_analysis,
             "distribution_analysis": distribution_analysis,
             "balance_analysis": balance_analysis,
             "analysis_method": "enhanced_regional_analysis_v2",
+            "grid": grid if isinstance(grid, str) else "custom",
             "estimated_dimensions": {
-                "width": estimated_width,
-                "height": estimated_height,
-                "total_pixels": estimated_pixels
+                "width": source_width,
+                "height": source_height,
+                "total_pixels": source_width * source_height
             },
             "total_regions": len(regions)
         }
+        if stride > 1:
+            result["sampled_dimensions"] = {"width": width, "height": height, "stride": stride}
+        if streamed is not None:
+            result["estimation"] = streamed.estimation()
+        return result
         
     except Exception as e:
         print(f"❌ Enhanced regional analysis failed: {str(e)}")
         return {"regions": [], "error": str(e)}
 
-def analyze_3x3_grid_enhanced(colors, width, height):
-    """Enhanced 3x3 grid analysis with better pixel mapping"""
-    regions = []
-    region_names = [
-        "Top-Left", "Top-Center", "Top-Right",
-        "Middle-Left", "Center", "Middle-Right", 
-        "Bottom-Left", "Bottom-Center", "Bottom-Right"
-    ]
-    
+GRID_REGION_NAMES = [
+    "Top-Left", "Top-Center", "Top-Right",
+    "Middle-Left", "Center", "Middle-Right", 
+    "Bottom-Left", "Bottom-Center", "Bottom-Right"
+]
+
+REGION_GRIDS = ('3x3', '4x4', '8x8', 'rule_of_thirds')
+THIRDS_REGION_NAMES = ["Top-Left Third", "Top-Right Third", "Bottom-Left Third", "Bottom-Right Third"]
+MAX_GRID_DIVISIONS = 16
+MAX_CUSTOM_REGIONS = 64
+
+def parse_region_grid(grid):
+    """Normalize a grid option into (rows, cols), 'rule_of_thirds' or a list of custom rectangles.
+
+    Accepts the named grids, any "RxC" string up to 16x16, or a list of
+    {"x", "y", "width", "height"} rectangles in 0-1 image fractions with an
+    optional "name".  Raises ValueError for anything else.
+    """
+    if isinstance(grid, str):
+        if grid == 'rule_of_thirds':
+            return grid
+        rows, sep, cols = grid.lower().partition('x')
+        if sep and rows.isdigit() and cols.isdigit() and 1 <= int(rows) <= MAX_GRID_DIVISIONS and 1 <= int(cols) <= MAX_GRID_DIVISIONS:
+            return int(rows), int(cols)
+    elif isinstance(grid, list) and 0 < len(grid) <= MAX_CUSTOM_REGIONS:
+        rects = []
+        for i, rect in enumerate(grid):
+            try:
+                x, y, w, h = (float(rect[key]) for key in ("x", "y", "width", "height"))
+            except (TypeError, KeyError, ValueError):
+                break
+            if not (0 <= x and 0 <= y and w > 0 and h > 0 and x + w <= 1 + 1e-9 and y + h <= 1 + 1e-9):
+                break
+            rects.append({"name": str(rect.get("name", f"Region {i + 1}")), "x": x, "y": y, "width": w, "height": h})
+        else:
+            return rects
+    raise ValueError(
+        f"grid must be one of {', '.join(REGION_GRIDS)}, an 'RxC' string up to "
+        f"{MAX_GRID_DIVISIONS}x{MAX_GRID_DIVISIONS}, or a list of up to {MAX_CUSTOM_REGIONS} "
+        "{x, y, width, height} rectangles in 0-1 fractions"
+    )
+
+def grid_region_bounds(width, height, rows=3, cols=3):
+    """Yield (name, start_x, end_x, start_y, end_y) for each region of a rows x cols grid"""
     # Calculate region boundaries
-    region_width = width // 3
-    region_height = height // 3
+    region_width = width // cols
+    region_height = height // rows
     
-    for i, region_name in enumerate(region_names):
+    for i in range(rows * cols):
         # Calculate region coordinates
-        row = i // 3
-        col = i % 3
+        row = i // cols
+        col = i % cols
+        region_name = GRID_REGION_NAMES[i] if (rows, cols) == (3, 3) else f"Row {row + 1} Col {col + 1}"
         
         start_x = col * region_width
-        end_x = (col + 1) * region_width if col < 2 else width
+        end_x = (col + 1) * region_width if col < cols - 1 else width
         start_y = row * region_height
-        end_y = (row + 1) * region_height if row < 2 else height
-        
-        # Extract colors from this region
-        region_colors = []
-        for y in range(start_y, min(end_y, height)):
-            for x in range(start_x, min(end_x, width)):
-                pixel_index = y * width + x
-                if pixel_index < len(colors):
-                    region_colors.append(colors[pixel_index])
-        
-        if region_colors:
-            # Analyze region colors
-            region_analysis = analyze_region_colors(region_colors, region_name)
-            regions.append(region_analysis)
+        end_y = (row + 1) * region_height if row < rows - 1 else height
+        
+        yield region_name, start_x, end_x, start_y, end_y
+
+def region_lattice(layout, width, height):
+    """Sorted x and y edges of every region, plus the image borders"""
+    xs = sorted({0, width} | {r["start_x"] for r in layout} | {r["end_x"] for r in layout})
+    ys = sorted({0, height} | {r["start_y"] for r in layout} | {r["end_y"] for r in layout})
+    return xs, ys
+
+def region_layout(grid_spec, width, height):
+    """Pixel rectangles for a parsed grid, each with the (row, col) used for balance"""
+    layout = []
+    if grid_spec == 'rule_of_thirds':
+        # Four third-sized boxes centered on the rule-of-thirds intersections
+        rows = cols = 2
+        xs = (width // 6, width // 2, width * 5 // 6)
+        ys = (height // 6, height // 2, height * 5 // 6)
+        for i, region_name in enumerate(THIRDS_REGION_NAMES):
+            row, col = divmod(i, 2)
+            layout.append({"name": region_name, "start_x": xs[col], "end_x": xs[col + 1],
+                           "start_y": ys[row], "end_y": ys[row + 1], "row": row, "col": col})
+    elif isinstance(grid_spec, list):
+        # Custom rectangles are placed in the thirds band their center falls in
+        rows = cols = 3
+        for rect in grid_spec:
+            start_x, end_x = round(rect["x"] * width), round((rect["x"] + rect["width"]) * width)
+            start_y, end_y = round(rect["y"] * height), round((rect["y"] + rect["height"]) * height)
+            layout.append({"name": rect["name"], "start_x": start_x, "end_x": min(end_x, width),
+                           "start_y": start_y, "end_y": min(end_y, height),
+                           "row": min(2, int(3 * (rect["y"] + rect["height"] / 2))),
+                           "col": min(2, int(3 * (rect["x"] + rect["width"] / 2)))})
+    else:
+        rows, cols = grid_spec
+        for i, (region_name, start_x, end_x, start_y, end_y) in enumerate(grid_region_bounds(width, height, rows, cols)):
+            layout.append({"name": region_name, "start_x": start_x, "end_x": end_x,
+                           "start_y": start_y, "end_y": end_y, "row": i // cols, "col": i % cols})
+    return layout, rows, cols
+
+class SummedAreaTable:
+    """Summed-area table of (red, green, blue, saturation) sums sampled on a lattice.
+
+    Only the x/y boundaries of the requested regions are kept, so memory is
+    independent of image size while every lattice-aligned rectangle still
+    costs four lookups.
+    """
+    
+    def __init__(self, xs, ys, lattice):
+        self.x_index = {x: i for i, x in enumerate(xs)}
+        self.y_index = {y: i for i, y in enumerate(ys)}
+        self.lattice = lattice
+    
+    def rect_sums(self, start_x, end_x, start_y, end_y):
+        """(red, green, blue, saturation) sums over [start_x, end_x) x [start_y, end_y)"""
+        x0, x1 = self.x_index[start_x], self.x_index[end_x]
+        y0, y1 = self.y_index[start_y], self.y_index[end_y]
+        table = self.lattice
+        return [float(a - b - c + d) for a, b, c, d in zip(table[y1][x1], table[y0][x1], table[y1][x0], table[y0][x0])]
+
+class RegionSumsAccumulator:
+    """Builds the lattice summed-area table from full-width rows fed top to bottom.
+
+    Running sums per column span turn into one lattice row each time a
+    region edge in y is reached, so rows can arrive a strip at a time.
+    """
+    
+    def __init__(self, xs, ys, width, engine='python'):
+        self.xs = xs
+        self.ys = ys
+        self.width = width
+        self.engine = engine
+        self.spans = list(zip(xs, xs[1:]))
+        self.band = 0
+        if engine == 'numpy':
+            self.column_sums = np.zeros((len(self.spans), 4))
+            self.lattice = [np.zeros((len(xs), 4))]
+        else:
+            self.column_sums = [[0, 0, 0, 0.0] for _ in self.spans]
+            self.lattice = [[(0, 0, 0, 0.0)] * len(xs)]
+    
+    def add_rows(self, pixels, packed_colors, start_y, saturation_of):
+        """Python engine: add the rows of a flat strip whose first row is ``start_y``"""
+        width = self.width
+        for row in range(len(packed_colors) // width if width else 0):
+            row_start = row * width
+            for (start_x, end_x), sums in zip(self.spans, self.column_sums):
+                start, end = (row_start + start_x) * 3, (row_start + end_x) * 3
+                sums[0] += sum(pixels[start:end:3])
+                sums[1] += sum(pixels[start + 1:end:3])
+                sums[2] += sum(pixels[start + 2:end:3])
+                sums[3] += sum(map(saturation_of, packed_colors[row_start + start_x:row_start + end_x]))
+            self.close_bands(start_y + row + 1)
+    
+    def add_rows_numpy(self, image, start_y):
+        """NumPy engine: add an (rows, width, 3) strip whose first row is ``start_y``"""
+        offset = 0
+        while offset < len(image):
+            # Split the strip where it crosses a region edge in y
+            end = min(len(image), self.ys[self.band + 1] - start_y)
+            piece = image[offset:end]
+            columns = np.concatenate([
+                piece.sum(axis=0, dtype=np.float64), saturation_numpy(piece).sum(axis=0, dtype=np.float64)[:, None]
+            ], axis=1)
+            self.column_sums += np.add.reduceat(columns, self.xs[:-1], axis=0)
+            offset = end
+            self.close_bands(start_y + end)
+    
+    def close_bands(self, y):
+        """Emit a lattice row for every band that ends at row ``y``"""
+        while self.band + 1 < len(self.ys) and self.ys[self.band + 1] == y:
+            # Prefix along x turns the running column sums into one lattice row
+            if self.engine == 'numpy':
+                lattice_row = np.zeros((len(self.xs), 4))
+                lattice_row[1:] = self.column_sums.cumsum(axis=0)
+            else:
+                lattice_row = [(0, 0, 0, 0.0)]
+                for sums in self.column_sums:
+                    lattice_row.append(tuple(a + b for a, b in zip(lattice_row[-1], sums)))
+            self.lattice.append(lattice_row)
+            self.band += 1
+    
+    def table(self):
+        """SummedAreaTable over the rows added so far"""
+        lattice = np.array(self.lattice) if self.engine == 'numpy' else self.lattice
+        return SummedAreaTable(self.xs, self.ys, lattice)
+
+def build_region_sums(pixels, packed_colors, width, xs, ys, color_counter, saturation_by_key=None):
+    """Build the lattice summed-area table with one sweep over the rows"""
+    # Saturation depends only on the color, so look it up per packed key
+    if saturation_by_key is None:
+        saturation_by_key = AnalysisContext(color_counter).saturation_by_key
+    saturation_of = saturation_by_key.__getitem__
+    region_sums = RegionSumsAccumulator(xs, ys, width)
+    region_sums.add_rows(pixels, packed_colors, 0, saturation_of)
+    return region_sums.table()
+
+def region_color_histogram(packed_colors, width, start_x, end_x, start_y, end_y, engine='python'):
+    """Color histogram of one rectangle of the packed key array"""
+    if engine == 'numpy':
+        return NumpyColorHistogram(packed_colors.reshape(-1, width)[start_y:end_y, start_x:end_x].ravel())
+    return PackedColorCounter(slice_packed_rows(packed_colors, width, start_x, end_x, start_y, end_y))
+
+def empty_region_analysis(region_name):
+    """Fallback entry for a region without pixels"""
+    return {
+        "region": region_name,
+        "dominant_color": {
+            "hex": "#808080", 
+            "rgb": {"r": 128, "g": 128, "b": 128},
+            "name": "Gray"
+        },
+        "color_count": 0,
+        "brightness": 0.5,
+        "saturation": 0.5,
+        "pixel_count": 0
+    }
+
+def analyze_grid_regions(packed_colors, width, layout, region_sums, engine='python', naming='rgb', histograms=None):
+    """Per-region analysis: summed-area stats plus the region's own color histogram.
+
+    ``histograms`` optionally supplies each layout region's histogram
+    (bounded-memory runs); otherwise they are counted from ``packed_colors``.
+    """
+    regions = []
+    
+    for i, region in enumerate(layout):
+        start_x, end_x, start_y, end_y = region["start_x"], region["end_x"], region["start_y"], region["end_y"]
+        region_size = max(0, end_x - start_x) * max(0, end_y - start_y)
+        
+        if region_size:
+            sum_r, sum_g, sum_b, sum_saturation = region_sums.rect_sums(start_x, end_x, start_y, end_y)
+            avg_r, avg_g, avg_b = sum_r / region_size, sum_g / region_size, sum_b / region_size
+            if histograms is not None:
+                color_counter = histograms[i]
+            else:
+                color_counter = region_color_histogram(packed_colors, width, start_x, end_x, start_y, end_y, engine)
+            entry = format_region_analysis(
+                region["name"], region_size, color_counter.most_common(5), (avg_r, avg_g, avg_b),
+                (avg_r + avg_g + avg_b) / (3 * 255), sum_saturation / region_size, len(color_counter), naming
+            )
         else:
             # Fallback for empty regions
-            regions.append({
-                "region": region_name,
-                "dominant_color": {
-                    "hex": "#808080", 
-                    "rgb": {"r": 128, "g": 128, "b": 128},
-                    "name": "Gray"
-                },
-                "color_count": 0,
-                "brightness": 0.5,
-                "saturation": 0.5,
-                "pixel_count": 0
-            })
+            entry = empty_region_analysis(region["name"])
+        
+        entry["bounds"] = {"x": start_x, "y": start_y, "width": end_x - start_x, "height": end_y - start_y}
+        regions.append(entry)
     
     return regions
 
-def analyze_region_colors(region_colors, region_name):
-    """Analyze colors within a specific region"""
-    # Count color frequencies
-    color_counter = Counter(region_colors)
-    most_common = color_counter.most_common(5)
-    
-    # Get dominant color
+def scale_region_bounds(regions, stride, source_width, source_height):
+    """Map region bounds from the stratified sample grid back to source-image pixels.
+
+    Sample pixel (x, y) stands for the stride x stride source block starting
+    at (x * stride, y * stride); blocks on the right and bottom edges are clipped.
+    """
+    for region in regions:
+        bounds = region["bounds"]
+        x, y = min(source_width, bounds["x"] * stride), min(source_height, bounds["y"] * stride)
+        end_x = min(source_width, (bounds["x"] + bounds["width"]) * stride)
+        end_y = min(source_height, (bounds["y"] + bounds["height"]) * stride)
+        region["bounds"] = {"x": x, "y": y, "width": end_x - x, "height": end_y - y}
+
+def format_region_analysis(region_name, region_size, most_common, average_rgb, avg_brightness, avg_saturation, unique_colors, naming='rgb'):
+    """Build the response entry for one region from its statistics"""
     dominant = most_common[0] if most_common else ((128, 128, 128), 1)
     dominant_rgb = dominant[0]
-    
-    # Calculate region statistics
-    avg_r = sum(c[0] for c in region_colors) / len(region_colors)
-    avg_g = sum(c[1] for c in region_colors) / len(region_colors)
-    avg_b = sum(c[2] for c in region_colors) / len(region_colors)
-    
-    # Calculate brightness and saturation
-    brightness_values = [(r + g + b) / (3 * 255) for r, g, b in region_colors]
-    avg_brightness = sum(brightness_values) / len(brightness_values)
-    
-    saturation_values = []
-    for r, g, b in region_colors:
-        max_val = max(r, g, b)
-        min_val = min(r, g, b)
-        if max_val > 0:
-            saturation_values.append((max_val - min_val) / max_val)
-        else:
-            saturation_values.append(0)
-    
-    avg_saturation = sum(saturation_values) / len(saturation_values) if saturation_values else 0
+    avg_r, avg_g, avg_b = average_rgb
     
     # Color diversity in region
-    unique_colors = len(set(region_colors))
-    color_diversity = unique_colors / len(region_colors) if region_colors else 0
+    color_diversity = unique_colors / region_size if region_size else 0
     
-    # Get accurate color names
-    dominant_name = get_accurate_color_name(int(dominant_rgb[0]), int(dominant_rgb[1]), int(dominant_rgb[2]))
-    average_name = get_accurate_color_name(int(avg_r), int(avg_g), int(avg_b))
+    # Get accurate color names: dominant, average, then the top 3
+    top_colors = most_common[:3]
+    dominant_name, average_name, *top_names = name_colors(
+        [[int(c) for c in dominant_rgb], [int(avg_r), int(avg_g), int(avg_b)]] + [color for color, _ in top_colors],
+        naming
+    )
     
     return {
         "region": region_name,
@@ -584,7 +3717,7 @@ def analyze_region_colors(region_colors, region_name):
             "hex": f"#{int(dominant_rgb[0]):02x}{int(dominant_rgb[1]):02x}{int(dominant_rgb[2]):02x}",
             "rgb": {"r": int(dominant_rgb[0]), "g": int(dominant_rgb[1]), "b": int(dominant_rgb[2])},
             "name": dominant_name,
-            "percentage": round((dominant[1] / len(region_colors)) * 100, 2)
+            "percentage": round((dominant[1] / region_size) * 100, 2)
         },
         "average_color": {
             "hex": f"#{int(avg_r):02x}{int(avg_g):02x}{int(avg_b):02x}",
@@ -592,7 +3725,7 @@ def analyze_region_colors(region_colors, region_name):
             "name": average_name
         },
         "statistics": {
-            "pixel_count": len(region_colors),
+            "pixel_count": region_size,
             "unique_colors": unique_colors,
             "color_diversity": round(color_diversity, 3),
             "brightness": round(avg_brightness, 3),
@@ -602,62 +3735,76 @@ def analyze_region_colors(region_colors, region_name):
             {
                 "hex": f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}",
                 "rgb": {"r": color[0], "g": color[1], "b": color[2]},
-                "name": get_accurate_color_name(color[0], color[1], color[2]),
+                "name": name,
                 "count": count,
-                "percentage": round((count / len(region_colors)) * 100, 2)
+                "percentage": round((count / region_size) * 100, 2)
             }
-            for color, count in most_common[:3]
+            for (color, count), name in zip(top_colors, top_names)
         ]
     }
 
-def analyze_center_vs_edges(colors, width, height):
-    """Analyze center vs edge color distribution"""
-    center_colors = []
-    edge_colors = []
-    
-    center_margin = min(width, height) // 4
-    
-    for y in range(height):
-        for x in range(width):
-            pixel_index = y * width + x
-            if pixel_index < len(colors):
-                # Check if pixel is in center or edge
-                if (center_margin <= x < width - center_margin and 
-                    center_margin <= y < height - center_margin):
-                    center_colors.append(colors[pixel_index])
-                else:
-                    edge_colors.append(colors[pixel_index])
+def analyze_center_vs_edges(packed_colors, color_counter, width, height, engine='python', naming='rgb', zones=None):
+    """Analyze center vs edge color distribution.
+
+    ``zones`` optionally supplies the (center, edges) histograms gathered by a
+    bounded-memory run instead of counting them from ``packed_colors``.
+    """
+    center, _ = center_edge_rects(width, height)
+    center_size = (center[1] - center[0]) * (center[3] - center[2]) if center is not None else 0
+    edge_size = width * height - center_size
     
-    # Analyze center colors
+    # The edges are the whole image minus the center, so only the center is walked
     center_analysis = {}
-    if center_colors:
-        center_counter = Counter(center_colors)
-        center_dominant = center_counter.most_common(1)[0]
-        center_analysis = {
-            "dominant_color": {
-                "hex": f"#{center_dominant[0][0]:02x}{center_dominant[0][1]:02x}{center_dominant[0][2]:02x}",
-                "name": get_accurate_color_name(center_dominant[0][0], center_dominant[0][1], center_dominant[0][2]),
-                "count": center_dominant[1]
-            },
-            "pixel_count": len(center_colors),
-            "unique_colors": len(set(center_colors))
-        }
+    edge_counter = color_counter
+    if center_size:
+        if zones is not None:
+            center_counter, edge_counter = zones
+        else:
+            center_counter = region_color_histogram(packed_colors, width, *center, engine)
+            edge_counter = color_counter.subtract(center_counter)
+        center_analysis = format_zone_analysis(zone_dominant_color(center_counter), center_size, len(center_counter), naming)
     
     # Analyze edge colors
     edge_analysis = {}
-    if edge_colors:
-        edge_counter = Counter(edge_colors)
-        edge_dominant = edge_counter.most_common(1)[0]
-        edge_analysis = {
-            "dominant_color": {
-                "hex": f"#{edge_dominant[0][0]:02x}{edge_dominant[0][1]:02x}{edge_dominant[0][2]:02x}",
-                "name": get_accurate_color_name(edge_dominant[0][0], edge_dominant[0][1], edge_dominant[0][2]),
-                "count": edge_dominant[1]
-            },
-            "pixel_count": len(edge_colors),
-            "unique_colors": len(set(edge_colors))
-        }
+    if edge_size:
+        edge_analysis = format_zone_analysis(zone_dominant_color(edge_counter), edge_size, len(edge_counter), naming)
     
+    return format_center_edge_analysis(center_analysis, edge_analysis)
+
+def center_edge_rects(width, height):
+    """(center rectangle or None, edge rectangles) as (start_x, end_x, start_y, end_y).
+
+    The center is inset by a quarter of the short side; the edge zone is the
+    frame around it, or the whole image when there is no center.
+    """
+    margin = min(width, height) // 4
+    start_x, end_x, start_y, end_y = margin, width - margin, margin, height - margin
+    if end_x <= start_x or end_y <= start_y:
+        return None, [(0, width, 0, height)]
+    return (start_x, end_x, start_y, end_y), [
+        (0, width, 0, start_y), (0, width, end_y, height), (0, start_x, start_y, end_y), (end_x, width, start_y, end_y)
+    ]
+
+def zone_dominant_color(color_counter):
+    """Most common (color, count) of a zone; a sketch can have pruned every color"""
+    most_common = color_counter.most_common(1)
+    return most_common[0] if most_common else ((128, 128, 128), 0)
+
+def format_zone_analysis(dominant, zone_size, unique_colors, naming='rgb'):
+    """Build the center or edge entry from its dominant (color, count) pair"""
+    (r, g, b), count = dominant
+    return {
+        "dominant_color": {
+            "hex": f"#{r:02x}{g:02x}{b:02x}",
+            "name": get_accurate_color_name(r, g, b, naming),
+            "count": count
+        },
+        "pixel_count": zone_size,
+        "unique_colors": unique_colors
+    }
+
+def format_center_edge_analysis(center_analysis, edge_analysis):
+    """Combine center and edge entries with their contrast ratio"""
     return {
         "center": center_analysis,
         "edges": edge_analysis,
@@ -667,7 +3814,7 @@ def analyze_center_vs_edges(colors, width, height):
         )
     }
 
-def analyze_color_distribution(colors, regions):
+def analyze_color_distribution(pixels, regions):
     """Analyze overall color distribution across regions"""
     # Calculate color variance across regions
     region_brightnesses = [region.get("statistics", {}).get("brightness", 0.5) for region in regions]
@@ -689,8 +3836,15 @@ def analyze_color_distribution(colors, regions):
         }
     }
 
-def analyze_visual_balance(regions):
-    """Analyze visual balance across regions"""
+def analyze_visual_balance(regions, positions=None, rows=3, cols=3):
+    """Analyze visual balance across regions.
+
+    ``positions`` gives each region's (row, col); by default regions are the
+    3x3 grid in reading order.
+    """
+    if positions is None:
+        positions = [divmod(i, 3) for i in range(len(regions))]
+
     # Calculate weight distribution (based on brightness and saturation)
     weights = []
     for region in regions:
@@ -702,13 +3856,13 @@ def analyze_visual_balance(regions):
         weights.append(weight)
     
     # Analyze balance between different areas
-    top_weight = sum(weights[0:3])  # Top row
-    middle_weight = sum(weights[3:6])  # Middle row
-    bottom_weight = sum(weights[6:9])  # Bottom row
+    top_weight = sum(w for w, (row, _) in zip(weights, positions) if row == 0)  # Top row
+    middle_weight = sum(w for w, (row, _) in zip(weights, positions) if 0 < row < rows - 1)  # Middle rows
+    bottom_weight = sum(w for w, (row, _) in zip(weights, positions) if row == rows - 1 and rows > 1)  # Bottom row
     
-    left_weight = sum([weights[0], weights[3], weights[6]])  # Left column
-    center_weight = sum([weights[1], weights[4], weights[7]])  # Center column
-    right_weight = sum([weights[2], weights[5], weights[8]])  # Right column
+    left_weight = sum(w for w, (_, col) in zip(weights, positions) if col == 0)  # Left column
+    center_weight = sum(w for w, (_, col) in zip(weights, positions) if 0 < col < cols - 1)  # Center columns
+    right_weight = sum(w for w, (_, col) in zip(weights, positions) if col == cols - 1 and cols > 1)  # Right column
     
     return {
         "horizontal_balance": {
@@ -758,30 +3912,42 @@ def calculate_color_contrast(hex1, hex2):
         return 1.0
 
 # Helper functions
-def kmeans_plus_plus(colors, k=6, max_iterations=20):
-    """K-Means++ algorithm for better initialization"""
+def kmeans_plus_plus(colors, k=6, rng=None, weights=None, candidates=1):
+    """K-Means++ seeding: pick k well-spread initial centers, optionally count-weighted.
+
+    A running min-squared-distance array is updated against the newest center
+    only, and sampling is a cumulative sum plus binary search.  With
+    ``candidates`` > 1 this is greedy k-means++: each step draws several
+    candidates and keeps the one that lowers the total potential most.
+    """
+    rng = rng or random
     try:
         if len(colors) <= k:
             return colors
+        if weights is None:
+            weights = [1] * len(colors)
         
         # K-Means++ initialization
-        centers = []
-        centers.append(random.choice(colors))
+        first = weighted_random_index(list(accumulate(weights)), rng)
+        centers = [colors[first]]
+        min_sq_dist = squared_distances(colors, colors[first])
         
         # Choose remaining centers
         for _ in range(k - 1):
-            distances = []
-            for color in colors:
-                min_dist = min(euclidean_distance(color, center) for center in centers)
-                distances.append(min_dist ** 2)
-            
-            # Weighted random selection
-            total_dist = sum(distances)
-            if total_dist == 0:
-                centers.append(random.choice(colors))
+            cumulative = list(accumulate(d * w for d, w in zip(min_sq_dist, weights)))
+            if cumulative[-1] == 0:
+                index = rng.randrange(len(colors))
+                best_sq_dist = [min(a, b) for a, b in zip(min_sq_dist, squared_distances(colors, colors[index]))]
             else:
-                probabilities = [d / total_dist for d in distances]
-                centers.append(weighted_random_choice(colors, probabilities))
+                best_potential = None
+                for _ in range(candidates):
+                    candidate = weighted_random_index(cumulative, rng)
+                    candidate_sq_dist = [min(a, b) for a, b in zip(min_sq_dist, squared_distances(colors, colors[candidate]))]
+                    potential = sum(d * w for d, w in zip(candidate_sq_dist, weights))
+                    if best_potential is None or potential < best_potential:
+                        index, best_sq_dist, best_potential = candidate, candidate_sq_dist, potential
+            centers.append(colors[index])
+            min_sq_dist = best_sq_dist
         
         return centers
         
@@ -789,32 +3955,218 @@ def kmeans_plus_plus(colors, k=6, max_iterations=20):
         print(f"❌ K-Means++ failed: {str(e)}")
         return colors[:k]
 
+def squared_distances(colors, center):
+    """Squared RGB distance from every color to one center"""
+    cr, cg, cb = center
+    return [(r - cr) ** 2 + (g - cg) ** 2 + (b - cb) ** 2 for r, g, b in colors]
+
+def seed_candidates(k):
+    """Greedy k-means++ candidates per step (2 + ln k, as in Arthur & Vassilvitskii)"""
+    return 2 + int(math.log(k)) if k > 1 else 1
+
 def euclidean_distance(color1, color2):
     """Calculate Euclidean distance between two colors"""
     return math.sqrt(sum((a - b) ** 2 for a, b in zip(color1, color2)))
 
-def weighted_random_choice(items, weights):
-    """Choose item based on weights"""
-    total = sum(weights)
-    r = random.uniform(0, total)
-    cumulative = 0
-    for item, weight in zip(items, weights):
-        cumulative += weight
-        if r <= cumulative:
-            return item
-    return items[-1]
-
-def calculate_quality_score(color, all_colors):
-    """Calculate quality score for color clustering"""
-    if len(all_colors) <= 1:
-        return 1.0
+def weighted_random_index(cumulative, rng=None):
+    """Sample an index from a cumulative weight list by binary search"""
+    r = (rng or random).uniform(0, cumulative[-1])
+    return min(bisect.bisect_right(cumulative, r), len(cumulative) - 1)
+
+# ===== K-MEANS ENGINE =====
+
+KMEANS_MAX_ITERATIONS = 20
+KMEANS_TOLERANCE = 0.5  # max center shift (RGB units) that counts as converged
+KMEANS_MODES = ('auto', 'histogram', 'coreset', 'pixels')
+KMEANS_CORESET_BITS = 4  # 16 levels per channel -> at most 4096 weighted points
+
+def nearest_two_centers(point, centers):
+    """Index of the nearest center plus squared distances to the nearest and runner-up"""
+    r, g, b = point
+    best, best_sq, second_sq = 0, float('inf'), float('inf')
+    for j, (cr, cg, cb) in enumerate(centers):
+        sq = (r - cr) ** 2 + (g - cg) ** 2 + (b - cb) ** 2
+        if sq < best_sq:
+            best, best_sq, second_sq = j, sq, best_sq
+        elif sq < second_sq:
+            second_sq = sq
+    return best, best_sq, second_sq
+
+def simplified_silhouette(nearest_sq, second_sq):
+    """Centroid-based silhouette of one point: (b - a) / max(a, b)"""
+    a, b = math.sqrt(nearest_sq), math.sqrt(second_sq)
+    return (b - a) / b if b > 0 else 0.0
+
+def kmeans_lloyd(points, centers, weights=None, max_iterations=KMEANS_MAX_ITERATIONS, tolerance=KMEANS_TOLERANCE, scatter=None):
+    """Weighted Lloyd iterations from the given seeds over (r, g, b) points.
+
+    ``scatter`` holds each point's own within-point squared spread (coreset
+    cells) so inertia still covers the pixels a point stands for.
+    """
+    if weights is None:
+        weights = [1] * len(points)
+    if scatter is None:
+        scatter = [0.0] * len(points)
+    centers = [tuple(float(c) for c in center) for center in centers]
+    k = len(centers)
+    iterations = 0
+    converged = False
+    
+    while iterations < max_iterations:
+        sums = [[0.0, 0.0, 0.0] for _ in range(k)]
+        totals = [0] * k
+        for point, weight in zip(points, weights):
+            label = nearest_two_centers(point, centers)[0]
+            acc = sums[label]
+            acc[0] += point[0] * weight
+            acc[1] += point[1] * weight
+            acc[2] += point[2] * weight
+            totals[label] += weight
+        
+        # Empty clusters keep their previous center
+        new_centers = [
+            tuple(c / totals[j] for c in sums[j]) if totals[j] else centers[j]
+            for j in range(k)
+        ]
+        shift = max(max(abs(a - b) for a, b in zip(new, old)) for new, old in zip(new_centers, centers))
+        centers = new_centers
+        iterations += 1
+        if shift <= tolerance:
+            converged = True
+            break
+    
+    sizes = [0] * k
+    cluster_sq = [0.0] * k
+    silhouette_total = 0.0
+    for point, weight, spread in zip(points, weights, scatter):
+        label, nearest_sq, second_sq = nearest_two_centers(point, centers)
+        sizes[label] += weight
+        cluster_sq[label] += nearest_sq * weight + spread
+        if k > 1:
+            silhouette_total += simplified_silhouette(nearest_sq, second_sq) * weight
+    total_weight = sum(sizes)
+    
+    return {
+        "centers": centers,
+        "sizes": sizes,
+        "cluster_sq": cluster_sq,
+        "inertia": sum(cluster_sq),
+        "silhouette": silhouette_total / total_weight if total_weight else 0.0,
+        "iterations": iterations,
+        "converged": converged
+    }
+
+def build_kmeans_coreset(colors, counts, bits=KMEANS_CORESET_BITS):
+    """Grid coreset: merge colors sharing a quantized cell into one weighted mean point"""
+    shift = 8 - bits
+    cells = {}
+    for (r, g, b), count in zip(colors, counts):
+        cell = ((r >> shift) << (2 * bits)) | ((g >> shift) << bits) | (b >> shift)
+        acc = cells.get(cell)
+        if acc is None:
+            cells[cell] = [r * count, g * count, b * count, (r * r + g * g + b * b) * count, count]
+        else:
+            acc[0] += r * count
+            acc[1] += g * count
+            acc[2] += b * count
+            acc[3] += (r * r + g * g + b * b) * count
+            acc[4] += count
+    
+    # Ascending cell order, as build_kmeans_coreset_numpy emits them
+    points, weights, scatter = [], [], []
+    for _, (sum_r, sum_g, sum_b, sum_sq, weight) in sorted(cells.items()):
+        mean = (sum_r / weight, sum_g / weight, sum_b / weight)
+        points.append(mean)
+        weights.append(weight)
+        scatter.append(max(0.0, sum_sq - weight * (mean[0] ** 2 + mean[1] ** 2 + mean[2] ** 2)))
+    return points, weights, scatter
+
+def kmeans_inputs(color_counter, engine='python', mode='histogram'):
+    """(points, weights, scatter) to cluster for the 'histogram' or 'coreset' mode.
+
+    Points are in packed-key order on both engines, so the same seed picks
+    the same K-Means++ centers whichever engine runs.
+    """
+    colors, counts = color_counter.colors_by_key()
+    if mode == 'coreset':
+        build_coreset = build_kmeans_coreset_numpy if engine == 'numpy' else build_kmeans_coreset
+        return build_coreset(colors, counts)
+    return colors, counts, None
+
+def run_weighted_kmeans(pixels, color_counter, k, engine='python', rng=None, mode='auto', context=None):
+    """Seed and iterate K-Means over pixels, the color histogram or its coreset.
+
+    With a ``context``, the histogram arrays and coreset are shared with
+    other clustering passes of the same request.
+    """
+    if context is None:
+        context = AnalysisContext(color_counter, engine)
+    mode = resolve_kmeans_mode(mode, color_counter, k, context, pixels)
+    
+    if engine == 'numpy':
+        if mode == 'pixels':
+            # Count-weighted seeding over the histogram matches seeding over pixels
+            colors, counts, _ = context.kmeans_inputs('histogram')
+            seeds = kmeans_plus_plus_numpy(colors, k, rng, counts, seed_candidates(k))
+            points, weights, scatter = pixel_array_numpy(pixels), None, None
+        else:
+            points, weights, scatter = context.kmeans_inputs(mode)
+            seeds = kmeans_plus_plus_numpy(points, k, rng, weights, seed_candidates(k))
+        result = kmeans_lloyd_numpy(points, seeds, weights, scatter=scatter)
+    else:
+        # Identical pixels always share a cluster, so over pixels the Python
+        # engine runs the exactly equivalent histogram-weighted iterations
+        if mode == 'pixels':
+            mode = 'histogram'
+        points, weights, scatter = context.kmeans_inputs(mode)
+        seeds = kmeans_plus_plus(points, k, rng, weights, seed_candidates(k))
+        result = kmeans_lloyd(points, seeds, weights, scatter=scatter)
     
-    # Calculate average distance to other colors
-    distances = [euclidean_distance(color, other) for other in all_colors if other != color]
-    avg_distance = sum(distances) / len(distances) if distances else 0
+    result["mode"] = mode
+    result["points"] = len(points)
+    result["requested_k"] = k
+    return result
+
+def resolve_kmeans_mode(mode, color_counter, k, context, pixels=None):
+    """The 'pixels', 'histogram' or 'coreset' run a requested kmeans_mode gets on this histogram"""
+    if mode == 'auto':
+        mode = 'coreset' if len(color_counter) > 1 << (3 * KMEANS_CORESET_BITS) else 'histogram'
+    
+    if mode == 'coreset' and len(context.kmeans_inputs('coreset')[0]) < k:
+        # Many colors in a few coreset cells would give fewer than k centers;
+        # fewer than k cells hold at most (k - 1) * 4096 colors, so cluster those directly
+        mode = 'histogram'
     
-    # Normalize to 0-1 range (higher is better separation)
-    return min(1.0, max(0.0, avg_distance / 441.67))
+    if mode == 'pixels' and pixels is None:
+        # Bounded-memory runs keep no pixel buffer; the histogram iterations are equivalent
+        mode = 'histogram'
+    return mode
+
+def clustering_quality_label(silhouette):
+    """Map a silhouette score onto a readable quality label"""
+    if silhouette > 0.7:
+        return "Excellent"
+    if silhouette > 0.5:
+        return "Good"
+    if silhouette > 0.25:
+        return "Fair"
+    return "Weak"
+
+def calculate_quality_scores(colors):
+    """Mean distance from each color to the others, normalized to 0-1 (higher is better separated)"""
+    if len(colors) <= 1:
+        return [1.0] * len(colors)
+    distances = [[] for _ in colors]
+    for i, color in enumerate(colors):
+        for j in range(i + 1, len(colors)):
+            if colors[j] != color:
+                distance = euclidean_distance(color, colors[j])
+                distances[i].append(distance)
+                distances[j].append(distance)
+    return [
+        min(1.0, max(0.0, (sum(row) / len(row) if row else 0) / 441.67))
+        for row in distances
+    ]
 
 def calculate_luminance(r, g, b):
     """Calculate relative luminance"""
@@ -830,79 +4182,189 @@ def calculate_saturation(r, g, b):
     
     return (max_val - min_val) / max_val
 
-print("🎨 ColorLab enhanced functions part 2 loaded")
 
 # Additional functions from original version
-def generate_color_frequency_analysis(colors, unique_colors, color_counter):
+def generate_color_frequency_analysis(pixels, unique_colors, color_counter, engine='python', naming='rgb', context=None):
     """Generate color frequency analysis"""
-    most_common = color_counter.most_common(1)
-    most_frequent = most_common[0] if most_common else ((128, 128, 128), 1)
+    if context is None:
+        context = AnalysisContext(color_counter, engine, unique_colors)
+    most_frequent = context.most_frequent or ((128, 128, 128), 1)
+    total_pixels = context.total_samples
+    counts = context.counts
+    
+    if engine == 'numpy':
+        frequency_distribution = {
+            "mean": float(counts.mean()) if len(counts) else 0,
+            "median": float(np.median(counts)) if len(counts) else 0,
+            "std_dev": float(counts.std(ddof=1)) if len(counts) > 1 else 0
+        }
+    else:
+        frequency_distribution = {
+            "mean": float(statistics.mean(counts)) if color_counter else 0,
+            "median": float(statistics.median(counts)) if color_counter else 0,
+            "std_dev": float(statistics.stdev(counts)) if len(color_counter) > 1 else 0
+        }
     
     return {
-        "total_pixels": len(colors),
+        "total_pixels": total_pixels,
         "unique_colors": len(unique_colors),
-        "diversity_index": round(len(unique_colors) / len(colors), 3) if colors else 0,
+        "diversity_index": round(len(unique_colors) / total_pixels, 3) if total_pixels else 0,
         "most_frequent": {
             "color": f"#{most_frequent[0][0]:02x}{most_frequent[0][1]:02x}{most_frequent[0][2]:02x}",
-            "name": get_accurate_color_name(most_frequent[0][0], most_frequent[0][1], most_frequent[0][2]),
+            "name": get_accurate_color_name(most_frequent[0][0], most_frequent[0][1], most_frequent[0][2], naming),
             "count": most_frequent[1],
-            "percentage": round((most_frequent[1] / len(colors)) * 100, 2) if colors else 0
+            "percentage": round((most_frequent[1] / total_pixels) * 100, 2) if total_pixels else 0
         },
-        "frequency_distribution": {
-            "mean": statistics.mean([count for _, count in color_counter.most_common()]) if color_counter else 0,
-            "median": statistics.median([count for _, count in color_counter.most_common()]) if color_counter else 0,
-            "std_dev": statistics.stdev([count for _, count in color_counter.most_common()]) if len(color_counter) > 1 else 0
-        },
-        "color_richness": "High" if len(unique_colors) / len(colors) > 0.1 else "Medium" if len(unique_colors) / len(colors) > 0.01 else "Low"
+        "frequency_distribution": frequency_distribution,
+        "color_richness": "High" if len(unique_colors) / total_pixels > 0.1 else "Medium" if len(unique_colors) / total_pixels > 0.01 else "Low"
     }
 
-def perform_kmeans_clustering(colors):
-    """Perform K-means clustering"""
+def perform_kmeans_clustering(pixels, color_counter, engine='python', naming='rgb', rng=None, kmeans_mode='auto', context=None):
+    """Perform K-means clustering (K-Means++ seeding + Lloyd iterations)"""
     try:
-        k = min(6, len(set(colors)))
-        clustered_colors = kmeans_plus_plus(list(set(colors)), k)
-        
-        clusters = []
-        for i, center in enumerate(clustered_colors):
-            r, g, b = [int(c) for c in center]
-            clusters.append({
-                "cluster_id": i + 1,
-                "center_color": {
-                    "hex": f"#{r:02x}{g:02x}{b:02x}",
-                    "rgb": {"r": r, "g": g, "b": b},
-                    "name": get_accurate_color_name(r, g, b)
-                },
-                "size": len(colors) // k,
-                "percentage": round(100 / k, 2),
-                "variance": round(statistics.variance([c[0] + c[1] + c[2] for c in colors[:len(colors)//k]]) if len(colors) > k else 0, 2)
-            })
+        if context is None:
+            context = AnalysisContext(color_counter, engine)
+        total_pixels = context.total_samples
+        k = min(6, len(color_counter))
+        if k == 0:
+            return {"clusters": [], "optimal_k": 0}
         
-        return {
-            "clusters": clusters,
-            "optimal_k": k,
-            "total_variance": sum(c["variance"] for c in clusters),
-            "silhouette_score": 0.85,
-            "clustering_quality": "Excellent"
-        }
+        result = run_weighted_kmeans(pixels, color_counter, k, engine, rng, kmeans_mode, context)
+        return format_kmeans_analysis(result, total_pixels, naming)
         
     except Exception as e:
         return {"clusters": [], "optimal_k": 0, "error": str(e)}
 
-def generate_histograms(colors):
+def format_kmeans_analysis(result, total_pixels, naming='rgb'):
+    """Format a K-Means result with clusters ordered by size"""
+    centers = [[int(round(float(c))) for c in center] for center in result["centers"]]
+    sizes = [int(size) for size in result["sizes"]]
+    cluster_sq = [float(sq) for sq in result["cluster_sq"]]
+    order = sorted(range(len(centers)), key=lambda j: (-sizes[j], j))
+    center_names = name_colors([centers[j] for j in order], naming)
+    
+    clusters = []
+    for i, j in enumerate(order):
+        r, g, b = centers[j]
+        clusters.append({
+            "cluster_id": i + 1,
+            "center_color": {
+                "hex": f"#{r:02x}{g:02x}{b:02x}",
+                "rgb": {"r": r, "g": g, "b": b},
+                "name": center_names[i]
+            },
+            "size": sizes[j],
+            "percentage": round(sizes[j] / total_pixels * 100, 2) if total_pixels else 0,
+            # Mean squared distance to the center
+            "variance": round(cluster_sq[j] / sizes[j], 2) if sizes[j] else 0
+        })
+    
+    silhouette = float(result["silhouette"])
+    analysis = {
+        "clusters": clusters,
+        "optimal_k": len(clusters),
+        "total_variance": round(sum(c["variance"] for c in clusters), 2),
+        "inertia": round(float(result["inertia"]), 2),
+        "iterations": result["iterations"],
+        "converged": result["converged"],
+        "mode": result["mode"],
+        "clustered_points": result["points"],
+        "silhouette_score": round(silhouette, 3),
+        "silhouette_method": "simplified_centroid",
+        "clustering_quality": clustering_quality_label(silhouette)
+    }
+    if result["points"] <= result["requested_k"]:
+        # Every point is its own center, so a silhouette says nothing about the clustering
+        analysis.update(
+            silhouette_score=None, clustering_quality="Not applicable",
+            quality_note=f"{result['points']} points for k={result['requested_k']}; each point is its own cluster"
+        )
+    return analysis
+
+# ===== FUSED PIXEL STATISTICS =====
+
+DEFAULT_HISTOGRAM_BINS = 16
+CHANNEL_NAMES = ("red", "green", "blue")
+
+def compute_pixel_statistics(color_counter, total_pixels, engine='python', bins=DEFAULT_HISTOGRAM_BINS, saturation_by_key=None):
+    """Single sweep over the color histogram feeding histograms, color spaces and characteristics.
+
+    Every statistic here depends only on a pixel's color, so one pass over
+    the unique colors weighted by their counts replaces the per-section
+    passes over every pixel.  The Python engine can take per-color
+    saturations already computed for the request.
+    """
+    if engine == 'numpy':
+        channel_counts, warm_colors, saturation_total = pixel_statistics_numpy(color_counter)
+    else:
+        channel_counts = [[0] * 256 for _ in CHANNEL_NAMES]
+        red_counts, green_counts, blue_counts = channel_counts
+        warm_colors = 0
+        saturation_total = 0.0
+        for key, count in color_counter.packed_items():
+            r, g, b = key >> 16, (key >> 8) & 0xFF, key & 0xFF
+            red_counts[r] += count
+            green_counts[g] += count
+            blue_counts[b] += count
+            # (r + g/2) - b > 0, kept in integers
+            if 2 * r + g - 2 * b > 0:
+                warm_colors += count
+            if saturation_by_key is not None:
+                saturation_total += saturation_by_key[key] * count
+                continue
+            max_val = max(r, g, b)
+            if max_val:
+                saturation_total += (max_val - min(r, g, b)) / max_val * count
+    
+    return summarize_pixel_statistics(channel_counts, warm_colors, saturation_total, total_pixels, bins)
+
+def summarize_pixel_statistics(channel_counts, warm_colors, saturation_total, total_pixels, bins):
+    """Fold 256-level channel counts into binned histograms and channel/luminance stats"""
+    histograms = {}
+    channel_stats = {}
+    channel_std = {}
+    channel_means = []
+    for channel, counts in zip(CHANNEL_NAMES, channel_counts):
+        binned = [0] * bins
+        for value, count in enumerate(counts):
+            binned[value * bins // 256] += count
+        histograms[channel] = binned
+        
+        present = [value for value, count in enumerate(counts) if count]
+        if present and total_pixels:
+            mean = sum(value * count for value, count in enumerate(counts)) / total_pixels
+            mean_sq = sum(value * value * count for value, count in enumerate(counts)) / total_pixels
+            channel_means.append(mean)
+            channel_std[channel] = math.sqrt(max(0.0, mean_sq - mean * mean))
+            channel_stats[channel] = {"min": present[0], "max": present[-1], "avg": round(mean, 1)}
+        else:
+            channel_std[channel] = 0.0
+            channel_stats[channel] = {"min": 0, "max": 255, "avg": 128}
+    
+    return {
+        "total_pixels": total_pixels,
+        "bins": bins,
+        "histograms": histograms,
+        "channel_stats": channel_stats,
+        "channel_std": channel_std,
+        "warm_colors": warm_colors,
+        # Luminance is linear in RGB, so its mean is the luminance of the channel means
+        "avg_luminance": calculate_luminance(*channel_means) if total_pixels else 0.5,
+        "avg_saturation": saturation_total / total_pixels if total_pixels else 0.5
+    }
+
+def generate_histograms(pixels, pixel_stats):
     """Generate RGB histograms"""
     try:
-        rgb_hist = {
-            "red": [len([c for c in colors if c[0] in range(i*16, (i+1)*16)]) for i in range(16)],
-            "green": [len([c for c in colors if c[1] in range(i*16, (i+1)*16)]) for i in range(16)],
-            "blue": [len([c for c in colors if c[2] in range(i*16, (i+1)*16)]) for i in range(16)]
-        }
+        rgb_hist = pixel_stats["histograms"]
         
         return {
             "rgb": rgb_hist,
             "statistics": {
                 "distribution_type": "RGB_Enhanced", 
+                "bins": pixel_stats["bins"],
                 "color_balance": {"score": 0.9, "status": "Excellent"},
-                "total_colors": len(colors)
+                "total_colors": pixel_stats["total_pixels"]
             }
         }
         
@@ -917,26 +4379,10 @@ def generate_histograms(colors):
             "statistics": {"distribution_type": "Fallback", "color_balance": {"score": 0.8, "status": "Good"}}
         }
 
-def analyze_color_spaces(colors):
+def analyze_color_spaces(pixels, pixel_stats):
     """Analyze color spaces"""
     try:
-        # RGB analysis
-        rgb_values = {
-            "red": [c[0] for c in colors],
-            "green": [c[1] for c in colors],
-            "blue": [c[2] for c in colors]
-        }
-        
-        rgb_stats = {}
-        for channel, values in rgb_values.items():
-            if values:
-                rgb_stats[channel] = {
-                    "min": min(values),
-                    "max": max(values),
-                    "avg": round(sum(values) / len(values), 1)
-                }
-            else:
-                rgb_stats[channel] = {"min": 0, "max": 255, "avg": 128}
+        rgb_stats = pixel_stats["channel_stats"]
         
         return {
             "rgb": rgb_stats,
@@ -954,23 +4400,15 @@ def analyze_color_spaces(colors):
             "color_space_analysis": {"dominant_space": "RGB", "color_gamut": "Enhanced", "accuracy_improvement": "+50%"}
         }
 
-def analyze_color_characteristics(colors, unique_colors, dominant_colors):
+def analyze_color_characteristics(pixels, unique_colors, dominant_colors, pixel_stats):
     """Analyze color characteristics"""
     try:
-        # Calculate color temperature
-        warm_colors = 0
-        cool_colors = 0
-        
-        for color in colors:
-            r, g, b = color
-            # Simple warm/cool classification
-            warmth = (r + g/2) - b
-            if warmth > 0:
-                warm_colors += 1
-            else:
-                cool_colors += 1
+        total_colors = pixel_stats["total_pixels"]
+        warm_colors = pixel_stats["warm_colors"]
+        avg_brightness = pixel_stats["avg_luminance"]
+        avg_saturation = pixel_stats["avg_saturation"]
         
-        total_colors = len(colors)
+        cool_colors = total_colors - warm_colors
         warm_percentage = (warm_colors / total_colors * 100) if total_colors > 0 else 50
         cool_percentage = (cool_colors / total_colors * 100) if total_colors > 0 else 50
         
@@ -985,10 +4423,6 @@ def analyze_color_characteristics(colors, unique_colors, dominant_colors):
             temp_classification = "Neutral"
             temp_score = 0.5
         
-        # Calculate brightness
-        brightness_values = [calculate_luminance(c[0], c[1], c[2]) for c in colors]
-        avg_brightness = sum(brightness_values) / len(brightness_values) if brightness_values else 0.5
-        
         if avg_brightness > 0.7:
             brightness_level = "High"
         elif avg_brightness > 0.3:
@@ -996,10 +4430,6 @@ def analyze_color_characteristics(colors, unique_colors, dominant_colors):
         else:
             brightness_level = "Low"
         
-        # Calculate saturation
-        saturation_values = [calculate_saturation(c[0], c[1], c[2]) for c in colors]
-        avg_saturation = sum(saturation_values) / len(saturation_values) if saturation_values else 0.5
-        
         if avg_saturation > 0.7:
             saturation_level = "High"
         elif avg_saturation > 0.3:
@@ -1046,7 +4476,7 @@ def analyze_color_characteristics(colors, unique_colors, dominant_colors):
             "mood": {"primary": "Neutral", "secondary": "Balanced", "emotional_impact": "Moderate"}
         }
 
-def generate_training_data(colors, dominant_colors, image_size):
+def generate_training_data(pixels, dominant_colors, image_size):
     """Generate training data"""
     return {
         "training_features": {
@@ -1064,7 +4494,7 @@ def generate_training_data(colors, dominant_colors, image_size):
         }
     }
 
-def perform_cnn_analysis(image_bytes, colors, dominant_colors):
+def perform_cnn_analysis(image_bytes, pixels, dominant_colors):
     """Perform CNN analysis"""
     return {
         "cnn_classification": {"primary_class": "Enhanced_ColorLab_Analysis", "confidence": 0.95},
@@ -1074,4 +4504,312 @@ def perform_cnn_analysis(image_bytes, colors, dominant_colors):
         "accuracy": {"color_naming": "Enhanced", "regional_analysis": "Professional"}
     }
 
-print("🎨 ColorLab complete enhanced Lambda function ready")
+# ===== NUMPY ANALYSIS ENGINE =====
+#
+# Vectorized kernels behind the ``engine='numpy'`` branches of the analysis
+# sections.  They read the same flat RGB buffer through a zero-copy (N, 3)
+# view and feed the same response builders as the pure-Python path, so the
+# two engines can be compared field by field.
+
+ANALYSIS_ENGINES = ('python', 'numpy')
+
+def resolve_analysis_engine(engine='auto'):
+    """Pick the analysis engine, falling back to pure Python without NumPy"""
+    if engine == 'auto':
+        return 'numpy' if np is not None else 'python'
+    if engine not in ANALYSIS_ENGINES:
+        raise ValueError(f"Unknown analysis engine '{engine}'")
+    if engine == 'numpy' and np is None:
+        print("⚠️ NumPy not available, using the pure-Python engine")
+        return 'python'
+    return engine
+
+def pixel_array_numpy(pixels):
+    """Zero-copy (N, 3) uint8 view of a flat RGB buffer"""
+    return np.frombuffer(pixels, dtype=np.uint8).reshape(-1, 3)
+
+def pack_colors_numpy(pixel_array):
+    """Pack (N, 3) RGB rows into 24-bit integer keys"""
+    return ((pixel_array[:, 0].astype(np.uint32) << 16)
+            | (pixel_array[:, 1].astype(np.uint32) << 8)
+            | pixel_array[:, 2])
+
+# Above this many pixels a dense 2^24-bin bincount beats sorting the keys
+DENSE_BINCOUNT_MIN_PIXELS = 1 << 21
+# Histogram-wide passes work through the unique colors in chunks of this many
+HISTOGRAM_CHUNK_COLORS = 1 << 20
+
+class NumpyColorHistogram:
+    """Bincount over packed color keys with the PackedColorCounter interface.
+
+    Large inputs use a dense 2^24-bin bincount, small ones np.unique.  Keys
+    are stored in most_common order (count descending, key ascending).
+    """
+    
+    def __init__(self, packed_colors):
+        if len(packed_colors) >= DENSE_BINCOUNT_MIN_PIXELS:
+            dense_counts = np.bincount(packed_colors, minlength=1 << 24)
+            keys = np.flatnonzero(dense_counts).astype(np.uint32)
+            counts = dense_counts[keys]
+        else:
+            keys, counts = np.unique(packed_colors, return_counts=True)
+            keys = keys.astype(np.uint32)
+        self.store_sorted(keys, counts)
+    
+    def store_sorted(self, keys, counts):
+        """Store ascending keys and their counts in most_common order"""
+        order = np.argsort(-counts, kind='stable')
+        self.keys = keys[order]
+        self.key_counts = counts[order].astype(np.int64)
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    def colors(self):
+        """Unique colors as a (U, 3) uint8 array in most-common order"""
+        colors = np.empty((len(self.keys), 3), dtype=np.uint8)
+        colors[:, 0] = self.keys >> 16
+        colors[:, 1] = (self.keys >> 8) & 0xFF
+        colors[:, 2] = self.keys & 0xFF
+        return colors
+    
+    def counts(self):
+        """Per-color pixel counts in most-common order"""
+        return self.key_counts
+    
+    def colors_by_key(self):
+        """(colors, counts) in ascending packed-key order, the engine-independent seeding order"""
+        order = np.argsort(self.keys)
+        keys = self.keys[order]
+        colors = np.empty((len(keys), 3), dtype=np.uint8)
+        colors[:, 0] = keys >> 16
+        colors[:, 1] = (keys >> 8) & 0xFF
+        colors[:, 2] = keys & 0xFF
+        return colors, self.key_counts[order]
+    
+    def total(self):
+        """Number of pixels counted"""
+        return int(self.key_counts.sum())
+    
+    def most_common(self, n=None):
+        """List the n most common ((r, g, b), count) pairs"""
+        return [
+            (unpack_color(key), count)
+            for key, count in zip(self.keys[:n].tolist(), self.key_counts[:n].tolist())
+        ]
+    
+    def subtract(self, other):
+        """Histogram of the pixels counted here but not in ``other`` (a sub-histogram)"""
+        order = np.argsort(self.keys)
+        keys, counts = self.keys[order], self.key_counts[order].copy()
+        counts[np.searchsorted(keys, other.keys)] -= other.key_counts
+        remaining = NumpyColorHistogram.__new__(NumpyColorHistogram)
+        remaining.store_sorted(keys[counts > 0], counts[counts > 0])
+        return remaining
+
+def kmeans_plus_plus_numpy(points, k=6, rng=None, weights=None, candidates=1):
+    """K-Means++ seeding over an (N, 3) array with a running min-distance vector"""
+    rng = rng or random
+    if len(points) <= k:
+        return [tuple(float(c) for c in point) for point in points]
+    
+    points = np.asarray(points, dtype=np.float64)
+    weights = np.ones(len(points)) if weights is None else np.asarray(weights, dtype=np.float64)
+    
+    def sample(cumulative):
+        index = int(np.searchsorted(cumulative, rng.uniform(0, cumulative[-1]), side='right'))
+        return min(index, len(points) - 1)
+    
+    centers = [points[sample(np.cumsum(weights))]]
+    min_sq_dist = squared_distances_numpy(points, centers[0])
+    
+    for _ in range(k - 1):
+        cumulative = np.cumsum(min_sq_dist * weights)
+        if cumulative[-1] == 0:
+            indices = [rng.randrange(len(points))]
+        else:
+            indices = [sample(cumulative) for _ in range(candidates)]
+        # Greedy k-means++: keep the candidate that lowers the potential most,
+        # one N-vector per candidate rather than an N x candidates x 3 block
+        best_potential = None
+        for index in indices:
+            candidate_sq_dist = np.minimum(min_sq_dist, squared_distances_numpy(points, points[index]))
+            potential = float((candidate_sq_dist * weights).sum())
+            if best_potential is None or potential < best_potential:
+                best, best_sq_dist, best_potential = index, candidate_sq_dist, potential
+        centers.append(points[best])
+        min_sq_dist = best_sq_dist
+    
+    return [tuple(float(c) for c in center) for center in centers]
+
+def squared_distances_numpy(points, center):
+    """Squared distance from every row of an (N, 3) array to one center, channel by channel so only N-vectors are allocated"""
+    sq_dist = (points[:, 0] - center[0]) ** 2
+    sq_dist += (points[:, 1] - center[1]) ** 2
+    sq_dist += (points[:, 2] - center[2]) ** 2
+    return sq_dist
+
+KMEANS_CHUNK_ROWS = 1 << 18
+
+def assign_clusters_numpy(points, centers, with_distances=True):
+    """Labels plus nearest and runner-up squared distances, in bounded-memory chunks.
+
+    The per-point |x|^2 term does not change the argmin, so the Lloyd loop asks
+    for labels only and skips it along with the runner-up partition.
+    """
+    count, k = len(points), len(centers)
+    labels = np.empty(count, dtype=np.intp)
+    nearest_sq = np.empty(count, dtype=np.float64) if with_distances else None
+    second_sq = np.full(count, np.inf) if with_distances else None
+    centers_sq = (centers ** 2).sum(axis=1)
+    
+    for start in range(0, count, KMEANS_CHUNK_ROWS):
+        chunk = points[start:start + KMEANS_CHUNK_ROWS].astype(np.float64)
+        dist = centers_sq - 2 * chunk @ centers.T
+        end = start + len(chunk)
+        labels[start:end] = dist.argmin(axis=1)
+        if not with_distances:
+            continue
+        dist += (chunk ** 2).sum(axis=1)[:, None]
+        np.maximum(dist, 0, out=dist)
+        if k > 1:
+            dist.partition(1, axis=1)
+            second_sq[start:end] = dist[:, 1]
+        nearest_sq[start:end] = dist[:, 0]
+    
+    return labels, nearest_sq, second_sq
+
+def build_kmeans_coreset_numpy(colors, counts, bits=KMEANS_CORESET_BITS):
+    """Grid coreset of a (U, 3) color histogram: weighted cell means plus their scatter.
+
+    Cell sums are dense over the 2^(3*bits) cells and filled chunk by chunk,
+    so temporaries stay bounded however many colors the histogram holds.
+    """
+    shift = 8 - bits
+    cell_count = 1 << (3 * bits)
+    weights = np.zeros(cell_count)
+    sums = np.zeros((cell_count, 3))
+    sum_sq = np.zeros(cell_count)
+    
+    for start in range(0, len(colors), HISTOGRAM_CHUNK_COLORS):
+        chunk = colors[start:start + HISTOGRAM_CHUNK_COLORS].astype(np.intp)
+        chunk_counts = np.asarray(counts[start:start + HISTOGRAM_CHUNK_COLORS], dtype=np.float64)
+        cells = chunk >> shift
+        cells = (cells[:, 0] << (2 * bits)) | (cells[:, 1] << bits) | cells[:, 2]
+        weights += np.bincount(cells, weights=chunk_counts, minlength=cell_count)
+        for c in range(3):
+            sums[:, c] += np.bincount(cells, weights=chunk[:, c] * chunk_counts, minlength=cell_count)
+        sum_sq += np.bincount(cells, weights=(chunk ** 2).sum(axis=1) * chunk_counts, minlength=cell_count)
+    
+    occupied = weights > 0
+    weights, sum_sq = weights[occupied], sum_sq[occupied]
+    points = sums[occupied] / weights[:, None]
+    scatter = np.maximum(sum_sq - weights * (points ** 2).sum(axis=1), 0)
+    return points, weights, scatter
+
+def kmeans_lloyd_numpy(points, centers, weights=None, max_iterations=KMEANS_MAX_ITERATIONS, tolerance=KMEANS_TOLERANCE, scatter=None):
+    """Weighted Lloyd iterations over an (N, 3) array with a vectorized assignment step"""
+    centers = np.asarray(centers, dtype=np.float64)
+    k = len(centers)
+    weights = np.ones(len(points)) if weights is None else np.asarray(weights, dtype=np.float64)
+    iterations = 0
+    converged = False
+    
+    while iterations < max_iterations:
+        labels = assign_clusters_numpy(points, centers, with_distances=False)[0]
+        totals = np.bincount(labels, weights=weights, minlength=k)
+        sums = np.stack([
+            np.bincount(labels, weights=points[:, c] * weights, minlength=k) for c in range(3)
+        ], axis=1)
+        # Empty clusters keep their previous center
+        new_centers = np.where(totals[:, None] > 0, sums / np.maximum(totals, 1)[:, None], centers)
+        shift = float(np.abs(new_centers - centers).max())
+        centers = new_centers
+        iterations += 1
+        if shift <= tolerance:
+            converged = True
+            break
+    
+    labels, nearest_sq, second_sq = assign_clusters_numpy(points, centers)
+    sizes = np.bincount(labels, weights=weights, minlength=k)
+    cluster_sq = np.bincount(labels, weights=nearest_sq * weights, minlength=k)
+    if scatter is not None:
+        cluster_sq += np.bincount(labels, weights=scatter, minlength=k)
+    silhouette = 0.0
+    if k > 1 and weights.sum() > 0:
+        a, b = np.sqrt(nearest_sq), np.sqrt(second_sq)
+        scores = np.divide(b - a, b, out=np.zeros_like(b), where=b > 0)
+        silhouette = float(np.average(scores, weights=weights))
+    
+    return {
+        "centers": centers.tolist(),
+        "sizes": sizes.tolist(),
+        "cluster_sq": cluster_sq.tolist(),
+        "inertia": float(cluster_sq.sum()),
+        "silhouette": silhouette,
+        "iterations": iterations,
+        "converged": converged
+    }
+
+def saturation_numpy(pixel_array):
+    """Per-pixel HSV-style saturation (max - min) / max of a (..., 3) array"""
+    max_val = pixel_array.max(axis=-1).astype(np.float32)
+    min_val = pixel_array.min(axis=-1).astype(np.float32)
+    return np.divide(max_val - min_val, max_val, out=np.zeros_like(max_val), where=max_val > 0)
+
+def pixel_statistics_numpy(color_histogram):
+    """Count-weighted 256-level channel counts, warm count and saturation sum, in color chunks"""
+    channel_counts = np.zeros((3, 256), dtype=np.int64)
+    warm_colors = 0
+    saturation_total = 0.0
+    
+    for start in range(0, len(color_histogram.keys), HISTOGRAM_CHUNK_COLORS):
+        keys = color_histogram.keys[start:start + HISTOGRAM_CHUNK_COLORS].astype(np.int64)
+        counts = color_histogram.key_counts[start:start + HISTOGRAM_CHUNK_COLORS]
+        channels = [(keys >> 16) & 0xFF, (keys >> 8) & 0xFF, keys & 0xFF]
+        for channel, values in enumerate(channels):
+            channel_counts[channel] += np.bincount(values, weights=counts, minlength=256).astype(np.int64)
+        
+        r, g, b = channels
+        warm_colors += int(counts[2 * r + g - 2 * b > 0].sum())
+        
+        max_val = np.maximum(np.maximum(r, g), b).astype(np.float64)
+        min_val = np.minimum(np.minimum(r, g), b).astype(np.float64)
+        saturation = np.divide(max_val - min_val, max_val, out=np.zeros_like(max_val), where=max_val > 0)
+        saturation_total += float((saturation * counts).sum())
+    
+    return channel_counts.tolist(), warm_colors, saturation_total
+
+def region_block_sums_numpy(image, xs, ys):
+    """(len(ys) - 1, len(xs) - 1, 4) red/green/blue/saturation sums of the lattice blocks.
+
+    Rows outside [ys[0], ys[-1]) are ignored, so horizontal bands can be
+    summed separately (e.g. in worker processes) with identical results.
+    """
+    def block_sums(plane):
+        rows = np.add.reduceat(plane, ys[:-1], axis=0, dtype=np.float64)
+        return np.add.reduceat(rows, xs[:-1], axis=1)
+    
+    image = image[ys[0]:ys[-1]]
+    ys = [y - ys[0] for y in ys]
+    planes = [image[:, :, c] for c in range(3)] + [saturation_numpy(image)]
+    return np.stack([block_sums(plane) for plane in planes], axis=-1)
+
+def build_region_sums_numpy(image, xs, ys, blocks=None):
+    """Lattice summed-area table from block sums of an (H, W, 3) image"""
+    if blocks is None:
+        blocks = region_block_sums_numpy(image, xs, ys)
+    lattice = np.zeros((len(ys), len(xs), 4))
+    lattice[1:, 1:] = blocks.cumsum(axis=0).cumsum(axis=1)
+    return SummedAreaTable(xs, ys, lattice)
+
+IMPORT_TIME_MS = round((time.perf_counter() - MODULE_LOAD_STARTED) * 1000, 1)
+print(f"🎨 ColorLab complete enhanced Lambda function ready (imported in {IMPORT_TIME_MS} ms)")
+
+if __name__ == '__main__':
+    # Build step: python lambda_function_colorlab_complete.py build-artifacts [path]
+    if len(sys.argv) < 2 or sys.argv[1] != 'build-artifacts':
+        sys.exit("usage: lambda_function_colorlab_complete.py build-artifacts [path]")
+    load_optional_modules()
+    artifacts_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_ARTIFACTS_PATH
+    print(f"📦 Wrote {write_color_artifacts(artifacts_path)} bytes of color artifacts to {artifacts_path}")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The Lambda handler and its tools are flat modules in assets/code
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
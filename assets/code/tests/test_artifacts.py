@@ -0,0 +1,78 @@
+"""Build artifacts memory-map back to the computed tables; missing or stale files fall back"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import lambda_function_colorlab_complete as colorlab
+
+@pytest.fixture
+def artifacts_env(monkeypatch, tmp_path):
+    """Point color_artifacts() at tmp_path/artifacts.bin and reset its caches around the test"""
+    path = tmp_path / "artifacts.bin"
+    monkeypatch.setenv(colorlab.ARTIFACTS_ENV, str(path))
+    monkeypatch.setattr(colorlab, "NAME_LUT", None)
+    colorlab.color_artifacts.cache_clear()
+    yield path
+    colorlab.color_artifacts.cache_clear()
+
+@pytest.fixture(scope="module")
+def computed():
+    return colorlab.compute_color_artifacts(with_name_lut=True)
+
+def test_build_then_mmap_matches_computed_tables(artifacts_env, computed):
+    size = colorlab.write_color_artifacts(str(artifacts_env))
+    assert size == os.path.getsize(artifacts_env)
+    
+    loaded = colorlab.color_artifacts()
+    assert loaded.source == "mmap"
+    assert list(loaded.srgb_linear) == list(computed.srgb_linear)
+    assert loaded.palette_lab == computed.palette_lab
+    assert list(loaded.palette_chroma) == list(computed.palette_chroma)
+    assert loaded.name_lut_width == computed.name_lut_width
+    assert np.array_equal(loaded.name_lut_numpy(), computed.name_lut_numpy())
+    assert np.array_equal(loaded.name_lut_numpy(), colorlab.build_name_lut_numpy())
+
+def test_naming_through_mmap_tables_matches_scan(artifacts_env):
+    colorlab.write_color_artifacts(str(artifacts_env))
+    rng = np.random.default_rng(3)
+    colors = rng.integers(0, 256, size=(300, 3))
+    names = colorlab.name_colors(colors)
+    assert colorlab.color_artifacts().source == "mmap"
+    assert names == [colorlab.get_accurate_color_name(*map(int, color)) for color in colors]
+
+def test_build_artifacts_command(tmp_path, computed):
+    path = tmp_path / "cli.bin"
+    subprocess.run([sys.executable, colorlab.__file__, "build-artifacts", str(path)], check=True, capture_output=True)
+    loaded = colorlab.load_color_artifacts(str(path))
+    assert np.array_equal(loaded.name_lut_numpy(), computed.name_lut_numpy())
+
+def test_missing_file_falls_back_to_computed(artifacts_env, computed):
+    assert not artifacts_env.exists()
+    fallback = colorlab.color_artifacts()
+    assert fallback.source == "computed"
+    assert fallback.name_lut is None
+    assert list(fallback.srgb_linear) == list(computed.srgb_linear)
+    assert colorlab.name_colors([(250, 10, 10)]) == [colorlab.get_accurate_color_name(250, 10, 10)]
+
+@pytest.mark.parametrize("damage", ["empty", "magic", "truncated"])
+def test_damaged_file_is_ignored(artifacts_env, damage):
+    colorlab.write_color_artifacts(str(artifacts_env))
+    data = artifacts_env.read_bytes()
+    data = {"empty": b"", "magic": b"NOTCLAB!" + data[8:], "truncated": data[:len(data) // 2]}[damage]
+    artifacts_env.write_bytes(data)
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        assert colorlab.color_artifacts().source == "computed"
+    assert "Ignoring color artifacts" in out.getvalue()
+
+def test_stale_database_fingerprint_is_ignored(artifacts_env, monkeypatch):
+    colorlab.write_color_artifacts(str(artifacts_env))
+    monkeypatch.setattr(colorlab, "color_database_fingerprint", lambda: b"\0" * 16)
+    with pytest.raises(ValueError, match="different color database"):
+        colorlab.load_color_artifacts(str(artifacts_env))
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert colorlab.color_artifacts().source == "computed"
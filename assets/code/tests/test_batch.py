@@ -0,0 +1,41 @@
+"""Batch requests fail bad items individually and fork the rest"""
+import base64
+import contextlib
+import io
+import json
+
+import pytest
+
+import colorlab_corpus
+import lambda_function_colorlab_complete as colorlab
+
+IMAGE = base64.b64encode(colorlab_corpus.encode_image(colorlab_corpus.synthetic_image("photo", 0.01, seed=1))).decode()
+
+def analyze_batch(body):
+    event = {"httpMethod": "POST", "path": "/analyze/batch", "headers": {}, "body": json.dumps(body)}
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = colorlab.lambda_handler(event, None)
+    return response["statusCode"], json.loads(response["body"])
+
+@pytest.mark.parametrize("cache", [True, False])
+@pytest.mark.parametrize("image_data", [5, None, ["a"], {"b": 1}, "", "abc"])
+def test_bad_image_data_fails_only_its_item(image_data, cache):
+    status, body = analyze_batch({"images": [{"image_data": image_data}, IMAGE], "cache": cache})
+    assert status == 200
+    first, second = body["results"]
+    assert first["success"] is False and first["error"]
+    assert second["success"] is True
+    assert body["summary"]["failed"] == 1
+
+def test_forked_batch_matches_sequential(monkeypatch):
+    request = {"images": [IMAGE, IMAGE, {"image_data": IMAGE, "grid": "2x2"}], "cache": False, "seed": 3}
+    monkeypatch.setenv(colorlab.BATCH_WORKERS_ENV, "1")
+    _, sequential = analyze_batch(request)
+    monkeypatch.setenv(colorlab.BATCH_WORKERS_ENV, "2")
+    _, forked = analyze_batch(request)
+    assert sequential["summary"]["execution"] == "sequential"
+    assert forked["summary"]["execution"] == "fork"
+    for left, right in zip(sequential["results"], forked["results"]):
+        left["analysis"].pop("metadata")
+        right["analysis"].pop("metadata")
+        assert left == right
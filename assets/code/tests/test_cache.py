@@ -0,0 +1,101 @@
+"""Result cache: sizes come from the response bytes, entries expire and evict"""
+import base64
+import contextlib
+import io
+import json
+
+import pytest
+
+import colorlab_corpus
+import lambda_function_colorlab_complete as colorlab
+
+IMAGE = colorlab_corpus.encode_image(colorlab_corpus.synthetic_image("few_color", 0.005, seed=2))
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = colorlab.ResultCache()
+    monkeypatch.setattr(colorlab, "RESULT_CACHE", cache)
+    monkeypatch.setattr(colorlab, "PERSISTENT_CACHE", False)
+    return cache
+
+def post(path, body, headers=None):
+    event = {"httpMethod": "POST", "path": path, "headers": headers or {}, "body": json.dumps(body)}
+    with contextlib.redirect_stdout(io.StringIO()):
+        return colorlab.lambda_handler(event, None)
+
+def test_miss_is_weighed_by_the_response_bytes(cache, monkeypatch):
+    serialized = []
+    original = colorlab.serialize_json
+    monkeypatch.setattr(colorlab, "serialize_json", lambda payload: serialized.append(payload) or original(payload))
+    response = post("/analyze", {"image_data": base64.b64encode(IMAGE).decode(), "seed": 1})
+    assert len(serialized) == 1
+    (size,) = [entry[2] for entry in cache.entries.values()]
+    assert size == len(response["body"].encode("utf-8"))
+
+def test_ndjson_miss_is_weighed_by_its_records(cache):
+    records = list(colorlab.ndjson_analysis_records(IMAGE, seed=1))
+    (size,) = [entry[2] for entry in cache.entries.values()]
+    assert size == sum(len(record.encode("utf-8")) - 1 for record in records)
+
+def test_batch_misses_are_weighed_by_their_results(cache):
+    image_data = base64.b64encode(IMAGE).decode()
+    response = post("/analyze/batch", {"images": [image_data, {"image_data": image_data, "grid": "2x2"}], "seed": 1})
+    body = json.loads(response["body"])
+    sizes = sorted(entry[2] for entry in cache.entries.values())
+    assert sizes == sorted(len(colorlab.serialize_json(result)) for result in body["results"])
+
+def test_serialize_json_with_list_matches_serialize_json():
+    payload = {"success": True, "results": [{"a": 1}, {"b": [2, 3]}], "summary": {"total": 2}}
+    body, items = colorlab.serialize_json_with_list(payload, "results")
+    assert json.loads(body) == payload
+    assert items == [colorlab.serialize_json(item) for item in payload["results"]]
+    assert json.loads(colorlab.serialize_json_with_list({"results": []}, "results")[0]) == {"results": []}
+
+@pytest.mark.parametrize("memory_mode", ["full", "bounded"])
+def test_failed_extraction_is_a_500_and_never_cached(cache, monkeypatch, memory_mode):
+    def broken(*args, **kwargs):
+        raise RuntimeError("counter bug")
+    monkeypatch.setattr(colorlab, "build_color_histogram", broken)
+    monkeypatch.setattr(colorlab.StreamingColorHistogram, "add", broken)
+    body = {"image_data": base64.b64encode(IMAGE).decode(), "memory_mode": memory_mode}
+    response = post("/analyze", body)
+    assert response["statusCode"] == 500
+    assert "counter bug" in json.loads(response["body"])["error"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert "error" in colorlab.perform_enhanced_colorlab_analysis(IMAGE, memory_mode=memory_mode)
+    assert not cache.entries
+
+def test_hits_misses_and_lru_eviction_by_bytes():
+    cache = colorlab.ResultCache(max_bytes=100)
+    assert cache.get("a") is None
+    cache.put("a", {"n": 1}, 40)
+    cache.put("b", {"n": 2}, 40)
+    assert cache.get("a") == {"n": 1}  # now most recently used
+    cache.put("c", {"n": 3}, 40)
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.total_bytes == 80
+    cache.put("huge", {}, 101)
+    assert "huge" not in cache.entries
+    cache.put("a", {"n": 4}, 10)
+    assert cache.get("a") == {"n": 4} and cache.total_bytes == 50
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(colorlab.time, "monotonic", lambda: now[0])
+    cache = colorlab.ResultCache(ttl_seconds=60)
+    cache.put("a", {"n": 1}, 10)
+    now[0] += 60
+    assert cache.get("a") == {"n": 1}
+    now[0] += 0.5
+    assert cache.get("a") is None
+    assert cache.total_bytes == 0 and not cache.entries
+
+def test_cache_status_in_metadata(cache):
+    body = {"image_data": base64.b64encode(IMAGE).decode(), "seed": 9}
+    statuses = [json.loads(post("/analyze", body)["body"])["analysis"]["metadata"]["cache"] for _ in range(2)]
+    assert statuses == ["miss", "hit"]
+    bypass = json.loads(post("/analyze", dict(body, cache=False))["body"])["analysis"]["metadata"]["cache"]
+    assert bypass == "bypass"
+    other_options = json.loads(post("/analyze", dict(body, grid="2x2"))["body"])["analysis"]["metadata"]["cache"]
+    assert other_options == "miss"
@@ -0,0 +1,78 @@
+"""Persistent cache backends round-trip results, stay under their cap and are keyed by schema"""
+import contextlib
+import io
+import json
+
+import pytest
+
+import lambda_function_colorlab_complete as colorlab
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield colorlab.SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"), max_bytes=1000)
+
+def test_sqlite_round_trip(sqlite_backend, tmp_path):
+    value = {"dominant_colors": [{"hex": "#ff0000", "percentage": 12.5}], "metadata": {"seed": 1}}
+    sqlite_backend.put("key", value)
+    stored, size = sqlite_backend.get("key")
+    assert stored == value
+    assert size == len(json.dumps(value))
+    assert sqlite_backend.get("missing") is None
+    # A second container opening the same file sees the entry
+    reopened = colorlab.SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"))
+    assert reopened.get("key")[0] == value
+
+def test_sqlite_evicts_oldest_entries_past_the_cap(sqlite_backend):
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(6):
+            sqlite_backend.put(f"key{i}", {"payload": "x" * 280})
+    kept = [i for i in range(6) if sqlite_backend.get(f"key{i}") is not None]
+    assert kept == [3, 4, 5]
+    total = sqlite_backend.connection.execute("SELECT SUM(size) FROM analysis_results").fetchone()[0]
+    assert total <= sqlite_backend.max_bytes
+
+class FakeObjectStore:
+    """boto3 S3 client stand-in"""
+    
+    def __init__(self):
+        self.objects = {}
+    
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[(Bucket, Key)] = Body
+    
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            error = Exception("NoSuchKey")
+            error.response = {"Error": {"Code": "NoSuchKey"}}
+            raise error
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+def test_object_store_round_trip():
+    client = FakeObjectStore()
+    backend = colorlab.ObjectStoreCacheBackend("bucket", prefix="p/", client=client)
+    backend.put("key", {"a": [1, 2]})
+    assert list(client.objects) == [("bucket", "p/key.json")]
+    assert backend.get("key") == ({"a": [1, 2]}, len(client.objects[("bucket", "p/key.json")]))
+    assert backend.get("other") is None
+
+def test_persistent_hit_refills_memory(sqlite_backend, monkeypatch):
+    monkeypatch.setattr(colorlab, "RESULT_CACHE", colorlab.ResultCache())
+    monkeypatch.setattr(colorlab, "PERSISTENT_CACHE", sqlite_backend)
+    sqlite_backend.put("key", {"metadata": {"seed": 1}})
+    with contextlib.redirect_stdout(io.StringIO()):
+        found = colorlab.lookup_cached_analysis("key")
+    assert found["metadata"]["cache"] == "persistent_hit"
+    assert colorlab.RESULT_CACHE.entries["key"][2] == sqlite_backend.get("key")[1]
+    assert colorlab.lookup_cached_analysis("key")["metadata"]["cache"] == "hit"
+
+def test_schema_version_changes_the_key(sqlite_backend, monkeypatch):
+    image_bytes, options = b"image", ("numpy", "rgb", 1)
+    old_key = colorlab.result_cache_key(image_bytes, *options)
+    assert old_key == colorlab.result_cache_key(image_bytes, *options)
+    sqlite_backend.put(old_key, {"metadata": {}})
+    monkeypatch.setattr(colorlab, "CACHE_SCHEMA_VERSION", colorlab.CACHE_SCHEMA_VERSION + 1)
+    new_key = colorlab.result_cache_key(image_bytes, *options)
+    assert new_key != old_key
+    assert f"/s{colorlab.CACHE_SCHEMA_VERSION}/" in new_key
+    assert sqlite_backend.get(new_key) is None
@@ -0,0 +1,109 @@
+"""Responses are compressed per Accept-Encoding and palette mode decodes back to the full analysis"""
+import base64
+import gzip
+import json
+
+import pytest
+
+import colorlab_corpus
+import lambda_function_colorlab_complete as colorlab
+
+IMAGE = base64.b64encode(colorlab_corpus.encode_image(colorlab_corpus.synthetic_image("photo", 0.01, seed=4))).decode()
+
+def analyze(body, headers=None):
+    event = {"httpMethod": "POST", "path": "/analyze", "headers": headers or {},
+             "body": json.dumps({"image_data": IMAGE, "seed": 9, "cache": False, **body})}
+    response = colorlab.lambda_handler(event, None)
+    assert response["statusCode"] == 200
+    return response
+
+def response_json(response):
+    body = response["body"]
+    if response.get("isBase64Encoded"):
+        body = base64.b64decode(body)
+        encoding = response["headers"]["Content-Encoding"]
+        body = colorlab.brotli.decompress(body) if encoding == "br" else gzip.decompress(body)
+    return json.loads(body)
+
+def without_run_details(analysis):
+    metadata = {k: v for k, v in analysis["metadata"].items() if k not in ("timings", "cache", "memory", "timestamp", "processing_time")}
+    return dict(analysis, metadata=metadata)
+
+@pytest.mark.parametrize("accept, expected", [
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("deflate, gzip;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("GZIP", "gzip"),
+    ("*", "gzip"),
+    ("*, gzip;q=0", None),
+    ("gzip;q=bogus", None),
+])
+def test_negotiation_without_brotli(monkeypatch, accept, expected):
+    monkeypatch.setattr(colorlab, "brotli", None)
+    assert colorlab.negotiate_content_encoding(accept) == expected
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip;q=0.1", "gzip"),
+    ("*", "br"),
+    ("br", "br"),
+    ("identity", None),
+])
+def test_negotiation_prefers_brotli_when_installed(monkeypatch, accept, expected):
+    monkeypatch.setattr(colorlab, "brotli", object())
+    assert colorlab.negotiate_content_encoding(accept) == expected
+
+@pytest.mark.parametrize("accept", ["gzip", "br", "identity"])
+def test_compressed_response_decodes_to_the_plain_one(accept):
+    if accept == "br":
+        pytest.importorskip("brotli")
+    plain = analyze({})
+    assert not plain.get("isBase64Encoded")
+    assert "Content-Encoding" not in plain["headers"]
+    
+    response = analyze({}, headers={"Accept-Encoding": accept})
+    if accept == "identity":
+        assert not response.get("isBase64Encoded")
+    else:
+        assert response["isBase64Encoded"]
+        assert response["headers"]["Content-Encoding"] == accept
+        assert response["headers"]["Vary"] == "Accept-Encoding"
+    assert without_run_details(response_json(response)["analysis"]) == without_run_details(response_json(plain)["analysis"])
+
+def test_small_bodies_are_not_compressed():
+    response = colorlab.json_response(200, {}, {"ok": True}, {"accept-encoding": "gzip"})
+    assert response == {"statusCode": 200, "headers": {}, "body": '{"ok":true}'}
+
+def palette_decode(value, palette):
+    if isinstance(value, list):
+        return [palette_decode(item, palette) for item in value]
+    if not isinstance(value, dict):
+        return value
+    # color_frequency.most_frequent keeps a hex string under "color"; palette indexes are ints
+    index = value.get("color")
+    if not isinstance(index, int):
+        return {k: palette_decode(v, palette) for k, v in value.items()}
+    decoded = {k: palette_decode(v, palette) for k, v in value.items() if k != "color"}
+    decoded.update(palette[index])
+    return decoded
+
+def test_palette_round_trip():
+    plain = response_json(analyze({}))
+    encoded = response_json(analyze({"palette": True}))
+    palette = encoded["palette"]
+    assert len({json.dumps(color, sort_keys=True) for color in palette}) == len(palette)
+    assert '"hex"' not in json.dumps(encoded["analysis"])
+    decoded = palette_decode(encoded["analysis"], palette)
+    assert without_run_details(decoded) == without_run_details(plain["analysis"])
+
+def test_palette_encoding_leaves_the_input_alone():
+    payload = {"colors": [{"hex": "#000000", "rgb": [0, 0, 0], "name": "Black", "percentage": 60.0},
+                          {"hex": "#000000", "rgb": [0, 0, 0], "name": "Black", "percentage": 40.0}]}
+    original = json.loads(json.dumps(payload))
+    encoded, palette = colorlab.palette_encode_colors(payload)
+    assert payload == original
+    assert palette == [{"hex": "#000000", "rgb": [0, 0, 0], "name": "Black"}]
+    assert encoded == {"colors": [{"color": 0, "percentage": 60.0}, {"color": 0, "percentage": 40.0}]}
@@ -0,0 +1,36 @@
+"""The Python and NumPy engines must return the same analysis for the same seed"""
+import pytest
+
+import colorlab_corpus
+import lambda_function_colorlab_complete as colorlab
+
+PARITY_FIELDS = colorlab.parse_analysis_fields("dominant_colors,color_frequency,kmeans_analysis")
+
+def analyze(image_bytes, engine, **options):
+    analysis = colorlab.perform_enhanced_colorlab_analysis(
+        image_bytes, engine=engine, seed=7, use_cache=False, fields=PARITY_FIELDS, **options
+    )
+    assert "error" not in analysis
+    analysis.pop("metadata")
+    return analysis
+
+def palette(analysis):
+    return (
+        [(color["hex"], color["percentage"]) for color in analysis["dominant_colors"]],
+        [(cluster["center_color"]["hex"], cluster["size"]) for cluster in analysis["kmeans_analysis"]["clusters"]],
+    )
+
+@pytest.mark.parametrize("kind", ["photo", "few_color", "noise", "gradient"])
+@pytest.mark.parametrize("kmeans_mode", ["auto", "histogram", "coreset", "pixels"])
+def test_engines_pick_the_same_clusters(kind, kmeans_mode):
+    image_bytes = colorlab_corpus.encode_image(colorlab_corpus.synthetic_image(kind, 0.01, seed=1))
+    python = analyze(image_bytes, "python", kmeans_mode=kmeans_mode)
+    numpy = analyze(image_bytes, "numpy", kmeans_mode=kmeans_mode)
+    assert palette(python) == palette(numpy)
+
+def test_frequency_distribution_types_match():
+    image_bytes = colorlab_corpus.encode_image(colorlab_corpus.synthetic_image("noise", 0.02, seed=1))
+    python = analyze(image_bytes, "python")["color_frequency"]["frequency_distribution"]
+    numpy = analyze(image_bytes, "numpy")["color_frequency"]["frequency_distribution"]
+    assert {key: type(value) for key, value in python.items()} == {key: type(value) for key, value in numpy.items()}
+    assert python == pytest.approx(numpy)
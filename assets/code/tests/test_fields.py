@@ -0,0 +1,21 @@
+"""Field selection computes only what the requested sections need"""
+import colorlab_corpus
+import lambda_function_colorlab_complete as colorlab
+
+IMAGE = colorlab_corpus.encode_image(colorlab_corpus.synthetic_image("photo", 0.05, seed=4))
+
+def metadata(fields, quality="exact"):
+    analysis = colorlab.perform_enhanced_colorlab_analysis(
+        IMAGE, engine="numpy", quality=quality, use_cache=False, fields=colorlab.parse_analysis_fields(fields)
+    )
+    return analysis["metadata"]
+
+def test_pixel_statistics_skipped_without_statistics_sections():
+    assert "pixel_statistics" not in metadata("dominant_colors,kmeans_analysis")["timings"]
+    assert "pixel_statistics" in metadata("dominant_colors,histograms")["timings"]
+
+def test_pixel_statistics_kept_for_sampling_error(monkeypatch):
+    monkeypatch.setitem(colorlab.QUALITY_SAMPLE_TARGETS, "fast", 1 << 12)
+    meta = metadata("dominant_colors", quality="fast")
+    assert "pixel_statistics" in meta["timings"]
+    assert meta["sampling"]["estimated_error"]["channel_mean"]["red"] > 0
@@ -0,0 +1,38 @@
+"""K-Means sections on images whose colors cluster into fewer points than k"""
+import numpy as np
+import pytest
+
+import colorlab_corpus
+import lambda_function_colorlab_complete as colorlab
+
+def analyze(image, engine, kmeans_mode='auto'):
+    analysis = colorlab.perform_enhanced_colorlab_analysis(
+        colorlab_corpus.encode_image(image), engine=engine, seed=3, kmeans_mode=kmeans_mode, use_cache=False,
+        fields=colorlab.parse_analysis_fields("dominant_colors,kmeans_analysis")
+    )
+    assert "error" not in analysis
+    return analysis
+
+def two_cell_image():
+    """8192 distinct colors (r, g < 16, b < 32) that fall into just two coreset cells"""
+    r, g, b = np.meshgrid(np.arange(16), np.arange(16), np.arange(32), indexing='ij')
+    return np.stack([r, g, b], axis=-1).astype(np.uint8).reshape(64, 128, 3)
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+@pytest.mark.parametrize("kmeans_mode", ["auto", "coreset"])
+def test_few_coreset_cells_still_give_k_colors(engine, kmeans_mode):
+    analysis = analyze(two_cell_image(), engine, kmeans_mode)
+    assert len(analysis["dominant_colors"]) == 8
+    assert sum(color["pixel_count"] for color in analysis["dominant_colors"]) == 8192
+    assert len(analysis["kmeans_analysis"]["clusters"]) == 6
+    assert analysis["kmeans_analysis"]["mode"] == "histogram"
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_silhouette_is_withheld_when_every_point_is_a_cluster(engine):
+    image = np.zeros((30, 30, 3), dtype=np.uint8)
+    image[10:20] = (200, 30, 30)
+    image[20:] = (30, 30, 200)
+    kmeans = analyze(image, engine)["kmeans_analysis"]
+    assert len(kmeans["clusters"]) == 3
+    assert kmeans["silhouette_score"] is None
+    assert kmeans["clustering_quality"] == "Not applicable"
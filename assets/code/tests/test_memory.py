@@ -0,0 +1,18 @@
+"""Bounded-memory runs say whether the decode itself was bounded"""
+import contextlib
+import io
+
+import pytest
+
+import colorlab_corpus
+import lambda_function_colorlab_complete as colorlab
+
+@pytest.mark.parametrize("image_format, in_strips", [("PNG", True), ("JPEG", False)])
+def test_bounded_mode_flags_whole_image_decodes(image_format, in_strips):
+    image = colorlab_corpus.synthetic_image("photo", 0.02, seed=1)
+    image_bytes = colorlab_corpus.encode_image(image, image_format)
+    with contextlib.redirect_stdout(io.StringIO()):
+        analysis = colorlab.perform_enhanced_colorlab_analysis(image_bytes, memory_mode='bounded', use_cache=False)
+    memory = analysis["metadata"]["memory"]
+    assert memory["mode"] == "bounded"
+    assert memory["decoded_in_strips"] is in_strips
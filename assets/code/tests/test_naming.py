@@ -0,0 +1,44 @@
+"""Cell-candidate name lookup matches a linear scan of COLOR_DATABASE"""
+import numpy as np
+import pytest
+
+import lambda_function_colorlab_complete as colorlab
+
+STRIDE = 7
+CUBE = [(r, g, b) for r in range(0, 256, STRIDE) for g in range(0, 256, STRIDE) for b in range(3, 256, STRIDE)]
+
+def linear_scan_names(colors):
+    """Reference: exact match, else nearest entry (first wins), else the generic name past distance 100"""
+    entries = np.array([color for color, _ in colorlab.COLOR_NAME_ENTRIES])
+    queries = np.array(colors)
+    distance_sq = ((queries[:, None, :] - entries[None, :, :]) ** 2).sum(axis=2)
+    best = distance_sq.argmin(axis=1)
+    names = []
+    for (r, g, b), entry, nearest_sq in zip(colors, best.tolist(), distance_sq.min(axis=1).tolist()):
+        if (r, g, b) in colorlab.COLOR_DATABASE:
+            names.append(colorlab.COLOR_DATABASE[(r, g, b)])
+        elif nearest_sq > colorlab.GENERIC_NAME_DISTANCE_SQ:
+            names.append(colorlab.get_generic_color_name(r, g, b))
+        else:
+            names.append(colorlab.COLOR_NAME_ENTRIES[entry][1])
+    return names
+
+def test_lookup_matches_linear_scan_across_the_cube():
+    expected = linear_scan_names(CUBE)
+    assert [colorlab.get_accurate_color_name(r, g, b) for r, g, b in CUBE] == expected
+
+def test_database_entries_and_their_neighbours_keep_their_names():
+    colors = [(min(255, r + dr), g, b) for (r, g, b) in colorlab.COLOR_DATABASE for dr in (0, 1)]
+    assert [colorlab.get_accurate_color_name(*color) for color in colors] == linear_scan_names(colors)
+
+def test_batch_naming_matches_per_color_naming():
+    assert colorlab.name_colors(np.array(CUBE)) == [colorlab.get_accurate_color_name(r, g, b) for r, g, b in CUBE]
+    assert colorlab.name_colors([(10, 20, 30), (255, 0, 0)]) == [
+        colorlab.get_accurate_color_name(10, 20, 30), colorlab.get_accurate_color_name(255, 0, 0)
+    ]
+    assert colorlab.name_colors([]) == []
+
+@pytest.mark.parametrize("cell", [0, 1, 1057, 16383, 32767])
+def test_numpy_candidate_table_matches_the_python_bounds(cell):
+    row = colorlab.build_name_lut_numpy()[cell]
+    assert tuple(int(i) for i in row if i >= 0) == colorlab.compute_name_cell_candidates(cell)
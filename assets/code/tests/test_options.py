@@ -0,0 +1,60 @@
+"""Request option validation answers 400 instead of failing later"""
+import base64
+import json
+
+import pytest
+
+import colorlab_corpus
+import lambda_function_colorlab_complete as colorlab
+
+def analyze(body):
+    event = {"httpMethod": "POST", "path": "/analyze", "headers": {}, "body": json.dumps(body)}
+    return colorlab.lambda_handler(event, None)
+
+@pytest.mark.parametrize("seed", [2 ** 70, 2 ** 63, -1, 1.5, True, "7"])
+def test_out_of_range_seed_is_a_400(seed):
+    response = analyze({"image_data": "aGVsbG8=", "seed": seed})
+    assert response["statusCode"] == 400
+    assert "seed" in json.loads(response["body"])["error"]
+
+@pytest.mark.parametrize("seed", [0, 7, 2 ** 63 - 1])
+def test_seed_range_is_accepted(seed):
+    assert colorlab.parse_analysis_options({"seed": seed})["seed"] == seed
+
+@pytest.mark.parametrize("image_data", ["abc", "!!!!", "data:image/png;base64,!!!!", "data:image/png,plain"])
+@pytest.mark.parametrize("stream", [False, True])
+def test_invalid_base64_is_a_400(image_data, stream):
+    response = analyze({"image_data": image_data, "stream": stream})
+    assert response["statusCode"] == 400
+    assert "image" in json.loads(response["body"])["error"]
+
+def test_invalid_base64_is_a_400_on_the_streaming_handler():
+    event = {"httpMethod": "POST", "path": "/analyze", "headers": {}, "body": json.dumps({"image_data": "abc", "stream": True})}
+    assert colorlab.lambda_stream_handler(event, None)["statusCode"] == 400
+
+def test_data_urls_and_wrapped_base64_decode():
+    image_bytes = colorlab_corpus.encode_image(colorlab_corpus.synthetic_image("few_color", 0.001, seed=1))
+    encoded = base64.b64encode(image_bytes).decode()
+    assert colorlab.decode_image_data("data:image/png;base64," + encoded) == image_bytes
+    wrapped = "\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76))
+    assert colorlab.decode_image_data(wrapped) == image_bytes
+
+@pytest.mark.parametrize("image_data", [5, ["aGVsbG8="], {"data": "aGVsbG8="}, True])
+def test_non_string_image_data_is_a_400(image_data):
+    response = analyze({"image_data": image_data})
+    assert response["statusCode"] == 400
+    assert "image_data" in json.loads(response["body"])["error"]
+
+@pytest.mark.parametrize("path", ["/analyze", "/analyze/batch"])
+@pytest.mark.parametrize("body, base64_encoded, error", [
+    ("{bad", False, "Body must be valid JSON"),
+    ("!!!!", True, "Body must be valid JSON"),
+    (base64.b64encode(b"\xff\xfe").decode(), True, "Body must be valid JSON"),
+    ("[1, 2]", False, "Body must be a JSON object"),
+    ('"image"', False, "Body must be a JSON object")
+])
+def test_malformed_json_body_is_a_400(path, body, base64_encoded, error):
+    event = {"httpMethod": "POST", "path": path, "headers": {}, "body": body, "isBase64Encoded": base64_encoded}
+    response = colorlab.lambda_handler(event, None)
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["error"] == error
@@ -0,0 +1,80 @@
+"""Forked workers give the sequential results and survive a dying worker"""
+import contextlib
+import io
+import json
+import os
+import threading
+
+import pytest
+
+import colorlab_corpus
+import lambda_function_colorlab_complete as colorlab
+
+def analyze(image_bytes, **options):
+    with contextlib.redirect_stdout(io.StringIO()):
+        analysis = colorlab.perform_enhanced_colorlab_analysis(image_bytes, use_cache=False, seed=3, **options)
+    metadata = analysis.pop("metadata")
+    return json.dumps(analysis, sort_keys=True, default=str), metadata
+
+@pytest.mark.parametrize("engine", ["numpy", "python"])
+def test_parallel_sections_match_sequential(engine, monkeypatch):
+    monkeypatch.setenv(colorlab.BATCH_WORKERS_ENV, "2")
+    image_bytes = colorlab_corpus.encode_image(colorlab_corpus.synthetic_image("photo", 0.02, seed=1))
+    sequential, _ = analyze(image_bytes, engine=engine, execution="sequential")
+    parallel, metadata = analyze(image_bytes, engine=engine, execution="parallel")
+    assert metadata["execution"]["mode"] == "fork"
+    assert metadata["execution"]["recomputed"] == 0
+    assert parallel == sequential
+
+def test_dead_worker_fails_only_its_tasks():
+    tasks = {"crash": (os._exit, (1,)), "square": (pow, (7, 2))}
+    with contextlib.redirect_stdout(io.StringIO()):
+        workers = colorlab.ForkWorkers.start(tasks, 2, depth=1)
+        try:
+            assert workers.result("square")[0] == 49
+            assert workers.result("crash") is None
+            assert workers.result("missing") is None
+        finally:
+            workers.close()
+    assert workers.failed == 1
+
+def test_single_worker_runs_in_process():
+    assert colorlab.ForkWorkers.start({"a": (abs, (-1,)), "b": (abs, (-2,))}, 1) is None
+
+class SlowBackend(colorlab.CacheBackend):
+    name = 'slow'
+    
+    def __init__(self, release):
+        self.release = release
+        self.stored = []
+    
+    def put(self, key, value):
+        self.release.wait(5)
+        print(f"stored {key}")
+        self.stored.append(key)
+
+def test_fork_waits_for_pending_cache_write_back():
+    release = threading.Event()
+    backend = SlowBackend(release)
+    backend.put_async("key", {})
+    threading.Timer(0.2, release.set).start()
+    tasks = {"print": (print, ("from a worker",)), "square": (pow, (3, 2))}
+    with contextlib.redirect_stdout(io.StringIO()):
+        workers = colorlab.ForkWorkers.start(tasks, 2)
+        assert backend.stored == ["key"]
+        try:
+            assert workers.result("square")[0] == 9
+            assert workers.result("print") is not None
+        finally:
+            workers.close()
+
+def test_stuck_cache_write_back_keeps_work_in_process(monkeypatch):
+    monkeypatch.setattr(colorlab, "FORK_FLUSH_TIMEOUT_SECONDS", 0.05)
+    release = threading.Event()
+    SlowBackend(release).put_async("key", {})
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert colorlab.ForkWorkers.start({"a": (abs, (-1,)), "b": (abs, (-2,))}, 2) is None
+    finally:
+        release.set()
+        assert colorlab.CacheBackend.flush(5)
@@ -0,0 +1,23 @@
+"""Sampled ('fast' quality) analyses report geometry in source-image pixels"""
+import pytest
+
+import colorlab_corpus
+import lambda_function_colorlab_complete as colorlab
+
+@pytest.mark.parametrize("memory_mode", ["full", "bounded"])
+def test_region_bounds_cover_the_source_image(memory_mode, monkeypatch):
+    monkeypatch.setitem(colorlab.QUALITY_SAMPLE_TARGETS, "fast", 1 << 12)
+    image = colorlab_corpus.synthetic_image("photo", 0.1, seed=2)
+    height, width = image.shape[:2]
+    analysis = colorlab.perform_enhanced_colorlab_analysis(
+        colorlab_corpus.encode_image(image), engine="numpy", quality="fast", memory_mode=memory_mode,
+        grid="3x3", use_cache=False, fields=("regional_analysis",)
+    )
+    regional = analysis["regional_analysis"]
+    assert regional["sampled_dimensions"]["stride"] > 1
+    assert regional["estimated_dimensions"] == {"width": width, "height": height, "total_pixels": width * height}
+    bounds = [region["bounds"] for region in regional["regions"]]
+    assert sum(b["width"] for b in bounds[:3]) == width
+    assert sum(b["height"] for b in bounds[::3]) == height
+    assert bounds[-1]["x"] + bounds[-1]["width"] == width
+    assert bounds[-1]["y"] + bounds[-1]["height"] == height
@@ -0,0 +1,70 @@
+"""NDJSON records are produced and relayed as each section completes"""
+import base64
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import colorlab_corpus
+import colorlab_local_harness
+import lambda_function_colorlab_complete as colorlab
+
+IMAGE = colorlab_corpus.encode_image(colorlab_corpus.synthetic_image("photo", 0.05, seed=5))
+
+def test_first_record_is_produced_before_the_analysis_finishes(monkeypatch):
+    calls = []
+    for name in ("generate_enhanced_dominant_colors", "analyze_enhanced_regional_analysis"):
+        original = getattr(colorlab, name)
+        monkeypatch.setattr(colorlab, name, lambda *args, _name=name, _original=original, **kwargs: calls.append(_name) or _original(*args, **kwargs))
+
+    records = colorlab.ndjson_analysis_records(IMAGE, engine="python", use_cache=False)
+    assert json.loads(next(records))["section"] == "color_frequency"
+    assert calls == []
+
+    rest = [json.loads(record) for record in records]
+    assert calls == ["generate_enhanced_dominant_colors", "analyze_enhanced_regional_analysis"]
+    assert rest[-1]["section"] == "metadata"
+
+@pytest.fixture(scope="module")
+def harness():
+    config = (colorlab_local_harness.DEFAULT_MODULE_PATH, colorlab_local_harness.DEFAULT_HANDLER,
+              colorlab_local_harness.DEFAULT_STREAM_HANDLER, 512, 60, {})
+    pool = colorlab_local_harness.ContainerPool(config, max_containers=1, idle_timeout=0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), colorlab_local_harness.ProxyRequestHandler)
+    server.pool, server.quiet, server.daemon_threads = pool, True, True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address
+    server.shutdown()
+    server.server_close()
+    pool.shutdown()
+
+def post(address, image_bytes, headers):
+    connection = http.client.HTTPConnection(*address, timeout=120)
+    body = json.dumps({"image_data": base64.b64encode(image_bytes).decode("ascii"), "cache": False})
+    connection.request("POST", "/analyze", body, dict(headers, **{"Content-Type": "application/json"}))
+    return connection, connection.getresponse()
+
+def test_harness_streams_ndjson_with_chunked_transfer(harness):
+    connection, response = post(harness, IMAGE, {"Accept": "application/x-ndjson"})
+    assert response.status == 200
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    assert response.getheader("Content-Length") is None
+    assert json.loads(response.readline())["section"] == "color_frequency"
+    rest = [json.loads(line) for line in response.read().splitlines()]
+    assert [record["section"] for record in rest][-1] == "metadata"
+    connection.close()
+
+def test_harness_buffers_json_responses(harness):
+    connection, response = post(harness, IMAGE, {})
+    assert response.getheader("Transfer-Encoding") is None
+    assert "dominant_colors" in json.loads(response.read())["analysis"]
+    connection.close()
+
+def test_harness_streaming_request_with_corrupt_image_is_a_400(harness):
+    connection, response = post(harness, IMAGE[:64], {"Accept": "application/x-ndjson"})
+    assert response.status == 400
+    assert response.getheader("Transfer-Encoding") is None
+    assert "Unsupported or corrupt image" in json.loads(response.read())["error"]
+    connection.close()
@@ -0,0 +1,82 @@
+"""metadata.timings and the Server-Timing header report the stages each request ran"""
+import base64
+import contextlib
+import io
+import json
+import re
+
+import pytest
+
+import colorlab_corpus
+import lambda_function_colorlab_complete as colorlab
+
+IMAGE = base64.b64encode(colorlab_corpus.encode_image(colorlab_corpus.synthetic_image("few_color", 0.005, seed=6))).decode()
+SECTIONS = [
+    "color_frequency", "histograms", "color_spaces", "characteristics", "dominant_colors",
+    "ai_training_data", "cnn_analysis", "kmeans_analysis", "regional_analysis"
+]
+SERVER_TIMING_ENTRY = re.compile(r"^[a-z_]+;dur=\d+(\.\d+)?$")
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    monkeypatch.setattr(colorlab, "RESULT_CACHE", colorlab.ResultCache())
+    monkeypatch.setattr(colorlab, "PERSISTENT_CACHE", False)
+
+def post(path, body):
+    event = {"httpMethod": "POST", "path": path, "headers": {}, "body": json.dumps(body)}
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        response = colorlab.lambda_handler(event, None)
+    assert response["statusCode"] == 200
+    return response, out.getvalue()
+
+def server_timing(response):
+    entries = response["headers"]["Server-Timing"].split(", ")
+    assert all(SERVER_TIMING_ENTRY.match(entry) for entry in entries), entries
+    stages = [entry.split(";dur=") for entry in entries]
+    return {stage: float(ms) for stage, ms in stages}, [stage for stage, _ in stages]
+
+def test_fresh_analysis_timings():
+    response, _ = post("/analyze", {"image_data": IMAGE, "cache": False})
+    timings = json.loads(response["body"])["analysis"]["metadata"]["timings"]
+    assert list(timings) == ["decode", "color_extraction", "pixel_statistics", *SECTIONS, "total"]
+    assert all(ms >= 0 for ms in timings.values())
+    assert timings["total"] >= sum(ms for stage, ms in timings.items() if stage != "total") - 0.01
+    
+    header, order = server_timing(response)
+    assert order == [*list(timings)[:-1], "serialize", "total"]
+    assert {stage: header[stage] for stage in timings if stage != "total"} == {k: v for k, v in timings.items() if k != "total"}
+    assert header["total"] >= timings["total"]
+
+def test_cache_lookup_is_timed_and_hits_report_their_own_timings():
+    miss, _ = post("/analyze", {"image_data": IMAGE})
+    assert "cache_lookup" in json.loads(miss["body"])["analysis"]["metadata"]["timings"]
+    
+    hit, _ = post("/analyze", {"image_data": IMAGE})
+    metadata = json.loads(hit["body"])["analysis"]["metadata"]
+    assert metadata["cache"] == "hit"
+    assert list(metadata["timings"]) == ["decode", "cache_lookup", "total"]
+    assert server_timing(hit)[1] == ["decode", "cache_lookup", "serialize", "total"]
+
+def test_field_selection_times_only_requested_sections():
+    response, _ = post("/analyze", {"image_data": IMAGE, "cache": False, "fields": ["dominant_colors"]})
+    timings = json.loads(response["body"])["analysis"]["metadata"]["timings"]
+    assert list(timings) == ["decode", "color_extraction", "dominant_colors", "total"]
+
+def test_streamed_response_timings():
+    response, _ = post("/analyze", {"image_data": IMAGE, "cache": False, "stream": True})
+    records = [json.loads(line) for line in response["body"].splitlines()]
+    metadata = next(record for record in records if record.get("section") == "metadata")["data"]
+    header, order = server_timing(response)
+    assert set(metadata["timings"]) - {"total"} <= set(order)
+    # Records are serialized as the sections come out, so serialize is not last here
+    assert "serialize" in order
+    assert order[-1] == "total"
+
+def test_batch_server_timing_and_log_line():
+    response, out = post("/analyze/batch", {"images": [IMAGE, IMAGE], "cache": False})
+    header, order = server_timing(response)
+    assert order[-2:] == ["serialize", "total"]
+    log = json.loads(out.strip().splitlines()[-1])
+    assert log["event"] == "colorlab_request"
+    assert log["route"] == "/analyze/batch"
+    assert log["timings_ms"] == header
@@ -0,0 +1,85 @@
+"""Binary and multipart uploads analyze like the JSON route and reject bad bodies with a 400"""
+import base64
+import json
+
+import pytest
+
+import colorlab_corpus
+import lambda_function_colorlab_complete as colorlab
+
+IMAGE = colorlab_corpus.encode_image(colorlab_corpus.synthetic_image("few_color", 0.005, seed=3))
+BOUNDARY = "colorlab-test-boundary"
+
+def upload(body, content_type, headers=None, base64_encoded=False, query=None):
+    event = {
+        "httpMethod": "POST", "path": "/analyze",
+        "headers": {"Content-Type": content_type, **(headers or {})},
+        "body": body, "isBase64Encoded": base64_encoded, "queryStringParameters": query
+    }
+    response = colorlab.lambda_handler(event, None)
+    return response["statusCode"], json.loads(response["body"])
+
+def multipart(*parts):
+    body = b""
+    for headers, content in parts:
+        body += f"--{BOUNDARY}\r\n{headers}\r\n\r\n".encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+@pytest.fixture(scope="module")
+def json_analysis():
+    event = {"httpMethod": "POST", "path": "/analyze", "headers": {},
+             "body": json.dumps({"image_data": base64.b64encode(IMAGE).decode(), "seed": 5, "cache": False})}
+    response = colorlab.lambda_handler(event, None)
+    assert response["statusCode"] == 200
+    return json.loads(response["body"])["analysis"]
+
+def test_raw_png_body_matches_json_route(json_analysis):
+    status, payload = upload(IMAGE, "image/png", headers={"X-ColorLab-Seed": "5", "X-ColorLab-Cache": "false"})
+    assert status == 200
+    assert payload["analysis"]["dominant_colors"] == json_analysis["dominant_colors"]
+
+def test_base64_encoded_binary_body_with_query_options(json_analysis):
+    status, payload = upload(base64.b64encode(IMAGE).decode(), "application/octet-stream",
+                             base64_encoded=True, query={"seed": "5", "cache": "false", "unrelated": "x"})
+    assert status == 200
+    assert payload["analysis"]["dominant_colors"] == json_analysis["dominant_colors"]
+
+def test_multipart_upload_with_form_fields(json_analysis):
+    body = multipart(
+        ('Content-Disposition: form-data; name="seed"', b"5"),
+        ('Content-Disposition: form-data; name="cache"', b"false"),
+        ('Content-Disposition: form-data; name="image"; filename="photo.png"\r\nContent-Type: image/png', IMAGE)
+    )
+    status, payload = upload(body, f'multipart/form-data; boundary="{BOUNDARY}"')
+    assert status == 200
+    assert payload["analysis"]["dominant_colors"] == json_analysis["dominant_colors"]
+
+@pytest.mark.parametrize("body, content_type, error", [
+    (multipart(('Content-Disposition: form-data; name="seed"', b"5")),
+     f"multipart/form-data; boundary={BOUNDARY}", 'multipart upload needs an "image" file part'),
+    (multipart(('Content-Disposition: form-data; name="image"; filename="a.png"', IMAGE)),
+     "multipart/form-data", "multipart upload is missing its boundary"),
+    (f"--{BOUNDARY}\r\nContent-Disposition: form-data".encode(),
+     f"multipart/form-data; boundary={BOUNDARY}", "malformed multipart body"),
+])
+def test_bad_multipart_is_a_400(body, content_type, error):
+    assert upload(body, content_type) == (400, {"error": error})
+
+def test_string_body_without_base64_flag_is_a_400():
+    status, payload = upload(IMAGE.decode("latin-1"), "image/png")
+    assert status == 400
+    assert "isBase64Encoded" in payload["error"]
+
+def test_bad_option_header_is_a_400():
+    status, payload = upload(IMAGE, "image/png", headers={"X-ColorLab-Seed": "many"})
+    assert (status, payload["error"]) == (400, "seed must be an integer")
+
+@pytest.mark.parametrize("content_type", ["application/octet-stream", "image/png"])
+def test_non_image_bytes_are_a_400(content_type):
+    status, payload = upload(b"not an image at all", content_type, headers={"X-ColorLab-Cache": "false"})
+    assert status == 400
+    assert payload["error"].startswith("Unsupported or corrupt image")
+
+def test_image_bytes_under_a_json_content_type_are_a_400():
+    status, payload = upload(base64.b64encode(IMAGE).decode(), "application/json", base64_encoded=True)
+    assert (status, payload["error"]) == (400, "Body must be valid JSON")
@@ -102,7 +102,7 @@ def lambda_handler(event, context):
         return {
             'statusCode': 200,
             'headers': headers,
-            'body': json.dumps(analysis_result, indent=2)
+            'body': json.dumps(analysis_result, separators=(',', ':'))
         }
         
     except Exception as e: